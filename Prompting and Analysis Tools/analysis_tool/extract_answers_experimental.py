@@ -2,6 +2,7 @@
 import pandas as pd
 import re
 from pathlib import Path
+from raw_results import RawResults
 
 try:
     from extract_config import EXTRACT_CONFIG
@@ -122,13 +123,13 @@ def run_extraction():
 
     print(f"Loading raw results from: {input_path.name}")
 
-    # 2. Read the Input Excel File, preserving original sheet order
+    # 2. Read the raw results (Excel workbook or Parquet store), preserving sheet order
     try:
-        xls = pd.ExcelFile(input_path)
-        sheet_names = xls.sheet_names # This list preserves the order from the file
+        raw = RawResults(input_path)
+        sheet_names = raw.sheet_names # This list preserves the order from the file
         print(f"Found {len(sheet_names)} sheets to process.")
     except Exception as e:
-        print(f"Error reading Excel file: {e}")
+        print(f"Error reading raw results: {e}")
         return
 
     # 3. Process Each Sheet and Write to Output
@@ -136,7 +137,7 @@ def run_extraction():
         for sheet in sheet_names: # Iterating in the original order
             print(f"  -> Extracting answers from sheet: '{sheet}'...")
             try:
-                df = pd.read_excel(xls, sheet_name=sheet, header=1)
+                df = raw.read_sheet(sheet)
                 
                 if 'Iteration' not in df.columns:
                     print(f"     - Skipping sheet '{sheet}' (no 'Iteration' column).")
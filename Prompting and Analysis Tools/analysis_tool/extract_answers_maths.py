@@ -4,6 +4,7 @@
 import pandas as pd
 import re
 from pathlib import Path
+from raw_results import RawResults
 
 try:
     from extract_config import EXTRACT_CONFIG
@@ -206,8 +207,8 @@ def run_extraction():
     print(f"Loading raw results from: {input_path.name}")
 
     try:
-        xls = pd.ExcelFile(input_path, engine='openpyxl')
-        all_sheet_names = xls.sheet_names
+        raw = RawResults(input_path)
+        all_sheet_names = raw.sheet_names
         
         final_sheets_to_process = all_sheet_names
         if sheets_to_process:
@@ -218,7 +219,7 @@ def run_extraction():
         
         print(f"Found {len(final_sheets_to_process)} sheets to process.")
     except Exception as e:
-        print(f"Error reading Excel file: {e}")
+        print(f"Error reading raw results: {e}")
         return
 
     write_mode = 'a' if output_path.exists() else 'w'
@@ -231,7 +232,7 @@ def run_extraction():
             for sheet in final_sheets_to_process:
                 print(f"  -> Extracting answers from sheet: '{sheet}'...")
                 try:
-                    df = pd.read_excel(xls, sheet_name=sheet, header=1)
+                    df = raw.read_sheet(sheet)
                     if 'iteration' not in [str(c).lower() for c in df.columns]:
                         print(f"     - Skipping sheet '{sheet}' (no 'Iteration' column).")
                         continue
@@ -1,7 +1,9 @@
 # extract_config.py
 
 EXTRACT_CONFIG = {
-    # REQUIRED: Path to the raw Excel file from the experiment framework.
+    # REQUIRED: Path to the raw Excel file from the experiment framework, or to its
+    # Parquet result store ("../llm_experiment_framework/results/store", a partition
+    # directory inside it, or a single .parquet file) for full, untruncated responses.
     "input_file": "../llm_experiment_framework/results/llama_integral_experiment.xlsx",
 
     # REQUIRED: The name for the output file containing the extracted answers.
@@ -0,0 +1,39 @@
+# raw_results.py
+"""
+Loads raw experiment results for the extraction scripts.
+
+`input_file` in extract_config.py can point to an Excel workbook written by the
+experiment framework, or to its Parquet result store
+(`../llm_experiment_framework/results/store`, a partition directory inside it,
+or a single .parquet file). The store holds the full, untruncated responses and
+loads much faster than `pd.read_excel`.
+"""
+import pandas as pd
+
+
+class RawResults:
+    def __init__(self, input_path):
+        self.input_path = input_path
+        if input_path.is_dir() or input_path.suffix == ".parquet":
+            self.xls = None
+            df = pd.read_parquet(input_path, columns=["sheet_name", "temperature", "iteration", "response"])
+            # An experiment saved to several workbooks appears once per workbook.
+            self.store = df.drop_duplicates(subset=["sheet_name", "temperature", "iteration"], keep="last")
+            self.sheet_names = list(dict.fromkeys(self.store["sheet_name"]))
+        else:
+            self.store = None
+            self.xls = pd.ExcelFile(input_path, engine='openpyxl')
+            self.sheet_names = self.xls.sheet_names
+
+    def read_sheet(self, sheet):
+        """
+        Returns one experiment in the sheet layout: an 'Iteration' column and
+        one 'Temp_x.xx' column per temperature.
+        """
+        if self.xls is not None:
+            return pd.read_excel(self.xls, sheet_name=sheet, header=1)
+        rows = self.store[self.store["sheet_name"] == sheet]
+        df = rows.pivot(index="iteration", columns="temperature", values="response").sort_index()
+        df.columns = [f"Temp_{temp:.2f}" for temp in df.columns]
+        df.index.name = "Iteration"
+        return df.reset_index()
@@ -0,0 +1,396 @@
+"""
+Adaptive temperature sampling and sequential early stopping.
+
+A uniform grid spends as many calls at T=0.0, where answers hardly change,
+as near the temperature where accuracy collapses. An experiment with an
+"adaptive" block starts on a coarse grid over its temperature_range,
+scores every response as it arrives (a pluggable extractor pulls out the
+answer, a pluggable scorer compares it with the expected one) and then
+spends the rest of its call budget round by round on whichever helps most:
+
+- splitting the temperature interval with the steepest accuracy change, or
+- sampling again at the temperature with the widest confidence interval.
+
+The result is an irregular grid: more temperatures and iterations around the
+transition, few elsewhere. Cells that were never sampled stay empty in the sheet.
+
+An "early_stop" block keeps the usual grid but stops sampling a temperature
+once the interval on its accuracy is narrow enough (0% or 100% is usually
+obvious after a handful of calls); the slots it skipped are marked in the sheet.
+"""
+import importlib
+import json
+import math
+import os
+import re
+
+import numpy as np
+
+from journal import temperature_key
+
+DEFAULT_ADAPTIVE_SETTINGS = {
+    "budget": None,             # total calls for the experiment (default: half the uniform grid)
+    "coarse_step": 0.5,         # spacing of the first pass over temperature_range
+    "initial_iterations": 4,    # calls at a temperature when it is added
+    "batch": 4,                 # calls added when a temperature is resampled
+    "min_step": 0.05,           # intervals narrower than this are not split
+    "extractor": "final_answer",
+    "scorer": "contains",
+    "expected": None,           # the correct answer (or a list of accepted answers)
+}
+
+DEFAULT_EARLY_STOP_SETTINGS = {
+    "min_iterations": 5,        # calls at every temperature before it may stop
+    "max_width": 0.3,           # stop once the accuracy interval is narrower than this
+    "batch": 1,                 # calls added per temperature and round after that
+    "interval": "wilson",       # "wilson" (95% score interval) or "bayes" (95% Beta(1, 1) credible interval)
+    "extractor": "final_answer",
+    "scorer": "contains",
+    "expected": None,
+}
+
+# Written to the slots an early-stopped temperature never ran, so the sheet stays rectangular.
+EARLY_STOP_MARKER = "SKIPPED_EARLY_STOP"
+
+
+def extract_raw(response):
+    return response.strip()
+
+
+def extract_last_line(response):
+    lines = [line.strip() for line in response.strip().splitlines() if line.strip()]
+    return lines[-1] if lines else ""
+
+
+def extract_final_answer(response):
+    """
+    The last \\boxed{...}, else the text after "final answer"/"the answer is",
+    else the last non-empty line.
+    """
+    boxed = re.findall(r"\\boxed\{((?:[^{}]|\{[^{}]*\})*)\}", response)
+    if boxed:
+        return boxed[-1].strip()
+    match = None
+    for match in re.finditer(r"(?:final answer|the answer is|the solution is)\s*(?:is)?\s*[:=]?\s*(.+)", response, re.IGNORECASE):
+        pass
+    if match is not None:
+        return match.group(1).strip()
+    return extract_last_line(response)
+
+
+def _normalize(text):
+    return re.sub(r"\s+", "", str(text)).lower().strip(".$")
+
+
+def score_exact(answer, expected):
+    return float(_normalize(answer) == _normalize(expected))
+
+
+def score_contains(answer, expected):
+    return float(_normalize(expected) in _normalize(answer))
+
+
+def score_regex(answer, expected):
+    return float(re.search(expected, answer) is not None)
+
+
+EXTRACTORS = {
+    "raw": extract_raw,
+    "last_line": extract_last_line,
+    "final_answer": extract_final_answer,
+}
+
+SCORERS = {
+    "exact": score_exact,
+    "contains": score_contains,
+    "regex": score_regex,
+}
+
+
+def resolve_function(name, registry):
+    """A callable, a name from the registry, or "module:function" to import your own."""
+    if callable(name):
+        return name
+    if name in registry:
+        return registry[name]
+    if ":" in name:
+        module_name, function_name = name.split(":", 1)
+        return getattr(importlib.import_module(module_name), function_name)
+    raise ValueError(f"Unknown function '{name}'. Built in: {list(registry)}, or use 'module:function'.")
+
+
+def beta_credible_interval(successes, n, level=0.95, draws=20000):
+    """
+    Equal-tailed credible interval of the Beta(1 + successes, 1 + failures)
+    posterior (uniform prior), from a fixed-seed sample so it is reproducible.
+    """
+    rng = np.random.default_rng(0)
+    samples = rng.beta(1 + successes, 1 + n - successes, draws)
+    low, high = np.quantile(samples, [(1 - level) / 2, (1 + level) / 2])
+    return float(low), float(high)
+
+
+def coarse_grid(temp_range, settings):
+    """The first-pass temperatures: temperature_range at "coarse_step" spacing, end included."""
+    step = dict(DEFAULT_ADAPTIVE_SETTINGS, **(settings or {}))["coarse_step"]
+    start, end = temp_range["start"], temp_range["end"]
+    grid = np.arange(start, end + step / 2, step)
+    if not np.isclose(grid[-1], end):
+        grid = np.append(grid, end)
+    return np.round(grid, 2)
+
+
+def wilson_interval(successes, n, z=1.96):
+    """95% Wilson score interval for a proportion."""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+class ScoredSampler:
+    """
+    Base for samplers that choose an experiment's cells round by round from
+    the scores of the cells run so far.
+
+    `temps` and cells (t_idx, iter_idx) index into the same list, so the job
+    can keep using job["temps"][t_idx]. `known(temp, iter_idx)` returns the
+    response of a cell that is already done (e.g. journaled by a crashed run)
+    or None: known cells are scored instead of being called again, and since
+    the choices only depend on the scores, a resumed run makes the same choices.
+    """
+    defaults = DEFAULT_ADAPTIVE_SETTINGS
+    kind = "adaptive"
+
+    def __init__(self, temps, max_iterations, settings, known=None):
+        self.settings = dict(self.defaults, **(settings or {}))
+        self.extract = resolve_function(self.settings["extractor"], EXTRACTORS)
+        self.score = resolve_function(self.settings["scorer"], SCORERS)
+        expected = self.settings["expected"]
+        if expected is None:
+            raise ValueError(f"An {self.kind} experiment needs an 'expected' answer to score responses against.")
+        self.expected = expected if isinstance(expected, list) else [expected]
+        self.max_iterations = int(max_iterations)
+        self.temps = [float(temp) for temp in temps]
+        self.counts = [0] * len(self.temps)
+        self.budget = len(self.temps) * self.max_iterations
+        self.known = known or (lambda temp, iter_idx: None)
+        self.responses = {}
+        self.scores = {}
+        self._score_errors = 0
+
+    @property
+    def spent(self):
+        return len(self.responses)
+
+    def _cells_for(self, t_idx, n):
+        n = max(0, min(n, self.max_iterations - self.counts[t_idx], self.budget - sum(self.counts)))
+        cells = [(t_idx, iter_idx) for iter_idx in range(self.counts[t_idx], self.counts[t_idx] + n)]
+        self.counts[t_idx] += len(cells)
+        return cells
+
+    def _choose(self):
+        raise NotImplementedError
+
+    def next_batch(self):
+        """
+        Returns the next cells to call, or [] when the sampler is done.
+        Cells in `known` are recorded on the way.
+        """
+        while True:
+            cells = self._choose()
+            if not cells:
+                return []
+            pending = []
+            for cell in cells:
+                response = self.known(self.temps[cell[0]], cell[1])
+                if response is None:
+                    pending.append(cell)
+                else:
+                    self.record({cell: response})
+            if pending:
+                return pending
+
+    def record(self, responses):
+        """Adds finished cells ({(t_idx, iter_idx): response}) and scores them."""
+        for cell, response in responses.items():
+            self.responses[cell] = response
+            if response.startswith("SKIPPED_ERROR"):
+                self.scores[cell] = None
+                continue
+            try:
+                answer = self.extract(response)
+                self.scores[cell] = max(float(self.score(answer, expected)) for expected in self.expected)
+            except Exception as e:
+                # An unscored cell only means more sampling, so a scorer bug does not stop the run.
+                if not self._score_errors:
+                    print(f"      Warning: Could not score a response ({e}); it is left unscored.")
+                self._score_errors += 1
+                self.scores[cell] = None
+
+    def _interval(self, successes, n):
+        return wilson_interval(successes, n)
+
+    def _stats(self, t_idx):
+        scores = [score for (t, _), score in self.scores.items() if t == t_idx and score is not None]
+        n = len(scores)
+        accuracy = sum(scores) / n if n else None
+        low, high = self._interval(sum(scores), n)
+        return accuracy, n, low, high
+
+    def curve(self):
+        """Accuracy per temperature (sorted), with counts, intervals and the estimated transition."""
+        points = []
+        for t_idx in sorted(range(len(self.temps)), key=lambda t_idx: self.temps[t_idx]):
+            accuracy, n, low, high = self._stats(t_idx)
+            points.append({"temperature": temperature_key(self.temps[t_idx]), "n": n,
+                           "accuracy": accuracy, "ci_low": low, "ci_high": high})
+        return {"mode": self.kind, "calls": self.spent, "budget": self.budget,
+                "transition": estimate_transition(points), "points": points}
+
+    def grid(self):
+        """
+        The finished grid: (sorted temperatures, {(t_idx, iter_idx): response})
+        with the cells re-indexed to the sorted order.
+        """
+        order = sorted(range(len(self.temps)), key=lambda t_idx: self.temps[t_idx])
+        new_index = {old: new for new, old in enumerate(order)}
+        responses = {(new_index[t_idx], iter_idx): response for (t_idx, iter_idx), response in self.responses.items()}
+        return np.array([self.temps[t_idx] for t_idx in order]), responses
+
+
+class AdaptiveSampler(ScoredSampler):
+    """
+    Adaptive temperature grid: the coarse grid first (extended in place as
+    temperatures are added), then, each round, whichever of splitting an
+    interval or resampling a temperature promises most, until the budget is spent.
+    """
+
+    def __init__(self, temp_range, max_iterations, settings, known=None):
+        settings = dict(DEFAULT_ADAPTIVE_SETTINGS, **(settings or {}))
+        super().__init__(coarse_grid(temp_range, settings), max_iterations, settings, known)
+        if self.settings["budget"] is None:
+            uniform = len(np.arange(temp_range["start"], temp_range["end"] + temp_range["step"], temp_range["step"]))
+            self.settings["budget"] = uniform * self.max_iterations // 2
+        self.budget = int(self.settings["budget"])
+        self._started = False
+
+    def _choose(self):
+        if not self._started:
+            self._started = True
+            return [cell for t_idx in range(len(self.temps))
+                    for cell in self._cells_for(t_idx, self.settings["initial_iterations"])]
+        if sum(self.counts) >= self.budget:
+            return []
+        order = sorted(range(len(self.temps)), key=lambda t_idx: self.temps[t_idx])
+        stats = {t_idx: self._stats(t_idx) for t_idx in order}
+        best_score, best_action = -1.0, None
+        # Sampling again where the confidence interval is widest...
+        for t_idx in order:
+            accuracy, n, low, high = stats[t_idx]
+            if self.counts[t_idx] < self.max_iterations and (high - low) / 2 > best_score:
+                best_score, best_action = (high - low) / 2, ("sample", t_idx)
+        # ...or splitting the interval where accuracy changes most.
+        for left, right in zip(order, order[1:]):
+            if stats[left][0] is None or stats[right][0] is None:
+                continue
+            midpoint = round((self.temps[left] + self.temps[right]) / 2, 2)
+            if self.temps[right] - self.temps[left] < self.settings["min_step"] or midpoint in (self.temps[left], self.temps[right]):
+                continue
+            change = abs(stats[right][0] - stats[left][0])
+            if change >= best_score:
+                best_score, best_action = change, ("split", midpoint)
+        if best_action is None:
+            return []
+        action, value = best_action
+        if action == "sample":
+            return self._cells_for(value, self.settings["batch"])
+        self.temps.append(value)
+        self.counts.append(0)
+        return self._cells_for(len(self.temps) - 1, self.settings["initial_iterations"])
+
+
+class EarlyStopSampler(ScoredSampler):
+    """
+    Sequential early stopping on the usual grid: every temperature runs
+    "min_iterations" cells, then "batch" more per round until the interval on
+    its accuracy is narrower than "max_width" (or all iterations are used).
+    The slots it never ran are filled with EARLY_STOP_MARKER.
+    """
+    defaults = DEFAULT_EARLY_STOP_SETTINGS
+    kind = "early_stop"
+
+    def __init__(self, temps, max_iterations, settings, known=None):
+        super().__init__(temps, max_iterations, settings, known)
+        self.stopped = set()
+
+    def _interval(self, successes, n):
+        if self.settings["interval"] == "bayes":
+            return beta_credible_interval(successes, n)
+        return wilson_interval(successes, n)
+
+    def _choose(self):
+        cells = []
+        for t_idx in range(len(self.temps)):
+            if t_idx in self.stopped:
+                continue
+            if self.counts[t_idx] == 0:
+                cells += self._cells_for(t_idx, self.settings["min_iterations"])
+                continue
+            accuracy, n, low, high = self._stats(t_idx)
+            if n >= self.settings["min_iterations"] and high - low <= self.settings["max_width"]:
+                self.stopped.add(t_idx)
+                continue
+            cells += self._cells_for(t_idx, self.settings["batch"])
+        return cells
+
+    def grid(self):
+        temps, responses = super().grid()
+        for t_idx in range(len(temps)):
+            for iter_idx in range(self.max_iterations):
+                responses.setdefault((t_idx, iter_idx), EARLY_STOP_MARKER)
+        return temps, responses
+
+
+def estimate_transition(points):
+    """
+    The temperature where accuracy first falls below half its peak, linearly
+    interpolated between the sampled temperatures (None if it never does).
+    """
+    sampled = [(float(point["temperature"]), point["accuracy"]) for point in points if point["accuracy"] is not None]
+    if not sampled:
+        return None
+    threshold = max(accuracy for _, accuracy in sampled) / 2
+    for (t0, a0), (t1, a1) in zip(sampled, sampled[1:]):
+        if a0 >= threshold > a1:
+            return round(t0 + (a0 - threshold) / (a0 - a1) * (t1 - t0), 3)
+    return None
+
+
+def format_curve(curve):
+    points = " ".join(f"{point['temperature']}:{point['accuracy']:.2f}(n={point['n']})"
+                      for point in curve["points"] if point["accuracy"] is not None)
+    transition = "n/a" if curve["transition"] is None else f"{curve['transition']:.2f}"
+    return f"{curve['calls']}/{curve['budget']} calls | transition ~ T={transition} | {points}"
+
+
+def curve_path_for(output_file):
+    """results/foo.xlsx -> results/foo.adaptive.json"""
+    return os.path.splitext(output_file)[0] + ".adaptive.json"
+
+
+def save_curve(output_file, sheet_name, curve):
+    """Stores an adaptive experiment's accuracy curve under its sheet name."""
+    path = curve_path_for(output_file)
+    curves = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            curves = json.load(f)
+    curves[sheet_name] = curve
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(curves, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,187 @@
+"""
+Local stand-in for the OpenAI and Anthropic batch APIs, for trying batch mode
+(`python main.py batch`) without network access or cost.
+
+    python batch_standin.py --port 8090 --delay 5
+    python batch_standin.py --forward http://localhost:1234/v1/chat/completions --forward-model qwen3-8b
+
+then point RUN_CONFIG["batch"]["base_urls"] at it:
+
+    "base_urls": {"openai": "http://127.0.0.1:8090/v1", "anthropic": "http://127.0.0.1:8090/v1"}
+
+Any API key is accepted (OPENAI_API_KEY / ANTHROPIC_API_KEY still have to be
+set). Batches end `--delay` seconds after they are created. Each request is
+answered by an OpenAI-compatible chat endpoint given with --forward (LM
+Studio, Ollama's /v1) or, without it, by a canned text naming the temperature.
+"""
+import argparse
+import email
+import email.policy
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+STATE = {"files": {}, "batches": {}}
+LOCK = threading.Lock()
+IDS = itertools.count(1)
+
+
+def new_id(prefix):
+    return f"{prefix}_standin{next(IDS):06d}"
+
+
+def answer(body, forward, forward_model):
+    """Returns (text, prompt tokens, completion tokens) for an OpenAI-style chat body."""
+    if forward:
+        data = {key: body[key] for key in ("messages", "temperature", "top_p", "seed", "max_tokens") if key in body}
+        data["model"] = forward_model or body["model"]
+        if "max_completion_tokens" in body:
+            data["max_tokens"] = body["max_completion_tokens"]
+        res_json = requests.post(forward, json=data, timeout=600).json()
+        usage = res_json.get("usage") or {}
+        return res_json["choices"][0]["message"]["content"], usage.get("prompt_tokens"), usage.get("completion_tokens")
+    text = f"Stand-in answer from {body['model']} at temperature {body.get('temperature', 1.0):.2f}."
+    return text, sum(len(message["content"].split()) for message in body["messages"]), len(text.split())
+
+
+def run_openai_request(line, args):
+    try:
+        text, prompt_tokens, completion_tokens = answer(line["body"], args.forward, args.forward_model)
+    except Exception as e:
+        return {"custom_id": line["custom_id"], "response": None, "error": {"code": "server_error", "message": str(e)}}
+    body = {
+        "object": "chat.completion",
+        "model": line["body"]["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+    }
+    return {"custom_id": line["custom_id"], "response": {"status_code": 200, "body": body}, "error": None}
+
+
+def run_anthropic_request(request, args):
+    params = request["params"]
+    messages = list(params["messages"])
+    if params.get("system"):
+        messages.insert(0, {"role": "system", "content": params["system"]})
+    body = dict(params, messages=messages)
+    body.pop("system", None)
+    try:
+        text, prompt_tokens, completion_tokens = answer(body, args.forward, args.forward_model)
+    except Exception as e:
+        return {"custom_id": request["custom_id"], "result": {"type": "errored", "error": {"type": "api_error", "message": str(e)}}}
+    message = {
+        "type": "message",
+        "role": "assistant",
+        "model": params["model"],
+        "content": [{"type": "text", "text": text}],
+        "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens},
+    }
+    return {"custom_id": request["custom_id"], "result": {"type": "succeeded", "message": message}}
+
+
+def finish_batch(batch_id, args):
+    """Runs a batch's requests after the delay and stores its results."""
+    time.sleep(args.delay)
+    with LOCK:
+        batch = STATE["batches"][batch_id]
+    if batch["kind"] == "openai":
+        lines = [json.loads(line) for line in STATE["files"][batch["input_file_id"]].splitlines() if line.strip()]
+        results = [run_openai_request(line, args) for line in lines]
+        output_id, error_id = new_id("file"), new_id("file")
+        with LOCK:
+            STATE["files"][output_id] = "".join(json.dumps(r) + "\n" for r in results if r["error"] is None)
+            STATE["files"][error_id] = "".join(json.dumps(r) + "\n" for r in results if r["error"] is not None)
+            batch.update(status="completed", output_file_id=output_id, error_file_id=error_id,
+                         request_counts={"total": len(results), "completed": sum(r["error"] is None for r in results),
+                                         "failed": sum(r["error"] is not None for r in results)})
+    else:
+        results = [run_anthropic_request(request, args) for request in batch.pop("requests")]
+        with LOCK:
+            batch["results"] = "".join(json.dumps(r) + "\n" for r in results)
+            batch.update(processing_status="ended", results_url=f"{args.base}/v1/messages/batches/{batch_id}/results",
+                         request_counts={"succeeded": sum(r["result"]["type"] == "succeeded" for r in results),
+                                         "errored": sum(r["result"]["type"] == "errored" for r in results)})
+
+
+def make_handler(args):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload, content_type="application/json"):
+            data = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def _public(self, batch):
+            return {key: value for key, value in batch.items() if key not in ("kind", "requests", "results")}
+
+        def do_POST(self):
+            if self.path == "/v1/files":
+                message = email.message_from_bytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + self._body(), policy=email.policy.HTTP)
+                for part in message.iter_parts():
+                    if part.get_param("name", header="content-disposition") == "file":
+                        file_id = new_id("file")
+                        with LOCK:
+                            STATE["files"][file_id] = part.get_payload(decode=True).decode("utf-8")
+                        return self._send(200, {"id": file_id, "object": "file", "purpose": "batch"})
+                return self._send(400, {"error": {"message": "no file part"}})
+            if self.path == "/v1/batches":
+                body = json.loads(self._body())
+                if body.get("input_file_id") not in STATE["files"]:
+                    return self._send(400, {"error": {"message": "unknown input_file_id"}})
+                batch = {"id": new_id("batch"), "object": "batch", "kind": "openai", "status": "in_progress",
+                         "input_file_id": body["input_file_id"], "endpoint": body.get("endpoint"),
+                         "created_at": int(time.time())}
+            elif self.path == "/v1/messages/batches":
+                body = json.loads(self._body())
+                batch = {"id": new_id("msgbatch"), "type": "message_batch", "kind": "anthropic",
+                         "processing_status": "in_progress", "requests": body["requests"], "results_url": None}
+            else:
+                return self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+            with LOCK:
+                STATE["batches"][batch["id"]] = batch
+            threading.Thread(target=finish_batch, args=(batch["id"], args), daemon=True).start()
+            self._send(200, self._public(batch))
+
+        def do_GET(self):
+            match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+            if match and match.group(1) in STATE["files"]:
+                return self._send(200, STATE["files"][match.group(1)], "application/jsonl")
+            match = re.fullmatch(r"/v1/(?:messages/)?batches/([\w-]+)(/results)?", self.path)
+            batch = STATE["batches"].get(match.group(1)) if match else None
+            if batch is None:
+                return self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+            if match.group(2):
+                return self._send(200, batch.get("results", ""), "application/jsonl")
+            self._send(200, self._public(batch))
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI and Anthropic batch APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--delay", type=float, default=5.0, help="Seconds until a batch ends.")
+    parser.add_argument("--forward", default=None,
+                        help="OpenAI-compatible /chat/completions URL that answers the requests (default: canned text).")
+    parser.add_argument("--forward-model", default=None, help="Model name sent to --forward instead of the batch's.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+    args.base = f"http://{args.host}:{args.port}"
+    print(f"Batch stand-in listening on {args.base}/v1")
+    ThreadingHTTPServer((args.host, args.port), make_handler(args)).serve_forever()
@@ -0,0 +1,248 @@
+"""
+Offline batch submission to the providers' batch endpoints.
+
+`python main.py batch` compiles every pending cell of the OpenAI and Anthropic
+experiments into a batch payload (one JSONL file per model, kept in
+results/batches/), submits it to the provider's batch API, polls it until it
+ends and ingests the results into the journal, from where the finished
+experiments are saved as usual. Batches trade latency (up to 24 hours) for
+higher throughput limits and lower prices, which suits the large remote part
+of a sweep.
+
+Submitted batches are recorded in results/batches/ledger.json, so the command
+can be stopped after submitting (or run with --no-wait) and re-run later to
+pick the results up. The base URLs can point at a local stand-in server
+(batch_standin.py) to try the flow without network access.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+from journal import temperature_key
+from llm_services import HTTP_POOL, openai_request_body, read_openai_response, anthropic_request_body, read_anthropic_response
+
+BATCH_SERVICES = ("openai", "anthropic")
+
+DEFAULT_BATCH_SETTINGS = {
+    "poll_seconds": 60,
+    "max_requests": 10000,
+    "completion_window": "24h",
+    "base_urls": {
+        "openai": "https://api.openai.com/v1",
+        "anthropic": "https://api.anthropic.com/v1",
+    },
+}
+
+# Ledger states of a batch.
+SUBMITTED = "submitted"
+INGESTED = "ingested"
+
+# Batch result errors that mean the request never ran; such cells are submitted again.
+UNRUN_ERRORS = {"batch_expired", "batch_cancelled", "expired", "canceled"}
+
+
+def custom_id(exp_key, temp, iteration):
+    """'<experiment>-0p70-3': unique per cell and valid for both providers ([A-Za-z0-9_-], at most 64 chars)."""
+    return f"{exp_key}-{temperature_key(temp).replace('.', 'p')}-{iteration}"
+
+
+def batch_settings(config):
+    settings = dict(DEFAULT_BATCH_SETTINGS, **(config or {}))
+    settings["base_urls"] = dict(DEFAULT_BATCH_SETTINGS["base_urls"], **settings.get("base_urls", {}))
+    return settings
+
+
+def _checked(response):
+    response.raise_for_status()
+    return response
+
+
+def _error_text(error):
+    if isinstance(error, dict):
+        return error.get("message") or error.get("code") or json.dumps(error)
+    return str(error)
+
+
+class OpenAIBatchClient:
+    """OpenAI Batch API: the payload is uploaded as a file, then run as one batch."""
+
+    service = "openai"
+    ENDED = {"completed", "failed", "expired", "cancelled"}
+
+    def __init__(self, base_url, settings):
+        self.base_url = base_url.rstrip("/")
+        self.settings = settings
+
+    def _headers(self):
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not found in environment variables")
+        return {"Authorization": f"Bearer {api_key}"}
+
+    def request_line(self, cell_id, prompt, model, temperature, params):
+        return {"custom_id": cell_id, "method": "POST", "url": "/v1/chat/completions",
+                "body": openai_request_body(prompt, model, temperature, params)}
+
+    def submit(self, payload_path):
+        """Uploads the payload and creates the batch; returns its id."""
+        headers = self._headers()
+        with open(payload_path, "rb") as f:
+            upload = _checked(HTTP_POOL.post(self.service, f"{self.base_url}/files", headers=headers, timeout=300,
+                                             data={"purpose": "batch"},
+                                             files={"file": (os.path.basename(payload_path), f, "application/jsonl")}))
+        batch = _checked(HTTP_POOL.post(self.service, f"{self.base_url}/batches", headers=headers, timeout=60, json={
+            "input_file_id": upload.json()["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": self.settings["completion_window"],
+        }))
+        return batch.json()["id"]
+
+    def poll(self, batch_id):
+        """Returns (status, ended, batch object)."""
+        info = _checked(HTTP_POOL.get(self.service, f"{self.base_url}/batches/{batch_id}", headers=self._headers(), timeout=60)).json()
+        if info["status"] == "failed" and info.get("errors"):
+            info["error"] = "; ".join(_error_text(error) for error in info["errors"].get("data", []))
+        return info["status"], info["status"] in self.ENDED, info
+
+    def results(self, info):
+        """Yields (custom id, response, error, stats) for every request that ran."""
+        for file_key in ("output_file_id", "error_file_id"):
+            if not info.get(file_key):
+                continue
+            content = _checked(HTTP_POOL.get(self.service, f"{self.base_url}/files/{info[file_key]}/content",
+                                             headers=self._headers(), timeout=300))
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                stats = {"status": response.get("status_code")}
+                if item.get("error"):
+                    if item["error"].get("code") in UNRUN_ERRORS:
+                        continue
+                    yield item["custom_id"], None, _error_text(item["error"]), stats
+                elif response.get("status_code") != 200:
+                    yield item["custom_id"], None, _error_text(response.get("body", {}).get("error", response)), stats
+                else:
+                    yield item["custom_id"], read_openai_response(response["body"], stats), None, stats
+
+
+class AnthropicBatchClient:
+    """Anthropic Message Batches API: the payload's requests are sent in the create call."""
+
+    service = "anthropic"
+
+    def __init__(self, base_url, settings):
+        self.base_url = base_url.rstrip("/")
+        self.settings = settings
+
+    def _headers(self):
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+        return {"x-api-key": api_key, "anthropic-version": "2023-06-01"}
+
+    def request_line(self, cell_id, prompt, model, temperature, params):
+        return {"custom_id": cell_id, "params": anthropic_request_body(prompt, model, temperature, params)}
+
+    def submit(self, payload_path):
+        with open(payload_path, "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        batch = _checked(HTTP_POOL.post(self.service, f"{self.base_url}/messages/batches", headers=self._headers(),
+                                        timeout=300, json={"requests": requests}))
+        return batch.json()["id"]
+
+    def poll(self, batch_id):
+        info = _checked(HTTP_POOL.get(self.service, f"{self.base_url}/messages/batches/{batch_id}",
+                                      headers=self._headers(), timeout=60)).json()
+        return info["processing_status"], info["processing_status"] == "ended", info
+
+    def results(self, info):
+        if not info.get("results_url"):
+            return
+        content = _checked(HTTP_POOL.get(self.service, info["results_url"], headers=self._headers(), timeout=300))
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            result = item.get("result") or {}
+            if result.get("type") == "succeeded":
+                stats = {"status": 200}
+                yield item["custom_id"], read_anthropic_response(result["message"], stats), None, stats
+            elif result.get("type") == "errored":
+                error = result.get("error") or {}
+                yield item["custom_id"], None, _error_text(error.get("error", error)), {"status": None}
+
+
+BATCH_CLIENTS = {
+    "openai": OpenAIBatchClient,
+    "anthropic": AnthropicBatchClient,
+}
+
+
+def batch_client(service, settings):
+    return BATCH_CLIENTS[service](settings["base_urls"][service], settings)
+
+
+class BatchLedger:
+    """
+    JSON record of the submitted batches and the specs of their experiments.
+    A batch keeps its cells ({custom id: [experiment, temperature, iteration]})
+    until its results are ingested.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, "ledger.json")
+        self._lock = threading.Lock()
+        self._data = {"batches": [], "specs": {}}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+
+    def open_batches(self):
+        return [batch for batch in self._data["batches"] if batch["state"] != INGESTED]
+
+    def in_flight(self):
+        """Cells of the batches not ingested yet, as (experiment, temperature label, iteration)."""
+        return {tuple(cell) for batch in self.open_batches() for cell in batch["cells"].values()}
+
+    def spec_for(self, exp_key):
+        return self._data["specs"].get(exp_key)
+
+    def payload_path(self, service, model):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        name = f"{service}-{model}".replace("/", "_")
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{name}-{stamp}.jsonl")
+
+    def add(self, batch_id, service, model, payload_path, cells, specs):
+        with self._lock:
+            self._data["specs"].update(specs)
+            self._data["batches"].append({
+                "id": batch_id,
+                "service": service,
+                "model": model,
+                "payload": os.path.basename(payload_path),
+                "requests": len(cells),
+                "submitted": datetime.now().isoformat(timespec="seconds"),
+                "state": SUBMITTED,
+                "status": None,
+                "cells": cells,
+            })
+            self._save()
+
+    def update(self, batch, **fields):
+        with self._lock:
+            batch.update(fields)
+            if batch["state"] == INGESTED:
+                batch["cells"] = {}
+            self._save()
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,235 @@
+"""
+Throughput benchmark of the framework itself, run against the mock provider
+(see mock_provider.py), so changes to the hot path can be measured without
+API calls.
+
+    python benchmark.py                              # every scenario
+    python benchmark.py --scenario async --scale 2   # one scenario, twice the iterations
+    python benchmark.py --save baseline.json
+    python benchmark.py --baseline baseline.json     # exit code 1 on a regression
+
+Every scenario runs main.run_experiments() in a fresh process, on a
+throwaway results directory, with its own RUN_CONFIG and mock profile, and
+reports:
+
+    calls/s        finished cells per second of wall time
+    overhead       per call, its latency minus the mock's simulated latency
+                   (p50 / p95, ms): the time the framework adds around a call
+    utilisation    simulated latency / (wall time * max_in_flight): how busy
+                   the in-flight slots were kept
+    peak RSS       peak resident memory of the run (MB)
+    write time     seconds spent saving experiments and writing the workbooks
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCENARIOS = {
+    "sequential": {
+        "description": "one call at a time, fixed 2 ms calls",
+        "run_config": {"execution_mode": "sequential"},
+        "profile": {"latency": {"distribution": "fixed", "value": 0.002},
+                    "response_chars": {"distribution": "fixed", "value": 800}},
+        "experiments": 2, "temperatures": 11, "iterations": 10,
+    },
+    "async": {
+        "description": "64 in flight over 4 experiments, lognormal 20 ms calls",
+        "run_config": {"execution_mode": "async", "max_in_flight": 64, "max_concurrent_experiments": 4},
+        "profile": {"latency": {"distribution": "lognormal", "median": 0.02, "sigma": 0.5}},
+        "experiments": 8, "temperatures": 11, "iterations": 20,
+    },
+    "faults": {
+        "description": "async with 5% errors and 429 bursts, retried with backoff",
+        "run_config": {"execution_mode": "async", "max_in_flight": 32, "max_concurrent_experiments": 2,
+                       "retry": {"max_attempts": 10, "base_delay": 0.01, "max_delay": 0.1}},
+        "profile": {"latency": {"distribution": "lognormal", "median": 0.01, "sigma": 0.5}, "error_rate": 0.05,
+                    "rate_limit": {"every": 200, "burst": 10, "retry_after": 0.05}},
+        "experiments": 4, "temperatures": 11, "iterations": 10,
+    },
+    "long_responses": {
+        "description": "async, ~20k-character responses (store and workbook writes)",
+        "run_config": {"execution_mode": "async", "max_in_flight": 32},
+        "profile": {"latency": {"distribution": "fixed", "value": 0.005},
+                    "response_chars": {"distribution": "lognormal", "median": 20000, "sigma": 0.3, "max": 32000}},
+        "experiments": 2, "temperatures": 6, "iterations": 10,
+    },
+}
+
+# A metric regresses when it is worse than the baseline by more than the
+# tolerance (relative) and by more than its noise floor (absolute).
+METRICS = {
+    "calls_per_sec": {"higher_is_better": True, "floor": 0.0},
+    "overhead_p95_ms": {"higher_is_better": False, "floor": 1.0},
+    "peak_rss_mb": {"higher_is_better": False, "floor": 20.0},
+    "write_seconds": {"higher_is_better": False, "floor": 0.2},
+}
+
+
+def build_experiments(scenario, scale):
+    step = 1.0 / max(1, scenario["temperatures"] - 1)
+    return [{
+        "prompt": f"Benchmark prompt {i}: " + "x" * 200,
+        "model": "mock/bench",
+        "temperature_range": {"start": 0.0, "end": 1.0, "step": step},
+        "iterations": max(1, int(scenario["iterations"] * scale)),
+        "output_file": f"bench_{i % 2}.xlsx",
+    } for i in range(scenario["experiments"])]
+
+
+def timed(fn, totals):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            totals[0] += time.perf_counter() - start
+    return wrapper
+
+
+def run_scenario(name, scale):
+    """Runs one scenario in this process and returns its metrics."""
+    import main
+
+    scenario = SCENARIOS[name]
+    results_dir = tempfile.mkdtemp(prefix="llm-benchmark-")
+    run_config = {"on_error": "retry", "journal": True, "result_store": True, "excel_output": True}
+    run_config.update(scenario["run_config"])
+    main.RUN_CONFIG = run_config
+    main.EXPERIMENTS = build_experiments(scenario, scale)
+    main.MOCK_PROFILES = {"bench": dict(scenario["profile"], seed=0)}
+    main.RATE_LIMITS = {}
+    main.RESPONSE_CACHE_CONFIG = {"enabled": False}
+    main.get_results_dir = lambda: results_dir
+    write_time = [0.0]
+    main.save_experiment = timed(main.save_experiment, write_time)
+    main.finish_workbooks = timed(main.finish_workbooks, write_time)
+
+    try:
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            main.run_experiments(unattended=True)
+        wall = time.perf_counter() - start
+
+        records = []
+        for path in glob.glob(os.path.join(results_dir, "*.calls.jsonl")):
+            with open(path, "r", encoding="utf-8") as f:
+                records.extend(json.loads(line) for line in f)
+    finally:
+        shutil.rmtree(results_dir, ignore_errors=True)
+
+    succeeded = [r for r in records if r["ok"]]
+    overhead = [max(0.0, r["latency"] - (r.get("simulated_latency") or 0.0)) * 1000 for r in records]
+    simulated = sum(r.get("simulated_latency") or 0.0 for r in records)
+    in_flight = run_config.get("max_in_flight", 8) if run_config.get("execution_mode") == "async" else 1
+    peak_rss = None
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {
+        "scenario": name,
+        "cells": len(succeeded),
+        "calls": len(records),
+        "errors": len(records) - len(succeeded),
+        "wall_seconds": wall,
+        "calls_per_sec": len(succeeded) / wall if wall > 0 else None,
+        "overhead_p50_ms": float(np.percentile(overhead, 50)) if overhead else None,
+        "overhead_p95_ms": float(np.percentile(overhead, 95)) if overhead else None,
+        "utilisation": simulated / (wall * in_flight) if wall > 0 else None,
+        "peak_rss_mb": peak_rss,
+        "write_seconds": write_time[0],
+    }
+
+
+def run_isolated(name, scale):
+    """Runs a scenario in a child process, so module state and peak memory are its own."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        out_path = f.name
+    try:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, "--scale", str(scale), "--out", out_path],
+                       check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        with open(out_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(out_path)
+
+
+def format_result(result):
+    def fmt(value, spec):
+        return "n/a" if value is None else format(value, spec)
+    return (f"{result['scenario']:<15} {result['cells']:>6} cells {result['errors']:>4} errors | "
+            f"{fmt(result['calls_per_sec'], '8.1f')} calls/s | overhead p50 {fmt(result['overhead_p50_ms'], '6.2f')} ms "
+            f"p95 {fmt(result['overhead_p95_ms'], '6.2f')} ms | utilisation {fmt(result['utilisation'], '5.1%')} | "
+            f"peak RSS {fmt(result['peak_rss_mb'], '6.1f')} MB | writes {fmt(result['write_seconds'], '5.2f')} s")
+
+
+def regressions(result, baseline, tolerance):
+    """Returns a description of every metric that is worse than the baseline's."""
+    found = []
+    for metric, rule in METRICS.items():
+        now, before = result.get(metric), baseline.get(metric)
+        if now is None or before is None:
+            continue
+        if rule["higher_is_better"]:
+            worse = now < before * (1 - tolerance) and before - now > rule["floor"]
+        else:
+            worse = now > before * (1 + tolerance) and now - before > rule["floor"]
+        if worse:
+            found.append(f"{result['scenario']}: {metric} {now:.2f} (baseline {before:.2f})")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the framework's own throughput against the mock provider.")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                        help="Scenario to run (repeatable; default: all).")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies every scenario's iterations.")
+    parser.add_argument("--save", default=None, help="Write the results to this JSON file (e.g. a new baseline).")
+    parser.add_argument("--baseline", default=None, help="Compare against a saved results file; exit 1 on a regression.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown against the baseline.")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--out", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(run_scenario(args.child, args.scale), f)
+        sys.exit(0)
+
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        print(f"Running {name}: {SCENARIOS[name]['description']} ...")
+        results[name] = run_isolated(name, args.scale)
+        print("   " + format_result(results[name]))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        found = []
+        for name, result in results.items():
+            if name in baseline:
+                found += regressions(result, baseline[name], args.tolerance)
+        if found:
+            print("\nRegressions against " + args.baseline + ":")
+            for line in found:
+                print("   " + line)
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
@@ -0,0 +1,171 @@
+"""
+Per-call instrumentation for experiment runs.
+
+Every request attempt produces a structured call record (latency, queue wait,
+attempt number, HTTP status, token usage, bytes, streaming timings) that is
+appended to results/<output_file>.calls.jsonl. At the end of each experiment
+the records are summarised (p50/p95 latency, tokens/s, calls/min), printed,
+and stored in results/<output_file>.summary.json under the sheet name.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Fields copied from the `stats` dict that the services fill in.
+STAT_FIELDS = [
+    "status", "cached", "request_bytes", "response_bytes",
+    "prompt_tokens", "completion_tokens", "reasoning_tokens",
+    "ttft", "tokens_per_sec", "rate_limit_wait",
+    "samples", "batched", "batch", "simulated_latency",
+    "hedged", "hedge_won", "endpoint", "degenerate",
+]
+
+
+def calls_path_for(output_file):
+    """results/foo.xlsx -> results/foo.calls.jsonl"""
+    return os.path.splitext(output_file)[0] + ".calls.jsonl"
+
+
+def summary_path_for(output_file):
+    """results/foo.xlsx -> results/foo.summary.json"""
+    return os.path.splitext(output_file)[0] + ".summary.json"
+
+
+def build_call_record(job, temp, iteration, attempt, queued_at, started_at, finished_at, stats, error=None):
+    """
+    Builds one call record. Times are time.monotonic() readings; queue wait
+    covers waiting for a worker slot (first attempt only) and for the rate limiter.
+    """
+    rate_limit_wait = stats.get("rate_limit_wait") or 0.0
+    slot_wait = max(0.0, started_at - queued_at) if attempt == 1 and queued_at is not None else 0.0
+    end_time = time.time()
+    record = {
+        "experiment": job["key"],
+        "model": job["model_full_name"],
+        "temperature": f"{float(temp):.2f}",
+        "iteration": iteration,
+        "attempt": attempt,
+        "ok": error is None,
+        "error": None if error is None else str(error),
+        "started": datetime.fromtimestamp(end_time - (finished_at - started_at)).isoformat(timespec="milliseconds"),
+        "end_time": end_time,
+        "queue_wait": slot_wait + rate_limit_wait,
+        "latency": max(0.0, finished_at - started_at - rate_limit_wait),
+    }
+    for field in STAT_FIELDS:
+        record[field] = stats.get(field)
+    if error is not None and record["status"] is None:
+        record["status"] = getattr(getattr(error, "response", None), "status_code", None)
+    return record
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def summarize_calls(records):
+    """
+    Summarises a list of call records. Cache hits, cells served from another
+    call's samples (multi-sample) and batch-API results are counted but kept
+    out of the latency and throughput figures.
+    """
+    network = [r for r in records if not r.get("cached") and not r.get("batched") and not r.get("batch")]
+    succeeded = [r for r in network if r["ok"]]
+    latencies = [r["latency"] for r in succeeded]
+    completion_tokens = sum(r.get("completion_tokens") or 0 for r in succeeded)
+    busy_time = sum(latencies)
+
+    calls_per_min = None
+    if len(network) > 1:
+        first_start = min(r["end_time"] - r["latency"] for r in network)
+        span = max(r["end_time"] for r in network) - first_start
+        if span > 0:
+            calls_per_min = len(network) / span * 60
+
+    ttfts = [r["ttft"] for r in succeeded if r.get("ttft") is not None]
+    return {
+        "calls": len(records),
+        "network_calls": len(network),
+        "cache_hits": sum(1 for r in records if r.get("cached")),
+        "batched": sum(1 for r in records if r.get("batched") and not r.get("cached")),
+        "batch_results": sum(1 for r in records if r.get("batch")),
+        "hedged": sum(1 for r in network if r.get("hedged")),
+        "hedge_won": sum(1 for r in network if r.get("hedge_won")),
+        "hedge_rate": sum(1 for r in network if r.get("hedged")) / len(network) if network else None,
+        "errors": len(network) - len(succeeded) + sum(1 for r in records if r.get("batch") and not r["ok"]),
+        "retries": sum(1 for r in records if r["attempt"] > 1),
+        "degenerate": sum(1 for r in succeeded if r.get("degenerate")),
+        "latency_p50": _percentile(latencies, 50),
+        "latency_p95": _percentile(latencies, 95),
+        "ttft_p50": _percentile(ttfts, 50),
+        "queue_wait_mean": float(np.mean([r["queue_wait"] for r in network])) if network else None,
+        "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in succeeded),
+        "completion_tokens": completion_tokens,
+        "reasoning_tokens": sum(r.get("reasoning_tokens") or 0 for r in succeeded),
+        "tokens_per_sec": completion_tokens / busy_time if busy_time > 0 and completion_tokens else None,
+        "calls_per_min": calls_per_min,
+        "response_bytes": sum(r.get("response_bytes") or 0 for r in succeeded),
+    }
+
+
+def format_summary(summary):
+    def fmt(value, spec, unit=""):
+        return "n/a" if value is None else format(value, spec) + unit
+    batched = f"{summary['batched']} from multi-sample, " if summary.get("batched") else ""
+    if summary.get("batch_results"):
+        batched += f"{summary['batch_results']} from batches, "
+    hedged = f", {summary['hedged']} hedged ({summary['hedge_won']} won)" if summary.get("hedged") else ""
+    if summary.get("degenerate"):
+        hedged += f", {summary['degenerate']} stopped as degenerate"
+    return (f"{summary['network_calls']} calls ({summary['cache_hits']} cached, {batched}{summary['errors']} errors, "
+            f"{summary['retries']} retries{hedged}) | latency p50 {fmt(summary['latency_p50'], '.2f', 's')} "
+            f"p95 {fmt(summary['latency_p95'], '.2f', 's')} | {fmt(summary['tokens_per_sec'], '.1f')} tok/s | "
+            f"{fmt(summary['calls_per_min'], '.1f')} calls/min")
+
+
+class CallLog:
+    """
+    Thread-safe JSONL log of call records for one output file. Existing
+    records are loaded so summaries cover resumed experiments too.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._records = []
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._records.append(record)
+
+    def records_for(self, exp_key):
+        with self._lock:
+            return [r for r in self._records if r["experiment"] == exp_key]
+
+
+def save_summary(output_file, sheet_name, summary):
+    """Stores an experiment's summary under its sheet name in the summary JSON."""
+    path = summary_path_for(output_file)
+    summaries = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            summaries = json.load(f)
+    summaries[sheet_name] = summary
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,84 @@
+"""
+Per-model circuit breakers.
+
+A model that cannot serve the run (not a chat model, wrong name, no access)
+fails every cell the same way. After `threshold` consecutive hard failures
+(4xx responses other than 429, and ConfigurationErrors such as a missing
+API key) the model's breaker opens and its remaining cells fail at once with
+CircuitOpenError, without a request or a retry prompt. Transient errors
+(timeouts, 429, 5xx, truncated or malformed response bodies) neither trip
+the breaker nor reset it, and any success resets it. An open breaker stays
+open for the rest of the run.
+"""
+import threading
+
+DEFAULT_CIRCUIT_BREAKER_SETTINGS = {"threshold": 3}
+
+# Statuses that will fail the same way on every cell (429 is transient); 402 is out of credits.
+HARD_FAILURE_STATUSES = {400, 401, 402, 403, 404, 405, 410, 413, 422}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose breaker is open."""
+
+
+class ConfigurationError(ValueError):
+    """A call that cannot work as configured (missing API key, unknown service or parameter)."""
+
+
+def is_hard_failure(exc):
+    if isinstance(exc, ConfigurationError):
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status in HARD_FAILURE_STATUSES
+
+
+class CircuitBreakerRegistry:
+    """Consecutive hard-failure counts and open breakers, per (service, model)."""
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._open = {}
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        settings = dict(DEFAULT_CIRCUIT_BREAKER_SETTINGS, **(settings or {}))
+        with self._lock:
+            self.threshold = int(settings["threshold"])
+            self._failures = {}
+            self._open = {}
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def is_open(self, service, model):
+        return (service, model) in self._open
+
+    def check(self, service, model):
+        """Raises CircuitOpenError if the model's breaker is open."""
+        reason = self._open.get((service, model))
+        if reason is not None:
+            raise CircuitOpenError(f"{service}/{model} is disabled for this run: {reason}")
+
+    def record_success(self, service, model):
+        with self._lock:
+            self._failures.pop((service, model), None)
+
+    def record_failure(self, service, model, exc):
+        if not self.enabled or not is_hard_failure(exc):
+            return
+        with self._lock:
+            key = (service, model)
+            self._failures[key] = self._failures.get(key, 0) + 1
+            if self._failures[key] < self.threshold or key in self._open:
+                return
+            self._open[key] = f"{self._failures[key]} consecutive hard failures (last: {exc})"
+        print(f"      Circuit open for {service}/{model} after {self.threshold} consecutive hard failures; "
+              f"its remaining cells fail immediately. Last error: {exc}")
+
+    def open_breakers(self):
+        """{"service/model": reason} for every open breaker."""
+        with self._lock:
+            return {f"{service}/{model}": reason for (service, model), reason in self._open.items()}
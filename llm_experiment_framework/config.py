@@ -3,6 +3,207 @@ Central Configuration for LLM Experiments.
 Copy and paste the dictionary blocks in the EXPERIMENTS list to queue up new experiments.
 """
 
+RUN_CONFIG = {
+    # "sequential" runs one call at a time (the original behaviour).
+    # "async" fans each experiment's (temperature, iteration) cells out over a
+    # bounded pool of in-flight requests.
+    "execution_mode": "sequential",
+
+    # Async mode only: the maximum number of requests in flight at once,
+    # shared by every experiment that is running.
+    "max_in_flight": 8,
+
+    # Async mode only: how many experiments may run side by side.
+    # Their sheets are still written one at a time.
+    "max_concurrent_experiments": 1,
+
+    # Append every response to results/<output_file>.journal.jsonl as soon as it
+    # arrives. A crashed or quit run resumes from the journaled cells.
+    "journal": True,
+
+    # Stream responses (SSE / NDJSON) instead of waiting for the full body.
+    # Records time-to-first-token and tokens/sec in the call log, and journals the
+    # text generated so far every "partial_flush_seconds" while a call runs.
+    "stream": False,
+    "partial_flush_seconds": 10,
+
+    # Streaming only: cancel generations that degenerate into loops (repeated
+    # n-grams or collapsed character entropy, see degeneration.py) and record
+    # the text so far with a "[DEGENERATE: ...]" marker. Saves the time and
+    # tokens of high-temperature runaways that would run to the length limit.
+    "degeneration_guard": {"enabled": False, "min_chars": 2000, "max_repeat": 0.5, "min_entropy": 2.0},
+
+    # Write each finished experiment to the Parquet result store in results/store
+    # (full, untruncated responses plus metadata; needs pyarrow). The Excel
+    # workbooks are then assembled from the store in one pass at the end of the
+    # run; "excel_output": False skips that, and `python main.py --export-excel`
+    # rebuilds them at any time.
+    "result_store": True,
+    "excel_output": True,
+
+    # Ask for up to this many samples per call from services that take a sample
+    # count (OpenAI, OpenRouter, LM Studio: "n"; Google: "candidateCount") and
+    # share them out over the iteration slots of a temperature. Models that
+    # ignore or reject it fall back to one call per iteration. 1 turns it off.
+    "samples_per_call": 1,
+
+    # Shared SQLite work queue for `main.py enqueue` / `main.py worker` /
+    # `main.py collect`, relative to llm_experiment_framework/ unless absolute.
+    # Put it on a disk every worker machine can reach.
+    "work_queue": "results/work_queue.sqlite3",
+
+    # `python main.py batch`: OpenAI and Anthropic experiments go through the
+    # providers' batch APIs (results within the completion window, at lower
+    # cost). Batches are polled every "poll_seconds" and hold at most
+    # "max_requests" cells. "base_urls" can point at a local stand-in
+    # (python batch_standin.py) to try the flow offline.
+    "batch": {
+        "poll_seconds": 60,
+        "max_requests": 10000,
+        # "base_urls": {"openai": "http://127.0.0.1:8090/v1", "anthropic": "http://127.0.0.1:8090/v1"},
+    },
+
+    # Run the queue breadth-first: every experiment gets "first_round"
+    # iterations per temperature, then each round multiplies that by "growth"
+    # until the experiment's full iteration count. Results are saved and the
+    # workbooks rebuilt after every round, so a stopped run still has a
+    # complete low-resolution grid for every model. --progressive turns it on.
+    "progressive": {"enabled": False, "first_round": 2, "growth": 2},
+
+    # Probe every queued model once before the run (in parallel) and drop the
+    # experiments of models that fail: wrong name, no access, or not a chat
+    # model (embedding models, safety classifiers). `main.py preflight` runs
+    # only the probes; --no-preflight skips them.
+    "preflight": True,
+
+    # After "threshold" consecutive hard failures (4xx other than 429, missing
+    # keys) a model's remaining cells fail at once instead of being sent.
+    # 0 turns the breaker off.
+    "circuit_breaker": {"threshold": 3},
+
+    # Hedged requests: once a model has "min_samples" calls, a call still running
+    # after the model's "percentile" latency (at least "min_delay" s) gets a
+    # duplicate and the first answer wins. At most "budget" of a model's calls
+    # are hedged. The first of two answers tends to be the shorter one, so
+    # hedged cells lean short; they are marked "hedged" in the call log.
+    "hedging": {"enabled": False, "percentile": 95, "min_samples": 20, "budget": 0.05, "min_delay": 2.0},
+
+    # What to do when a call fails:
+    # "prompt" pauses and asks whether to retry, skip or quit (the original behaviour).
+    # "retry" runs unattended: transient errors are retried with exponential
+    # backoff and jitter; cells that still fail are written as SKIPPED_ERROR and
+    # recorded in results/<output_file>.failed.jsonl for `python main.py --retry-failed`.
+    "on_error": "prompt",
+
+    # Unattended mode only: attempts per cell and the backoff bounds in seconds.
+    "retry": {"max_attempts": 5, "base_delay": 2.0, "max_delay": 120.0},
+}
+
+# Per-provider request pacing. Each (service, model) gets an adaptive token
+# bucket that starts at "initial_rate" requests/second, ramps up after every
+# success until "max_rate", and backs off on 429s and Retry-After headers.
+# Keys are a service ("openrouter") or a full "service/model" for one model.
+# Unlisted services use the defaults in rate_limiter.py. Optional fields:
+# "min_rate", "burst", "ramp_step", "backoff_factor".
+RATE_LIMITS = {
+    "openrouter": {"initial_rate": 2.0, "max_rate": 20.0},
+    # "openrouter/deepseek/deepseek-r1-0528:free": {"initial_rate": 0.2, "max_rate": 0.33},
+}
+
+# Request quotas of free-tier models, per "service/model" (globs allowed).
+# Requests are counted per minute and per UTC day, and the counts are kept
+# in results/quota.json across runs. A cell over quota waits for its window
+# without taking a request slot, so paid experiments keep running; if the
+# window reopens more than "max_wait" seconds away, the cell is left for the
+# next run. Free models get no hedged requests. See quota.py.
+MODEL_QUOTAS = {
+    "openrouter/*:free": {"per_minute": 20, "per_day": 50},   # 1000/day once the account has $10 of credits
+    "max_wait": 300,
+}
+
+# Keep-alive connection pools, one per provider base URL. "pool_size" should be
+# at least RUN_CONFIG["max_in_flight"] for providers used in async mode.
+# "http2": True multiplexes requests over HTTP/2 when httpx and h2 are installed
+# (pip install "httpx[http2]"); otherwise HTTP/1.1 keep-alive is used.
+# "connect_timeout" and "read_timeout" (seconds) bound every request; the read
+# timeout is the longest wait for the headers or between chunks of the body.
+# "call_timeout" caps the whole of a non-streamed call (None for no cap). A
+# timed-out call is retried like any transient error.
+HTTP_POOLS = {
+    "default": {"pool_size": 16, "connect_timeout": 10, "read_timeout": 600, "call_timeout": 900},
+    "openrouter": {"pool_size": 32, "http2": True},
+    "openai": {"pool_size": 16, "http2": True},
+}
+
+# On-disk response cache, addressed by (service, model, prompt, temperature,
+# iteration slot). When enabled, re-running an overlapping experiment reuses the
+# cached response for each slot instead of drawing a new sample, including in
+# other output files, so replication runs would repeat earlier samples. Off by
+# default; the journal already resumes interrupted runs. The "replay" service
+# serves only from this cache (enable it first), e.g.
+# "model": "replay/openrouter/x-ai/grok-3-mini".
+RESPONSE_CACHE_CONFIG = {
+    "enabled": False,
+    "directory": "cache",   # relative to llm_experiment_framework/
+    "max_size_mb": 1024,    # least recently used entries are evicted past this size
+}
+
+# Local Ollama models. Queued Ollama experiments are grouped by model so each
+# model is loaded once; every request sends "keep_alive" so the model stays
+# loaded between calls, and "options" are passed to the model (the experiment's
+# temperature is added to them). "num_parallel" should match the server's
+# OLLAMA_NUM_PARALLEL: that many cells of an Ollama experiment run at once.
+# "preload_next" loads the next model while the last cells of the current one
+# finish; "unload_finished" frees a model once all its experiments are done.
+OLLAMA_CONFIG = {
+    "keep_alive": "30m",
+    "options": {},          # e.g. {"num_ctx": 8192}
+    "num_parallel": 4,
+    "preload_next": True,
+    "unload_finished": True,
+}
+
+# Several machines serving the same local models. Each Ollama / LM Studio
+# call goes to the least-loaded healthy server that has the model loaded
+# (spilling over to servers that only have it installed once those are
+# busy); a server that fails is left out for "cooldown_seconds". Empty lists
+# use OLLAMA_BASE_URL / LMSTUDIO_API_ENDPOINT from .env, which may also be
+# comma-separated lists. See endpoint_pool.py.
+LOCAL_ENDPOINTS = {
+    "ollama": [],           # e.g. ["http://gpu1:11434", "http://gpu2:11434"]
+    "lmstudio": [],         # e.g. ["http://gpu1:1234", "http://gpu3:1234"]
+    "refresh_seconds": 60,  # how often each server's model list is re-read
+    "cooldown_seconds": 30,
+}
+
+# Profiles of the in-process mock provider, used as "model": "mock/<profile>"
+# to try runs without API calls (and by benchmark.py). Each profile sets the
+# latency and response-length distributions, the error rate and 429 bursts;
+# see mock_provider.py. "mock/default" is always available.
+MOCK_PROFILES = {
+    "fast": {"latency": {"distribution": "lognormal", "median": 0.05, "sigma": 0.5}},
+    "flaky": {
+        "latency": {"distribution": "uniform", "low": 0.2, "high": 1.5},
+        "error_rate": 0.05,
+        "rate_limit": {"every": 100, "burst": 10, "retry_after": 2.0},
+    },
+}
+
+# Each entry may also sweep other sampling parameters (top_p, top_k, seed,
+# max_tokens, system_prompt) with a "sweep": a dict of axis -> values (or a
+# {"start", "end", "step"} range) runs the Cartesian product, a list of dicts
+# runs just those points. Every point gets its own sheet. See sweep.py.
+#     "sweep": {"top_p": [0.8, 0.95, 1.0], "seed": {"start": 1, "end": 3, "step": 1}},
+#     "sweep": [{"system_prompt": "Answer briefly."}, {"max_tokens": 512}],
+# An "adaptive" block replaces the uniform temperature grid: a coarse pass,
+# then the call "budget" goes where accuracy changes fastest or is least
+# certain ("iterations" caps the calls per temperature). Responses are scored
+# against "expected" with a built-in or "module:function" extractor and scorer.
+# See adaptive.py for all settings.
+#     "adaptive": {"budget": 120, "expected": "1/2 tan^2(ln x) + ln|cos(ln x)| + C", "scorer": "contains"},
+# "early_stop" keeps the grid but stops a temperature once the interval on its
+# accuracy is narrower than "max_width"; skipped slots read SKIPPED_EARLY_STOP.
+#     "early_stop": {"expected": "...", "min_iterations": 5, "max_width": 0.3, "interval": "wilson"},
 EXPERIMENTS = [
     {
         "prompt": "Solve the following integral: ∫((tan(ln(x)))^3)/x dx.",
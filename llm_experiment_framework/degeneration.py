@@ -0,0 +1,98 @@
+"""
+Streaming guard against degenerate generations.
+
+At high temperatures many models fall into loops, or into a trickle of a
+few characters, and keep going until they hit the length limit. Those are
+the most expensive cells of a sweep. With streaming on, the guard watches
+the last `window_chars` of the answer every `check_every` characters (once
+there are `min_chars`) for two signs:
+
+    repetition   the share of repeated word n-grams (character n-grams for
+                 text without spaces) is above `max_repeat`
+    collapse     the character entropy is below `min_entropy` bits per
+                 character (ordinary prose has about 4)
+
+When either holds for `patience` checks in a row, the request is cancelled
+and the text so far is recorded, prefixed with a "[DEGENERATE: ...]" marker
+that gives the reason and the length at which it was stopped.
+"""
+import math
+from collections import Counter
+
+DEFAULT_GUARD_SETTINGS = {
+    "enabled": False,
+    "min_chars": 2000,
+    "window_chars": 3000,
+    "check_every": 500,
+    "ngram": 4,
+    "max_repeat": 0.5,
+    "min_entropy": 2.0,
+    "patience": 2,
+}
+
+DEGENERATE_PREFIX = "[DEGENERATE"
+
+
+class DegenerateOutput(Exception):
+    """Raised from the stream callback to cancel a degenerate generation."""
+
+
+def repeat_ratio(text, n):
+    """Share of the text's n-grams that repeat an earlier one (words, or characters without spaces)."""
+    tokens = text.split()
+    if len(tokens) < len(text) / 20:
+        tokens, n = list(text), n * 4
+    grams = [tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+    if not grams:
+        return 0.0
+    return 1.0 - len(set(grams)) / len(grams)
+
+
+def char_entropy(text):
+    """Shannon entropy of the text's characters, in bits per character."""
+    if not text:
+        return 0.0
+    counts = Counter(text)
+    return -sum(count / len(text) * math.log2(count / len(text)) for count in counts.values())
+
+
+def mark_degenerate(text, reason):
+    return f"{DEGENERATE_PREFIX}: {reason}; stopped at {len(text)} chars] {text}"
+
+
+def is_degenerate(response):
+    return isinstance(response, str) and response.startswith(DEGENERATE_PREFIX)
+
+
+class DegenerationGuard:
+    """Checks one streamed answer; feed() raises DegenerateOutput once it has degenerated."""
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_GUARD_SETTINGS, **(settings or {}))
+        self.parts = []
+        self.length = 0
+        self._next_check = self.settings["min_chars"]
+        self._strikes = 0
+
+    def check(self, window):
+        """The reason the window looks degenerate, or None."""
+        repeated = repeat_ratio(window, self.settings["ngram"])
+        if repeated > self.settings["max_repeat"]:
+            return f"{repeated:.0%} repeated {self.settings['ngram']}-grams"
+        entropy = char_entropy(window)
+        if entropy < self.settings["min_entropy"]:
+            return f"character entropy {entropy:.2f} bits"
+        return None
+
+    def feed(self, delta):
+        self.parts.append(delta)
+        self.length += len(delta)
+        if self.length < self._next_check:
+            return
+        self._next_check = self.length + self.settings["check_every"]
+        window = "".join(self.parts)[-self.settings["window_chars"]:]
+        self.parts = [window]
+        reason = self.check(window)
+        self._strikes = self._strikes + 1 if reason else 0
+        if self._strikes >= self.settings["patience"]:
+            raise DegenerateOutput(reason)
@@ -0,0 +1,188 @@
+"""
+Several local servers (Ollama or LM Studio) serving the same models.
+
+A service's endpoints come from LOCAL_ENDPOINTS in config.py, or from a
+comma-separated OLLAMA_BASE_URL / LMSTUDIO_API_ENDPOINT. Each call goes to
+the least-loaded healthy endpoint that has the model loaded. Once every such
+endpoint is busy (`slots` calls each, i.e. OLLAMA_NUM_PARALLEL), endpoints
+that only have the model installed take calls too, so one sweep spreads over
+every machine. Which models an endpoint has installed and loaded is refreshed
+every `refresh_seconds`.
+
+An endpoint that refuses connections, times out or answers with a 5xx is
+taken out of rotation for `cooldown_seconds` and then tried again. When every
+endpoint is cooling down, calls still go to the least-loaded one, so the
+error reaches the retry policy instead of the run stalling.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_ENDPOINT_SETTINGS = {"refresh_seconds": 60, "cooldown_seconds": 30}
+
+# Network failures that say the host (not the request) is in trouble.
+HOST_ERRORS = (requests.ConnectionError, requests.Timeout) + ((httpx.TransportError,) if httpx is not None else ())
+
+
+def model_tag(model):
+    """Ollama treats "gemma3" as "gemma3:latest"."""
+    return model if ":" in model else f"{model}:latest"
+
+
+def is_host_failure(exc):
+    if isinstance(exc, HOST_ERRORS):
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status is not None and status >= 500
+
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self.installed = None   # model tags, or None until listed
+        self.loaded = set()
+        self.listed_at = None
+
+    def healthy(self, now):
+        return now >= self.down_until
+
+
+class EndpointPool:
+    """
+    In-flight counts, health and model lists per endpoint, per local service.
+    `list_models(service, url)` returns (installed, loaded) model names for one
+    endpoint; `default_urls(service)` gives the endpoints when none are
+    configured.
+    """
+
+    def __init__(self, list_models, default_urls, settings=None):
+        self.list_models = list_models
+        self.default_urls = default_urls
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._slots = {}
+        self.configure(settings)
+
+    def configure(self, settings=None, slots=None):
+        """Applies LOCAL_ENDPOINTS; `slots` is {service: parallel calls per endpoint}."""
+        settings = dict(DEFAULT_ENDPOINT_SETTINGS, **(settings or {}))
+        with self._lock:
+            self.settings = settings
+            self._slots = dict(slots or {})
+            self._endpoints = {}
+            for service, urls in settings.items():
+                if isinstance(urls, (list, tuple)) and urls:
+                    self._endpoints[service] = [Endpoint(url.rstrip("/")) for url in urls]
+
+    def _for(self, service):
+        with self._lock:
+            if service not in self._endpoints:
+                self._endpoints[service] = [Endpoint(url.rstrip("/")) for url in self.default_urls(service)]
+            return self._endpoints[service]
+
+    def urls(self, service):
+        return [endpoint.url for endpoint in self._for(service)]
+
+    def count(self, service):
+        return len(self._for(service))
+
+    def _refresh(self, service, endpoint, now):
+        """Re-lists the endpoint's models when the list is stale (outside the lock)."""
+        if endpoint.listed_at is not None and now - endpoint.listed_at < self.settings["refresh_seconds"]:
+            return
+        if not endpoint.healthy(now):
+            return
+        endpoint.listed_at = now
+        try:
+            installed, loaded = self.list_models(service, endpoint.url)
+        except Exception as e:
+            self._mark_down(service, endpoint, e)
+            return
+        with self._lock:
+            endpoint.installed = {model_tag(model) for model in installed}
+            endpoint.loaded = {model_tag(model) for model in loaded}
+
+    def _mark_down(self, service, endpoint, exc):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.down_until = time.monotonic() + self.settings["cooldown_seconds"]
+        print(f"      {service} endpoint {endpoint.url} is unavailable ({exc}); "
+              f"out of rotation for {self.settings['cooldown_seconds']}s.")
+
+    def hosts_for(self, service, model):
+        """Endpoints that have the model installed (all of them if none is known to)."""
+        endpoints = self._for(service)
+        if len(endpoints) == 1:
+            return [endpoints[0].url]
+        now = time.monotonic()
+        for endpoint in endpoints:
+            self._refresh(service, endpoint, now)
+        tag = model_tag(model)
+        with self._lock:
+            having = [e.url for e in endpoints if e.installed is None or tag in e.installed or tag in e.loaded]
+        return having or [e.url for e in endpoints]
+
+    def _choose(self, service, model):
+        endpoints = self._for(service)
+        now = time.monotonic()
+        if len(endpoints) > 1:
+            for endpoint in endpoints:
+                self._refresh(service, endpoint, now)
+        tag = model_tag(model)
+        slots = self._slots.get(service)
+        with self._lock:
+            healthy = [e for e in endpoints if e.healthy(now)] or endpoints
+            loaded = [e for e in healthy if tag in e.loaded]
+            installed = [e for e in healthy if e.installed is None or tag in e.installed]
+            if loaded and (slots is None or min(e.in_flight for e in loaded) < slots):
+                candidates = loaded
+            else:
+                candidates = loaded + [e for e in installed if e not in loaded] or healthy
+            endpoint = min(candidates, key=lambda e: (e.in_flight, e.calls))
+            endpoint.in_flight += 1
+            endpoint.calls += 1
+            return endpoint
+
+    @contextmanager
+    def route(self, service, model, stats=None):
+        """Holds a slot on the chosen endpoint for the call; yields its base URL."""
+        endpoint = self._choose(service, model)
+        if stats is not None and self.count(service) > 1:
+            stats["endpoint"] = endpoint.url
+        try:
+            yield endpoint.url
+        except Exception as e:
+            if is_host_failure(e):
+                self._mark_down(service, endpoint, e)
+            raise
+        else:
+            with self._lock:
+                endpoint.loaded.add(model_tag(model))
+        finally:
+            with self._lock:
+                endpoint.in_flight -= 1
+
+    def mark_loaded(self, service, url, model, loaded=True):
+        """Records that a model was loaded on (or unloaded from) an endpoint."""
+        with self._lock:
+            for endpoint in self._endpoints.get(service, []):
+                if endpoint.url == url:
+                    (endpoint.loaded.add if loaded else endpoint.loaded.discard)(model_tag(model))
+
+    def report(self):
+        """{"service endpoint": "n calls, f failures[, down]"} when a service has several endpoints."""
+        now = time.monotonic()
+        with self._lock:
+            return {f"{service} {e.url}": f"{e.calls} calls, {e.failures} failures" + ("" if e.healthy(now) else ", down")
+                    for service, endpoints in self._endpoints.items() if len(endpoints) > 1 for e in endpoints}
@@ -0,0 +1,85 @@
+"""
+Concurrent execution engine for the experiment queue.
+
+The LLM service functions are blocking (they use `requests`), so the engine
+runs them on a thread pool driven from asyncio. A shared semaphore bounds the
+number of requests in flight across every experiment that is running.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExperimentAborted(Exception):
+    """Raised when the user chooses to quit the run from a retry prompt."""
+
+
+class Deferred:
+    """Returned by a cell function to run the cell again after `delay` seconds, without holding a slot meanwhile."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+
+class CellEngine:
+    """
+    Dispatches blocking cell calls onto a bounded pool of worker threads.
+
+    One engine is shared by every experiment in a run so that `max_in_flight`
+    is a global ceiling, regardless of how many experiments run side by side.
+    """
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.abort_event = threading.Event()
+        self.prompt_lock = threading.Lock()
+        self._pool = None
+        self._slots = None
+
+    async def __aenter__(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="cell")
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # On abort, do not wait for queued cells; in-flight HTTP calls finish on their own.
+        self._pool.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
+        self._pool = None
+
+    async def run_blocking(self, fn, *args):
+        """Runs fn(*args) on the worker pool once an in-flight slot is free."""
+        async with self._slots:
+            if self.abort_event.is_set():
+                raise ExperimentAborted()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, fn, *args)
+
+    async def map_cells(self, cells, cell_fn, cell_slots=None):
+        """
+        Runs cell_fn(cell) for every cell concurrently and returns a dict
+        mapping each cell to its result. The first exception cancels the rest.
+        An optional `cell_slots` semaphore further caps how many of these cells
+        (and of any other map_cells call sharing it) are in flight at once.
+        A cell whose function returns Deferred waits outside the slots and
+        runs again, so other cells use its slot in the meantime.
+        """
+        async def run_cell(cell):
+            while True:
+                if cell_slots is None:
+                    result = await self.run_blocking(cell_fn, cell)
+                else:
+                    async with cell_slots:
+                        result = await self.run_blocking(cell_fn, cell)
+                if not isinstance(result, Deferred):
+                    return result
+                await asyncio.sleep(result.delay)
+
+        tasks = [asyncio.ensure_future(run_cell(cell)) for cell in cells]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            self.abort_event.set()
+            for task in tasks:
+                task.cancel()
+            raise
+        return dict(zip(cells, results))
@@ -0,0 +1,155 @@
+"""
+Hedged requests against slow outliers.
+
+Each (service, model) keeps a rolling window of its recent call latencies.
+Once the window has `min_samples` calls, a call that is still running after
+the window's `percentile` latency (but at least `min_delay` seconds) gets a
+duplicate request, and whichever answer arrives first is used. The slower
+request is then cancelled: it stops at the next chunk of its body and closes
+its connection (see http_pool.cancellable), so it neither keeps a thread
+busy nor keeps generating at the provider once it notices the disconnect.
+
+Hedges cost extra calls, so they are capped by `budget`: at most that
+fraction of a model's calls may be hedged. Note that the first of two
+samples is more often the shorter one, so hedged cells lean towards short
+answers; the call log marks them ("hedged", "hedge_won") so they can be
+told apart. Local servers are never hedged: the duplicate would only queue
+behind the original on the same machine.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from http_pool import cancellable
+
+LOCAL_SERVICES = {"ollama", "lmstudio"}
+
+DEFAULT_HEDGING_SETTINGS = {
+    "enabled": False,
+    "percentile": 95,
+    "min_samples": 20,
+    "window": 200,
+    "budget": 0.05,
+    "min_delay": 2.0,
+}
+
+
+def _start(fn):
+    """
+    Runs fn() on its own thread and returns a Future for its result. Setting
+    the future's `cancel_event` cancels the HTTP call fn() is making.
+    """
+    future = Future()
+    future.cancel_event = threading.Event()
+
+    def target():
+        try:
+            with cancellable(future.cancel_event):
+                future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, daemon=True, name="hedge").start()
+    return future
+
+
+class HedgingPolicy:
+    """Latency windows, hedge budget and counters, per (service, model)."""
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        settings = dict(DEFAULT_HEDGING_SETTINGS, **(settings or {}))
+        with self._lock:
+            self.settings = settings
+            self._latencies = {}
+            self._counts = {}
+
+    def enabled_for(self, service):
+        return bool(self.settings["enabled"]) and service not in LOCAL_SERVICES
+
+    def _observe(self, key, latency):
+        with self._lock:
+            window = self._latencies.setdefault(key, deque(maxlen=int(self.settings["window"])))
+            window.append(latency)
+
+    def delay_for(self, service, model):
+        """Seconds after which a call is hedged, or None while the window is too small."""
+        with self._lock:
+            window = list(self._latencies.get((service, model), ()))
+        if len(window) < self.settings["min_samples"]:
+            return None
+        return max(self.settings["min_delay"], float(np.percentile(window, self.settings["percentile"])))
+
+    def _spend(self, key):
+        """Takes a hedge from the model's budget, if any is left."""
+        with self._lock:
+            counts = self._counts[key]
+            if counts["hedged"] + 1 > self.settings["budget"] * counts["calls"]:
+                return False
+            counts["hedged"] += 1
+            return True
+
+    def call(self, service, model, fn, stats, before_hedge=None):
+        """
+        Runs fn(call_stats) (one request) and returns its answer, hedging it
+        once it is slower than the model's delay. The winning request's stats
+        are copied into `stats`, with "hedged" / "hedge_won" set. If both
+        requests fail, the first request's error is raised.
+        """
+        key = (service, model)
+        with self._lock:
+            counts = self._counts.setdefault(key, {"calls": 0, "hedged": 0, "won": 0})
+            counts["calls"] += 1
+        delay = self.delay_for(service, model)
+
+        def timed(call_stats, prepare=None):
+            def run():
+                if prepare is not None:
+                    prepare()
+                started = time.monotonic()
+                result = fn(call_stats)
+                self._observe(key, time.monotonic() - started)
+                return result
+            return run
+
+        if delay is None:
+            return timed(stats)()
+
+        requests = {}
+        primary_stats = {}
+        primary = _start(timed(primary_stats))
+        requests[primary] = (primary_stats, False)
+        done, _ = wait([primary], timeout=delay)
+        if not done and self._spend(key):
+            hedge_stats = {}
+            requests[_start(timed(hedge_stats, before_hedge))] = (hedge_stats, True)
+            stats["hedged"] = True
+
+        pending = set(requests)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel_event.set()
+                    call_stats, is_hedge = requests[future]
+                    stats.update(call_stats)
+                    if is_hedge:
+                        stats["hedge_won"] = True
+                        with self._lock:
+                            counts["won"] += 1
+                    return future.result()
+        raise primary.exception()
+
+    def report(self):
+        """{"service/model": "hedged h of n calls (r%), w won"} for every model that was hedged."""
+        with self._lock:
+            return {f"{service}/{model}": f"hedged {counts['hedged']} of {counts['calls']} calls "
+                                          f"({counts['hedged'] / counts['calls']:.1%}), {counts['won']} won"
+                    for (service, model), counts in self._counts.items() if counts["hedged"]}
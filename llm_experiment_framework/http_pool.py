@@ -0,0 +1,198 @@
+"""
+Shared HTTP client layer for the LLM services.
+
+Keeps one keep-alive connection pool per base URL (scheme://host:port) so
+repeated calls to the same provider reuse TCP/TLS connections instead of
+paying a fresh handshake each time. Providers configured with "http2": True
+use an httpx client (HTTP/2 multiplexing) when httpx and h2 are installed,
+and fall back to a pooled requests.Session otherwise.
+
+Every request gets the provider's connect and read timeouts unless the
+caller passes its own, so a stuck connection fails (and is retried) instead
+of hanging the run. The read timeout bounds each wait for data: the answer's
+headers, and each gap between the chunks of its body. A non-streamed call
+also has a wall-clock `call_timeout`: its body is read in chunks and the call
+fails with CallTimeout once the whole call has taken longer, so a response
+that trickles keep-alive whitespace cannot hold a cell forever. Streamed
+calls are only bounded per chunk (their length is the generation's).
+
+A thread can make its calls cancellable (see `cancellable`): once the event
+is set, the call stops at the next chunk of the body, closes its connection
+and raises CallCancelled. Hedging uses this to stop the slower request.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_POOL_SETTINGS = {
+    "default": {"pool_size": 16, "http2": False, "connect_timeout": 10.0, "read_timeout": 600.0, "call_timeout": 900.0},
+}
+
+# Largest read of a non-streamed body; a chunked body is read chunk by chunk as it arrives.
+BODY_CHUNK_BYTES = 16384
+
+_cancel = threading.local()
+
+
+class CallTimeout(requests.Timeout):
+    """A non-streamed call took longer than its call_timeout; retried like any timeout."""
+
+
+class CallCancelled(Exception):
+    """The call was cancelled by its caller (e.g. the losing request of a hedge)."""
+
+
+@contextmanager
+def cancellable(event):
+    """Non-streamed calls made by this thread inside the block stop reading once `event` is set."""
+    _cancel.event = event
+    try:
+        yield
+    finally:
+        _cancel.event = None
+
+
+def base_url(url):
+    """Returns the scheme://host[:port] part of a URL, which identifies its pool."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class HTTPClientPool:
+    """
+    Lazily creates and caches one client per base URL. Settings are looked up
+    by service name, so every entry in SERVICE_MAP shares the same pools.
+    """
+
+    def __init__(self, settings=None):
+        self._settings = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        """Replaces the per-service settings and closes existing pools."""
+        merged = {key: dict(value) for key, value in DEFAULT_POOL_SETTINGS.items()}
+        for key, value in (settings or {}).items():
+            merged.setdefault(key, {}).update(value)
+        with self._lock:
+            self._close_clients()
+            self._settings = merged
+
+    def _settings_for(self, service):
+        settings = dict(self._settings["default"])
+        settings.update(self._settings.get(service, {}))
+        return settings
+
+    def _create_client(self, service):
+        settings = self._settings_for(service)
+        pool_size = int(settings["pool_size"])
+
+        if settings.get("http2"):
+            if httpx is None:
+                print(f"Warning: http2 requested for '{service}' but httpx is not installed. Using HTTP/1.1 keep-alive.")
+            else:
+                try:
+                    return httpx.Client(
+                        http2=True,
+                        timeout=None,
+                        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                    )
+                except ImportError:
+                    print(f"Warning: http2 requested for '{service}' but the 'h2' package is not installed. Using HTTP/1.1 keep-alive.")
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _timeout(self, service, client):
+        settings = self._settings_for(service)
+        # No single wait may outlast the whole call.
+        read_timeout = min(settings["read_timeout"], settings.get("call_timeout") or settings["read_timeout"])
+        if httpx is not None and isinstance(client, httpx.Client):
+            return httpx.Timeout(read_timeout, connect=settings["connect_timeout"])
+        return (settings["connect_timeout"], read_timeout)
+
+    def client_for(self, service, url):
+        key = base_url(url)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = self._create_client(service)
+            return self._clients[key]
+
+    def post(self, service, url, stream=False, **kwargs):
+        """
+        POSTs through the pooled client for url's base URL. With stream=True the
+        body is left unread so it can be consumed with iter_lines(); the caller
+        must close the response.
+        """
+        client = self.client_for(service, url)
+        kwargs.setdefault("timeout", self._timeout(service, client))
+        if stream:
+            return self._send(client, url, **kwargs)
+        started = time.monotonic()
+        response = self._send(client, url, **kwargs)
+        return self._read_body(response, started, self._settings_for(service).get("call_timeout"))
+
+    @staticmethod
+    def _send(client, url, **kwargs):
+        """POSTs and returns as soon as the headers are in, leaving the body unread."""
+        if httpx is not None and isinstance(client, httpx.Client):
+            return client.send(client.build_request("POST", url, **kwargs), stream=True)
+        return client.post(url, stream=True, **kwargs)
+
+    @staticmethod
+    def _read_body(response, started, call_timeout):
+        """
+        Reads a response body in chunks, raising CallTimeout once the call has
+        run for `call_timeout` seconds, or CallCancelled once the thread's
+        cancel event is set. Returns the response with its body loaded.
+        """
+        cancel = getattr(_cancel, "event", None)
+        is_httpx = httpx is not None and isinstance(response, httpx.Response)
+        chunks = []
+        try:
+            if cancel is not None and cancel.is_set():
+                raise CallCancelled("the call was cancelled")
+            for chunk in (response.iter_bytes() if is_httpx else response.iter_content(BODY_CHUNK_BYTES)):
+                chunks.append(chunk)
+                if cancel is not None and cancel.is_set():
+                    raise CallCancelled("the call was cancelled")
+                if call_timeout and time.monotonic() - started > call_timeout:
+                    raise CallTimeout(f"no complete answer within the call timeout of {call_timeout:g}s")
+        except BaseException:
+            response.close()
+            raise
+        # Hand the body over as if it had been read in one go (.content, .json() and .text use it),
+        # and give the connection back to the pool.
+        response._content = b"".join(chunks)
+        if not is_httpx:
+            response._content_consumed = True
+        response.close()
+        return response
+
+    def get(self, service, url, **kwargs):
+        """GETs through the pooled client for url's base URL."""
+        client = self.client_for(service, url)
+        kwargs.setdefault("timeout", self._timeout(service, client))
+        return client.get(url, **kwargs)
+
+    def _close_clients(self):
+        for client in self._clients.values():
+            client.close()
+        self._clients = {}
+
+    def close(self):
+        with self._lock:
+            self._close_clients()
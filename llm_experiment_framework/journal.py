@@ -0,0 +1,101 @@
+"""
+Append-only write-ahead journal of individual cell responses.
+
+Every successful (experiment, temperature, iteration) response is appended to a
+JSONL file and flushed to disk as soon as it arrives, so a crash or quit in the
+middle of an experiment loses at most the call that was in flight. On restart,
+main.py skips the journaled cells and builds the sheet from the journal.
+
+Streamed responses also journal their text so far every few seconds as
+"partial" entries, so a dropped connection keeps the generation up to that
+point. Partial entries never count as completed cells.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+
+def experiment_key(model_full_name, prompt, params=None):
+    """
+    Stable identifier for an experiment's (model, prompt) pair and its sweep
+    point's sampling parameters, if any. The temperature grid is deliberately
+    left out so a changed grid can reuse existing cells.
+    """
+    text = f"{model_full_name}\n{prompt}"
+    if params:
+        text += "\n" + json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def temperature_key(temp):
+    """Temperatures are journaled with the same 2-decimal label as the sheet columns."""
+    return f"{float(temp):.2f}"
+
+
+def journal_path_for(output_file):
+    """results/foo.xlsx -> results/foo.journal.jsonl"""
+    return os.path.splitext(output_file)[0] + ".journal.jsonl"
+
+
+class ResponseJournal:
+    """
+    Thread-safe JSONL journal. The whole file is indexed on open; a torn last
+    line from a crash is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("partial"):
+                    continue
+                self._entries[(entry["experiment"], entry["temperature"], entry["iteration"])] = entry
+
+    def get(self, exp_key, temp, iteration):
+        """Returns the journaled entry for a cell (1-based iteration), or None."""
+        return self._entries.get((exp_key, temperature_key(temp), iteration))
+
+    def record(self, exp_key, temp, iteration, response, **extra):
+        """Appends a cell response and forces it to disk before returning."""
+        entry = self._append(exp_key, temp, iteration, response, extra)
+        with self._lock:
+            self._entries[(exp_key, entry["temperature"], iteration)] = entry
+        return entry
+
+    def record_partial(self, exp_key, temp, iteration, text, **extra):
+        """Appends the text streamed so far for a cell that is still generating."""
+        return self._append(exp_key, temp, iteration, text, dict(extra, partial=True))
+
+    def _append(self, exp_key, temp, iteration, response, extra):
+        entry = {
+            "experiment": exp_key,
+            "temperature": temperature_key(temp),
+            "iteration": iteration,
+            "response": response,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        }
+        entry.update(extra)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        return entry
+
+    def completed_count(self, exp_key):
+        return sum(1 for key in self._entries if key[0] == exp_key)
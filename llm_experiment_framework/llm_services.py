@@ -1,7 +1,20 @@
 import os
-import requests
+import json
+import time
 from dotenv import load_dotenv
 from pathlib import Path
+from rate_limiter import RateLimiterRegistry
+from http_pool import HTTPClientPool
+from response_cache import ResponseCache, CacheMiss
+from streaming import StreamCollector, iter_sse_data, iter_ndjson
+from ollama_scheduler import OllamaScheduler
+from multi_sample import MultiSampler
+from mock_provider import MockProvider
+from circuit_breaker import CircuitBreakerRegistry, ConfigurationError
+from hedging import HedgingPolicy
+from endpoint_pool import EndpointPool
+from quota import QuotaBook
+from retry_policy import http_status_of
 
 # Load .env from the root of the repository
 # We look for .env in the parent directory of 'llm_experiment_framework'
@@ -12,13 +25,130 @@ else:
     # Fallback to standard search if root .env not found
     load_dotenv()
 
-def get_openrouter_response(prompt, model, temperature):
+# One adaptive token bucket per (service, model). main.py applies RATE_LIMITS from config.py.
+RATE_LIMITERS = RateLimiterRegistry()
+
+# Keep-alive connection pools, one per base URL, shared by every service.
+# main.py applies HTTP_POOLS from config.py.
+HTTP_POOL = HTTPClientPool()
+
+# On-disk response cache in front of get_llm_response. Disabled until main.py
+# applies RESPONSE_CACHE_CONFIG from config.py.
+RESPONSE_CACHE = ResponseCache()
+
+# Fails a model's remaining cells fast after repeated hard failures.
+# main.py applies RUN_CONFIG["circuit_breaker"].
+CIRCUIT_BREAKERS = CircuitBreakerRegistry()
+
+# Duplicates calls that run past the model's p95 latency. Off until main.py
+# applies RUN_CONFIG["hedging"].
+HEDGING = HedgingPolicy()
+
+# Per-minute and per-day request quotas of free-tier models, saved across runs.
+# main.py applies MODEL_QUOTAS from config.py.
+QUOTA_BOOK = QuotaBook()
+
+# Several iterations per call (OpenAI-style "n", Gemini "candidateCount").
+# Off until main.py applies RUN_CONFIG["samples_per_call"].
+MULTI_SAMPLER = MultiSampler()
+
+def _post(service, model, url, stats=None, **kwargs):
+    """
+    POSTs to a provider and reports the response (including 429s and rate-limit
+    headers) to the rate limiter before raising for HTTP errors.
+    The HTTP status and request/response sizes go into `stats` when given.
+    """
+    if stats is not None and "json" in kwargs:
+        stats["request_bytes"] = len(json.dumps(kwargs["json"]).encode("utf-8"))
+    response = HTTP_POOL.post(service, url, **kwargs)
+    RATE_LIMITERS.observe(service, model, response)
+    if stats is not None:
+        stats["status"] = response.status_code
+        if not kwargs.get("stream"):
+            stats["response_bytes"] = len(response.content)
+    try:
+        response.raise_for_status()
+    except Exception:
+        response.close()
+        raise
+    return response
+
+def _record_usage(stats, prompt_tokens=None, completion_tokens=None, reasoning_tokens=None):
+    """Stores the token counts a provider reported in `stats`."""
+    if stats is None:
+        return
+    stats["prompt_tokens"] = prompt_tokens
+    stats["completion_tokens"] = completion_tokens
+    stats["reasoning_tokens"] = reasoning_tokens
+
+def _chat_contents(res_json, n):
+    """The answer text, or with `n` the list of every returned choice's text."""
+    if n is None:
+        return res_json["choices"][0]["message"]["content"]
+    return [choice["message"]["content"] for choice in sorted(res_json["choices"], key=lambda choice: choice.get("index", 0))]
+
+def _record_chat_usage(stats, usage):
+    """Token usage in the OpenAI-compatible format (OpenRouter, OpenAI, LM Studio)."""
+    if usage:
+        details = usage.get("completion_tokens_details") or {}
+        _record_usage(stats, usage.get("prompt_tokens"), usage.get("completion_tokens"), details.get("reasoning_tokens"))
+
+# Request field names of the swept sampling parameters (see sweep.py), per API.
+# A parameter a provider does not accept is an error rather than silently ignored.
+CHAT_PARAM_FIELDS = {"top_p": "top_p", "top_k": "top_k", "seed": "seed", "max_tokens": "max_tokens"}
+OPENAI_PARAM_FIELDS = {"top_p": "top_p", "seed": "seed", "max_tokens": "max_completion_tokens"}
+ANTHROPIC_PARAM_FIELDS = {"top_p": "top_p", "top_k": "top_k", "max_tokens": "max_tokens"}
+GOOGLE_PARAM_FIELDS = {"top_p": "topP", "top_k": "topK", "seed": "seed", "max_tokens": "maxOutputTokens"}
+OLLAMA_PARAM_FIELDS = {"top_p": "top_p", "top_k": "top_k", "seed": "seed", "max_tokens": "num_predict"}
+
+def _apply_params(service, target, params, fields):
+    """Copies the sampling parameters (other than system_prompt) into a request body."""
+    for axis, value in (params or {}).items():
+        if axis == "system_prompt":
+            continue
+        if axis not in fields:
+            raise ConfigurationError(f"{service} does not support the '{axis}' sampling parameter")
+        target[fields[axis]] = value
+
+def _chat_messages(prompt, params):
+    """OpenAI-style messages, with the sweep's system prompt first if there is one."""
+    messages = [{"role": "user", "content": prompt}]
+    if params and params.get("system_prompt"):
+        messages.insert(0, {"role": "system", "content": params["system_prompt"]})
+    return messages
+
+def _stream_chat_completions(service, model, url, headers, data, on_chunk, stats):
+    """
+    Streams an OpenAI-compatible /chat/completions request (SSE) and returns the full text.
+    """
+    collector = StreamCollector(on_chunk, stats)
+    response = _post(service, model, url, stats=stats, headers=headers, json=dict(data, stream=True), stream=True)
+    try:
+        for event in iter_sse_data(response, stats):
+            if "error" in event:
+                raise Exception(f"{service} stream error: {event['error']}")
+            choices = event.get("choices") or []
+            if choices:
+                delta = choices[0].get("delta") or {}
+                if delta.get("content"):
+                    collector.add(delta["content"])
+                elif delta.get("reasoning") or delta.get("reasoning_content"):
+                    collector.mark_token()
+            if event.get("usage"):
+                _record_chat_usage(stats, event["usage"])
+                collector.completion_tokens = event["usage"].get("completion_tokens")
+    finally:
+        response.close()
+    return collector.finish()
+
+def get_openrouter_response(prompt, model, temperature, stream=False, on_chunk=None, stats=None, params=None, n=None):
     """
     Sends a prompt to the OpenRouter API and gets a response.
+    With stream=True the answer is read as SSE chunks and timing goes into `stats`.
     """
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
-        raise ValueError("OPENROUTER_API_KEY not found in environment variables")
+        raise ConfigurationError("OPENROUTER_API_KEY not found in environment variables")
         
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -26,64 +156,124 @@ def get_openrouter_response(prompt, model, temperature):
     }
     data = {
         "model": model,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": _chat_messages(prompt, params),
         "temperature": temperature
     }
-    response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data)
-    response.raise_for_status()
-    return response.json()["choices"][0]["message"]["content"]
+    _apply_params("openrouter", data, params, CHAT_PARAM_FIELDS)
+    if n is not None:
+        data["n"] = n
+    if stream:
+        return _stream_chat_completions("openrouter", model, "https://openrouter.ai/api/v1/chat/completions", headers, data, on_chunk, stats)
+    response = _post("openrouter", model, "https://openrouter.ai/api/v1/chat/completions", stats=stats, headers=headers, json=data)
+    res_json = response.json()
+    _record_chat_usage(stats, res_json.get("usage"))
+    return _chat_contents(res_json, n)
 
-def get_openai_response(prompt, model, temperature):
+def openai_request_body(prompt, model, temperature, params=None):
+    """The /chat/completions body of an OpenAI call (also used for batch requests)."""
+    data = {
+        "model": model,
+        "messages": _chat_messages(prompt, params),
+        "temperature": temperature
+    }
+    _apply_params("openai", data, params, OPENAI_PARAM_FIELDS)
+    return data
+
+def read_openai_response(res_json, stats=None, n=None):
+    """Records the usage of an OpenAI /chat/completions response and returns its text."""
+    _record_chat_usage(stats, res_json.get("usage"))
+    return _chat_contents(res_json, n)
+
+def get_openai_response(prompt, model, temperature, stream=False, on_chunk=None, stats=None, params=None, n=None):
     """
     Sends a prompt to the OpenAI API and gets a response.
+    With stream=True the answer is read as SSE chunks and timing goes into `stats`.
     """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
-        raise ValueError("OPENAI_API_KEY not found in environment variables")
+        raise ConfigurationError("OPENAI_API_KEY not found in environment variables")
 
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
+    data = openai_request_body(prompt, model, temperature, params)
+    if n is not None:
+        data["n"] = n
+    if stream:
+        data["stream_options"] = {"include_usage": True}
+        return _stream_chat_completions("openai", model, "https://api.openai.com/v1/chat/completions", headers, data, on_chunk, stats)
+    response = _post("openai", model, "https://api.openai.com/v1/chat/completions", stats=stats, headers=headers, json=data)
+    return read_openai_response(response.json(), stats, n)
+
+def anthropic_request_body(prompt, model, temperature, params=None):
+    """The /messages body of an Anthropic call (also used for batch requests)."""
     data = {
         "model": model,
+        "max_tokens": 4096,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": temperature
     }
-    response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data)
-    response.raise_for_status()
-    return response.json()["choices"][0]["message"]["content"]
+    if params and params.get("system_prompt"):
+        data["system"] = params["system_prompt"]
+    _apply_params("anthropic", data, params, ANTHROPIC_PARAM_FIELDS)
+    return data
 
-def get_anthropic_response(prompt, model, temperature):
+def read_anthropic_response(res_json, stats=None):
+    """Records the usage of an Anthropic /messages response and returns its text."""
+    usage = res_json.get("usage", {})
+    _record_usage(stats, usage.get("input_tokens"), usage.get("output_tokens"))
+    return res_json["content"][0]["text"]
+
+def get_anthropic_response(prompt, model, temperature, stream=False, on_chunk=None, stats=None, params=None):
     """
     Sends a prompt to the Anthropic API and gets a response.
+    With stream=True the answer is read as SSE events and timing goes into `stats`.
     """
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+        raise ConfigurationError("ANTHROPIC_API_KEY not found in environment variables")
 
     headers = {
         "x-api-key": api_key,
         "anthropic-version": "2023-06-01",
         "Content-Type": "application/json"
     }
-    data = {
-        "model": model,
-        "max_tokens": 4096,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": temperature
-    }
-    response = requests.post("https://api.anthropic.com/v1/messages", headers=headers, json=data)
-    response.raise_for_status()
-    return response.json()["content"][0]["text"]
+    data = anthropic_request_body(prompt, model, temperature, params)
+    if stream:
+        collector = StreamCollector(on_chunk, stats)
+        response = _post("anthropic", model, "https://api.anthropic.com/v1/messages", stats=stats, headers=headers, json=dict(data, stream=True), stream=True)
+        prompt_tokens = None
+        try:
+            for event in iter_sse_data(response, stats):
+                if event.get("type") == "error":
+                    raise Exception(f"Anthropic stream error: {event.get('error')}")
+                if event.get("type") == "content_block_delta":
+                    delta = event.get("delta", {})
+                    if delta.get("type") == "text_delta":
+                        collector.add(delta.get("text", ""))
+                    else:
+                        collector.mark_token()
+                elif event.get("type") == "message_start":
+                    prompt_tokens = event.get("message", {}).get("usage", {}).get("input_tokens")
+                elif event.get("type") == "message_delta" and "usage" in event:
+                    collector.completion_tokens = event["usage"].get("output_tokens")
+                    _record_usage(stats, prompt_tokens, collector.completion_tokens)
+        finally:
+            response.close()
+        return collector.finish()
 
-def get_google_response(prompt, model, temperature):
+    response = _post("anthropic", model, "https://api.anthropic.com/v1/messages", stats=stats, headers=headers, json=data)
+    return read_anthropic_response(response.json(), stats)
+
+def get_google_response(prompt, model, temperature, stream=False, on_chunk=None, stats=None, params=None, n=None):
     """
     Sends a prompt to the Google Gemini API and gets a response.
+    With stream=True the answer is read from :streamGenerateContent (SSE) and timing goes into `stats`.
     """
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables")
+        raise ConfigurationError("GOOGLE_API_KEY not found in environment variables")
 
     # Google's model names often don't have the 'models/' prefix in short form, 
     # but the API endpoint needs it if not present.
@@ -102,8 +292,34 @@ def get_google_response(prompt, model, temperature):
             "temperature": temperature,
         }
     }
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()
+    if params and params.get("system_prompt"):
+        data["systemInstruction"] = {"parts": [{"text": params["system_prompt"]}]}
+    _apply_params("google", data["generationConfig"], params, GOOGLE_PARAM_FIELDS)
+    if n is not None:
+        data["generationConfig"]["candidateCount"] = n
+    if stream:
+        stream_url = f"https://generativelanguage.googleapis.com/v1beta/{model_path}:streamGenerateContent?alt=sse&key={api_key}"
+        collector = StreamCollector(on_chunk, stats)
+        response = _post("google", model, stream_url, stats=stats, headers=headers, json=data, stream=True)
+        try:
+            for event in iter_sse_data(response, stats):
+                if "error" in event:
+                    raise Exception(f"Google API Error: {event['error'].get('message', event['error'])}")
+                for candidate in event.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("thought"):
+                            collector.mark_token()
+                        else:
+                            collector.add(part.get("text", ""))
+                if "usageMetadata" in event:
+                    usage = event["usageMetadata"]
+                    collector.completion_tokens = usage.get("candidatesTokenCount")
+                    _record_usage(stats, usage.get("promptTokenCount"), usage.get("candidatesTokenCount"), usage.get("thoughtsTokenCount"))
+        finally:
+            response.close()
+        return collector.finish()
+
+    response = _post("google", model, url, stats=stats, headers=headers, json=data)
     
     # Error handling for Google's specific response format
     res_json = response.json()
@@ -111,52 +327,231 @@ def get_google_response(prompt, model, temperature):
         if "error" in res_json:
             raise Exception(f"Google API Error: {res_json['error']['message']}")
         raise Exception(f"Google API Error: No candidates returned. Response: {res_json}")
-        
+
+    usage = res_json.get("usageMetadata", {})
+    _record_usage(stats, usage.get("promptTokenCount"), usage.get("candidatesTokenCount"), usage.get("thoughtsTokenCount"))
+
+    if n is not None:
+        return [candidate["content"]["parts"][0]["text"] for candidate in res_json["candidates"]]
     return res_json["candidates"][0]["content"]["parts"][0]["text"]
 
-def get_ollama_response(prompt, model, temperature):
+def _ollama_base_urls():
+    """The Ollama servers from the environment (OLLAMA_API_ENDPOINT or OLLAMA_BASE_URL, comma-separated)."""
+    # Try multiple common env var names for Ollama
+    urls = os.getenv("OLLAMA_API_ENDPOINT") or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    base_urls = []
+    for url in urls.split(","):
+        url = url.strip().rstrip("/")
+        # Strip /api/generate or /v1 so the other /api/ endpoints can be appended
+        if "/api/" in url:
+            url = url.rsplit("/api/", 1)[0]
+        elif url.endswith("/v1"):
+            url = url[:-3]
+        base_urls.append(url)
+    return base_urls
+
+def _lmstudio_base_urls():
+    """The LM Studio servers from the environment (LMSTUDIO_API_ENDPOINT, comma-separated)."""
+    urls = os.getenv("LMSTUDIO_API_ENDPOINT", "http://localhost:1234/v1/chat/completions")
+    return [url.strip().rstrip("/").split("/v1", 1)[0] for url in urls.split(",")]
+
+def list_local_models(service, base_url):
+    """Returns (installed, loaded) model names of one Ollama or LM Studio server."""
+    if service == "ollama":
+        tags = HTTP_POOL.get("ollama", f"{base_url}/api/tags", timeout=10)
+        tags.raise_for_status()
+        running = HTTP_POOL.get("ollama", f"{base_url}/api/ps", timeout=10)
+        running.raise_for_status()
+        return ([model["name"] for model in tags.json().get("models", [])],
+                [model["name"] for model in running.json().get("models", [])])
+    response = HTTP_POOL.get(service, f"{base_url}/v1/models", timeout=10)
+    response.raise_for_status()
+    models = [model["id"] for model in response.json().get("data", [])]
+    return models, models
+
+# Every Ollama and LM Studio server of the run, with in-flight counts and health.
+# main.py applies LOCAL_ENDPOINTS from config.py.
+ENDPOINT_POOL = EndpointPool(list_local_models, lambda service: _lmstudio_base_urls() if service == "lmstudio" else _ollama_base_urls())
+
+def load_ollama_model(model, keep_alive):
     """
-    Sends a prompt to the Ollama API and gets a response.
+    Loads a model into Ollama without generating anything (a request with no
+    prompt). keep_alive=0 unloads it instead. Either is done on every server
+    that has the model.
     """
-    # Try multiple common env var names for Ollama
-    endpoint = os.getenv("OLLAMA_API_ENDPOINT")
-    if not endpoint:
-        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        # If base_url ends with /v1, strip it for the /api/generate endpoint
-        if base_url.endswith("/v1"):
-            base_url = base_url[:-3]
-        elif base_url.endswith("/v1/"):
-            base_url = base_url[:-4]
-        
-        # Ensure it doesn't end with a slash before appending
-        base_url = base_url.rstrip("/")
-        endpoint = f"{base_url}/api/generate"
+    urls = ENDPOINT_POOL.urls("ollama") if keep_alive == 0 else ENDPOINT_POOL.hosts_for("ollama", model)
+    error = None
+    for url in urls:
+        try:
+            response = HTTP_POOL.post("ollama", f"{url}/api/generate", json={"model": model, "keep_alive": keep_alive})
+            response.raise_for_status()
+            ENDPOINT_POOL.mark_loaded("ollama", url, model, loaded=keep_alive != 0)
+        except Exception as e:
+            error = e
+    if error is not None:
+        raise error
 
+def show_ollama_model(model):
+    """Returns Ollama's /api/show details of a local model (raises for unknown models)."""
+    error = None
+    for url in ENDPOINT_POOL.hosts_for("ollama", model):
+        try:
+            response = HTTP_POOL.post("ollama", f"{url}/api/show", json={"model": model}, timeout=30)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            error = e
+    raise error
+
+# Groups the queue by local model, keeps the current model loaded and pre-loads
+# the next one. main.py applies OLLAMA_CONFIG from config.py.
+OLLAMA_SCHEDULER = OllamaScheduler(load_ollama_model, hosts=lambda: ENDPOINT_POOL.count("ollama"))
+
+def get_ollama_response(prompt, model, temperature, stream=False, on_chunk=None, stats=None, params=None):
+    """
+    Sends a prompt to the Ollama API and gets a response.
+    The temperature and swept sampling parameters go in "options" (Ollama
+    ignores top-level ones), next to the keep_alive and options from OLLAMA_CONFIG.
+    The call goes to the least-loaded Ollama server that has the model (see endpoint_pool.py).
+    With stream=True the answer is read as NDJSON chunks and timing goes into `stats`.
+    """
     data = {
         "model": model,
         "prompt": prompt,
-        "temperature": temperature,
-        "stream": False
+        "stream": stream
     }
-    response = requests.post(endpoint, json=data)
-    response.raise_for_status()
-    return response.json()["response"]
+    data.update(OLLAMA_SCHEDULER.request_fields(temperature))
+    if params and params.get("system_prompt"):
+        data["system"] = params["system_prompt"]
+    _apply_params("ollama", data["options"], params, OLLAMA_PARAM_FIELDS)
+    with ENDPOINT_POOL.route("ollama", model, stats) as base_url:
+        endpoint = f"{base_url}/api/generate"
+        if stream:
+            collector = StreamCollector(on_chunk, stats)
+            response = _post("ollama", model, endpoint, stats=stats, json=data, stream=True)
+            try:
+                for chunk in iter_ndjson(response, stats):
+                    if "error" in chunk:
+                        raise Exception(f"Ollama stream error: {chunk['error']}")
+                    if chunk.get("response"):
+                        collector.add(chunk["response"])
+                    elif chunk.get("thinking"):
+                        collector.mark_token()
+                    if chunk.get("done"):
+                        collector.completion_tokens = chunk.get("eval_count")
+                        _record_usage(stats, chunk.get("prompt_eval_count"), chunk.get("eval_count"))
+            finally:
+                response.close()
+            return collector.finish()
+
+        response = _post("ollama", model, endpoint, stats=stats, json=data)
+    res_json = response.json()
+    _record_usage(stats, res_json.get("prompt_eval_count"), res_json.get("eval_count"))
+    return res_json["response"]
 
-def get_lmstudio_response(prompt, model, temperature):
+def get_lmstudio_response(prompt, model, temperature, stream=False, on_chunk=None, stats=None, params=None, n=None):
     """
-    Sends a prompt to the LM Studio API and gets a response.
+    Sends a prompt to the LM Studio API and gets a response, from the
+    least-loaded LM Studio server that has the model (see endpoint_pool.py).
+    With stream=True the answer is read as SSE chunks and timing goes into `stats`.
     """
-    endpoint = os.getenv("LMSTUDIO_API_ENDPOINT", "http://localhost:1234/v1/chat/completions")
     headers = {"Content-Type": "application/json"}
     data = {
         "model": model,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": _chat_messages(prompt, params),
         "temperature": temperature,
         "stream": False
     }
-    response = requests.post(endpoint, headers=headers, json=data)
+    _apply_params("lmstudio", data, params, CHAT_PARAM_FIELDS)
+    if n is not None:
+        data["n"] = n
+    with ENDPOINT_POOL.route("lmstudio", model, stats) as base_url:
+        endpoint = f"{base_url}/v1/chat/completions"
+        if stream:
+            return _stream_chat_completions("lmstudio", model, endpoint, headers, data, on_chunk, stats)
+        response = _post("lmstudio", model, endpoint, stats=stats, headers=headers, json=data)
+    res_json = response.json()
+    _record_chat_usage(stats, res_json.get("usage"))
+    return _chat_contents(res_json, n)
+
+def get_replay_response(prompt, model, temperature, slot=0, params=None):
+    """
+    Serves a response from the response cache only, never from the network.
+    The model is the original "service/model", e.g. "replay/openrouter/x-ai/grok-3-mini".
+    """
+    if "/" not in model:
+        raise ConfigurationError(f"Replay model must be 'service/model', got: {model}")
+    if not RESPONSE_CACHE.enabled:
+        raise CacheMiss("The response cache is disabled; set \"enabled\": True in RESPONSE_CACHE_CONFIG to replay from it")
+    original_service, original_model = model.split("/", 1)
+    response = RESPONSE_CACHE.get(original_service, original_model, prompt, temperature, slot, params)
+    if response is None:
+        raise CacheMiss(f"No cached response for {model} at temperature {temperature:.2f}, slot {slot}")
+    return response
+
+# Simulated provider behind the "mock" service. main.py applies MOCK_PROFILES from config.py.
+MOCK_PROVIDER = MockProvider()
+
+def get_mock_response(prompt, model, temperature, stream=False, on_chunk=None, stats=None, params=None, n=None):
+    """
+    Answers from the in-process mock provider (see mock_provider.py); `model`
+    is a profile from MOCK_PROFILES. The simulated response is fed to the
+    rate limiter and raised on errors like an HTTP provider's.
+    With stream=True the text is handed to `on_chunk` in pieces.
+    """
+    collector = StreamCollector(on_chunk, stats) if stream else None
+    response = MOCK_PROVIDER.call(prompt, model, temperature, n=n, stats=stats)
+    RATE_LIMITERS.observe("mock", model, response)
+    if stats is not None:
+        stats["status"] = response.status_code
+        stats["response_bytes"] = len(response.content)
     response.raise_for_status()
-    return response.json()["choices"][0]["message"]["content"]
+    res_json = response.json()
+    _record_chat_usage(stats, res_json.get("usage"))
+    if stream:
+        text = _chat_contents(res_json, None)
+        for start in range(0, len(text), 64):
+            collector.add(text[start:start + 64])
+        collector.completion_tokens = res_json["usage"]["completion_tokens"]
+        return collector.finish()
+    return _chat_contents(res_json, n)
+
+def _get_multi_sampled(service, prompt, model, temperature, slot, last_slot, stats, params, slot_pending=None):
+    """
+    Serves a slot from the multi-sample pool, fetching several slots' samples
+    in one call when needed. Slots that are cached or for which
+    `slot_pending(slot)` is False get no sample. A model that rejects the
+    sample count (HTTP 400/422) falls back to single calls.
+    """
+    key = (service, model, prompt, f"{float(temperature):.2f}", json.dumps(params or {}, sort_keys=True))
+
+    def fetch(n):
+        QUOTA_BOOK.take(service, model)
+        wait_start = time.monotonic()
+        RATE_LIMITERS.acquire(service, model)
+        stats["rate_limit_wait"] = time.monotonic() - wait_start
+        if n == 1:
+            samples = [SERVICE_MAP[service](prompt, model, temperature, stats=stats, params=params)]
+        else:
+            try:
+                samples = SERVICE_MAP[service](prompt, model, temperature, stats=stats, params=params, n=n)
+            except Exception as e:
+                if http_status_of(e) not in (400, 422):
+                    raise
+                MULTI_SAMPLER.fall_back(service, model, f"rejected n={n} with HTTP {http_status_of(e)}")
+                samples = [SERVICE_MAP[service](prompt, model, temperature, stats=stats, params=params)]
+        stats["samples"] = len(samples)
+        return samples
+
+    def is_done(other_slot):
+        if slot_pending is not None and not slot_pending(other_slot):
+            return True
+        return RESPONSE_CACHE.get(service, model, prompt, temperature, other_slot, params) is not None
+
+    response, batched = MULTI_SAMPLER.take(key, slot, last_slot, fetch, is_done)
+    if batched:
+        stats["batched"] = True
+    return response
 
 # A dictionary to map service names to their functions
 SERVICE_MAP = {
@@ -166,16 +561,74 @@ SERVICE_MAP = {
     "google": get_google_response,
     "ollama": get_ollama_response,
     "lmstudio": get_lmstudio_response,
+    "replay": get_replay_response,
+    "mock": get_mock_response,
 }
 
-def get_llm_response(service, prompt, model, temperature):
+def get_llm_response(service, prompt, model, temperature, slot=None, stream=False, on_chunk=None, stats=None, params=None,
+                     last_slot=None, slot_pending=None):
     """
     A generic function to call the correct LLM service.
+
+    `params` holds the sampling parameters of a sweep point (top_p, top_k,
+    seed, max_tokens, system_prompt; see sweep.py).
+    With `last_slot` (the number of iterations) and RUN_CONFIG["samples_per_call"],
+    one call may fetch the samples of later slots too (see multi_sample.py);
+    `slot_pending(slot)`, when given, returns False for slots the caller
+    already has or will not run, so no samples are fetched for them.
+
+    When `slot` (the iteration index) is given, the response cache is consulted
+    first and fresh responses are stored under that slot.
+    With stream=True the provider streams its answer: `on_chunk(delta)` is called
+    for each piece of text. `stats`, when given, receives the call's HTTP status,
+    token usage, byte counts, rate-limit wait and (when streaming) ttft / tokens_per_sec.
     """
     service = service.lower()
     if service not in SERVICE_MAP:
-        raise ValueError(f"Unknown service: {service}. Supported: {list(SERVICE_MAP.keys())}")
+        raise ConfigurationError(f"Unknown service: {service}. Supported: {list(SERVICE_MAP.keys())}")
+
+    if stats is None:
+        stats = {}
+
+    if service == "replay":
+        stats["cached"] = True
+        return get_replay_response(prompt, model, temperature, slot or 0, params)
+
+    if slot is not None:
+        cached = RESPONSE_CACHE.get(service, model, prompt, temperature, slot, params)
+        if cached is not None:
+            stats["cached"] = True
+            return cached
+
+    # A model whose breaker is open fails at once (see circuit_breaker.py).
+    CIRCUIT_BREAKERS.check(service, model)
+    # A free-tier model over its quota raises QuotaDeferred before any request (see quota.py).
+    quota_limited = QUOTA_BOOK.limits(service, model) is not None
+    try:
+        if slot is not None and last_slot is not None and not stream and MULTI_SAMPLER.enabled_for(service, model):
+            response = _get_multi_sampled(service, prompt, model, temperature, slot, last_slot, stats, params, slot_pending)
+        else:
+            # For some services, we might want to keep the full model name or strip it
+            # Google likes 'gemini-1.5-pro', Anthropic likes 'claude-3-opus-20240229'
+            QUOTA_BOOK.take(service, model)
+            wait_start = time.monotonic()
+            RATE_LIMITERS.acquire(service, model)
+            stats["rate_limit_wait"] = time.monotonic() - wait_start
+            # Hedges would spend a quota model's requests twice.
+            if not stream and HEDGING.enabled_for(service) and not quota_limited:
+                response = HEDGING.call(
+                    service, model,
+                    lambda call_stats: SERVICE_MAP[service](prompt, model, temperature, stats=call_stats, params=params),
+                    stats, before_hedge=lambda: RATE_LIMITERS.acquire(service, model))
+            else:
+                response = SERVICE_MAP[service](prompt, model, temperature, stream=stream, on_chunk=on_chunk, stats=stats, params=params)
+    except Exception as e:
+        if quota_limited and http_status_of(e) == 429:
+            raise QUOTA_BOOK.deferral(service, model, e.response) from e
+        CIRCUIT_BREAKERS.record_failure(service, model, e)
+        raise
+    CIRCUIT_BREAKERS.record_success(service, model)
 
-    # For some services, we might want to keep the full model name or strip it
-    # Google likes 'gemini-1.5-pro', Anthropic likes 'claude-3-opus-20240229'
-    return SERVICE_MAP[service](prompt, model, temperature)
\ No newline at end of file
+    if slot is not None:
+        RESPONSE_CACHE.put(service, model, prompt, temperature, slot, response, params)
+    return response
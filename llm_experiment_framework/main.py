@@ -1,12 +1,33 @@
 import pandas as pd
 import numpy as np
-import time
+import argparse
+import asyncio
+import glob
+import json
 import os
+import threading
+import time
 import re
 import hashlib
 from pathlib import Path
 from dotenv import load_dotenv
-from llm_services import get_llm_response
+from llm_services import get_llm_response, RATE_LIMITERS, HTTP_POOL, RESPONSE_CACHE, OLLAMA_SCHEDULER, MULTI_SAMPLER, MOCK_PROVIDER, CIRCUIT_BREAKERS, HEDGING, ENDPOINT_POOL, QUOTA_BOOK
+from executor import CellEngine, ExperimentAborted, Deferred
+from ollama_scheduler import ModelGate
+from journal import ResponseJournal, experiment_key, journal_path_for, temperature_key
+from retry_policy import RetryPolicy, DeadLetterQueue, dead_letter_path_for, NON_RETRYABLE_STATUSES
+from result_store import ResultStore
+from workbook_writer import sheet_rows, write_workbook
+from manifest import ExperimentManifest, manifest_path_for, COMPLETE, GRID_CHANGED
+from work_queue import WorkQueue, default_worker_id, DONE, FAILED
+from sweep import expand_experiments, count_experiments, check_params, params_hash, describe_params
+from adaptive import AdaptiveSampler, EarlyStopSampler, EARLY_STOP_MARKER, coarse_grid, format_curve, save_curve
+from circuit_breaker import CircuitOpenError
+from quota import QuotaDeferred, QUOTA_DEFERRED, format_until
+from degeneration import DegenerationGuard, DegenerateOutput, mark_degenerate
+from preflight import run_preflight, FAILED as PREFLIGHT_FAILED
+from batch_submit import BatchLedger, BATCH_SERVICES, INGESTED, batch_client, batch_settings, custom_id
+from call_metrics import CallLog, build_call_record, calls_path_for, summarize_calls, format_summary, save_summary
 
 # Import the single source of truth for configuration
 try:
@@ -15,6 +36,46 @@ except ImportError:
     print("Error: Could not import 'EXPERIMENTS' from config.py. Please ensure the file exists.")
     EXPERIMENTS = []
 
+try:
+    from config import RUN_CONFIG
+except ImportError:
+    RUN_CONFIG = {}
+
+try:
+    from config import RATE_LIMITS
+except ImportError:
+    RATE_LIMITS = {}
+
+try:
+    from config import HTTP_POOLS
+except ImportError:
+    HTTP_POOLS = {}
+
+try:
+    from config import RESPONSE_CACHE_CONFIG
+except ImportError:
+    RESPONSE_CACHE_CONFIG = {}
+
+try:
+    from config import OLLAMA_CONFIG
+except ImportError:
+    OLLAMA_CONFIG = {}
+
+try:
+    from config import LOCAL_ENDPOINTS
+except ImportError:
+    LOCAL_ENDPOINTS = {}
+
+try:
+    from config import MODEL_QUOTAS
+except ImportError:
+    MODEL_QUOTAS = {}
+
+try:
+    from config import MOCK_PROFILES
+except ImportError:
+    MOCK_PROFILES = {}
+
 # Load .env from the root of the repository
 env_path = Path(__file__).resolve().parent.parent / '.env'
 if env_path.exists():
@@ -24,30 +85,33 @@ else:
     load_dotenv()
 
 # Excel has a hard limit of 32,767 characters per cell.
-EXCEL_CHAR_LIMIT = 32700 
+EXCEL_CHAR_LIMIT = 32700
 
-def generate_unique_sheet_name(model_full_name, prompt):
+def generate_unique_sheet_name(model_full_name, prompt, params=None):
     """
     Generates a unique and valid Excel sheet name (max 31 chars).
-    Structure: [ShortModel]_[PromptSnippet]_[Hash]
+    Structure: [ShortModel]_[PromptSnippet]_[Hash], or
+    [ShortModel]_[PromptSnippet]_[Hash]_[ParamsHash] for a sweep point.
     """
     # 1. Clean up model name (take the part after the last slash)
     model_part = model_full_name.split('/')[-1]
     model_part = re.sub(r"[^a-zA-Z0-9]", "", model_part)[:10]
-    
-    # 2. Clean up prompt snippet
-    prompt_snippet = re.sub(r"[^a-zA-Z0-9]", "", prompt)[:12]
-    
+
+    # 2. Clean up prompt snippet (shorter for a sweep point, to make room for its hash)
+    prompt_snippet = re.sub(r"[^a-zA-Z0-9]", "", prompt)[:6 if params else 12]
+
     # 3. Generate a short hash of the full prompt to guarantee uniqueness
     prompt_hash = hashlib.md5(prompt.encode()).hexdigest()[:4]
-    
+
     # 4. Combine
     sheet_name = f"{model_part}_{prompt_snippet}_{prompt_hash}"
-    
+    if params:
+        sheet_name += f"_{params_hash(params)}"
+
     # 5. Final safety check for Excel restricted characters
     invalid_chars = r"[:\\/?*\[\]]"
     sheet_name = re.sub(invalid_chars, "_", sheet_name)
-    
+
     return sheet_name[:31]
 
 def sanitize_sheet_name(name):
@@ -58,124 +122,1495 @@ def sanitize_sheet_name(name):
     sanitized = re.sub(invalid_chars, "_", name)
     return sanitized[:31]
 
-def run_experiments():
+def prepare_experiment(experiment, results_dir):
     """
-    Runs experiments from config.py.
-    
-    Transposed Structure:
+    Resolves an EXPERIMENTS entry (one sweep point, see sweep.py) into
+    everything needed to run and save it.
+    Returns None if the entry is missing a prompt, model or temperature range.
+    """
+    prompt = experiment.get("prompt")
+    model_full_name = experiment.get("model")
+    temp_range = experiment.get("temperature_range")
+    iterations = experiment.get("iterations", 1)
+    output_filename = experiment.get("output_file", "results.xlsx")
+    params = check_params(dict(experiment.get("params") or {}))
+    adaptive = experiment.get("adaptive")
+    early_stop = None if adaptive else experiment.get("early_stop")
+
+    if not prompt or not model_full_name or not temp_range:
+        return None
+
+    if not os.path.isabs(output_filename):
+        output_file = os.path.join(results_dir, output_filename)
+    else:
+        output_file = output_filename
+
+    service, model_name = model_full_name.split('/', 1)
+
+    if adaptive:
+        # Only the coarse first pass is known up front; see run_adaptive_experiment.
+        temps = coarse_grid(temp_range, adaptive)
+    else:
+        temps = np.arange(temp_range["start"], temp_range["end"] + temp_range["step"], temp_range["step"])
+
+    return {
+        "prompt": prompt,
+        "model_full_name": model_full_name,
+        "service": service,
+        "model_name": model_name,
+        "temps": temps,
+        "iterations": iterations,
+        "adaptive": adaptive,
+        "early_stop": early_stop,
+        "output_file": output_file,
+        "output_filename": output_filename,
+        "params": params,
+        "sheet_name": generate_unique_sheet_name(model_full_name, prompt, params),
+        "key": experiment_key(model_full_name, prompt, params),
+        "spec": dict(experiment),
+        "journal": None,
+        "dead_letter": None,
+        "call_log": None,
+        "result_store": None,
+        "manifest": None,
+        "resume_from_saved": False,
+        "retry_policy": None,
+        "saved_cells": set(),
+        "sampler": None,
+    }
+
+def claim_sheet(claimed, job):
+    """
+    Records the job's sheet in `claimed` ({(output file, sheet name): experiment key}).
+    Returns False if the same experiment is already queued (a duplicate entry);
+    raises ValueError if a different experiment has the same sheet name.
+    """
+    sheet_key = (job["output_file"], job["sheet_name"])
+    if sheet_key not in claimed:
+        claimed[sheet_key] = job["key"]
+        return True
+    if claimed[sheet_key] != job["key"]:
+        raise ValueError(f"Sheet name {job['sheet_name']} in {job['output_filename']} is shared by two different "
+                         f"experiments ({job['model_full_name']}, {describe_params(job['params']) or 'no params'}). "
+                         f"Change one of their prompts or output files.")
+    return False
+
+def attach_manifest(job, manifests):
+    """Gives a job the shared manifest of its output file."""
+    path = manifest_path_for(job["output_file"])
+    if path not in manifests:
+        manifests[path] = ExperimentManifest(path, job["output_file"])
+    job["manifest"] = manifests[path]
+
+def experiment_status(job):
+    """
+    Resumability check against the output file's manifest: COMPLETE if the
+    experiment is already saved, GRID_CHANGED if it was saved with another
+    temperature grid or iteration count (only the missing cells are run),
+    or None.
+    """
+    status = job["manifest"].status(job)
+    if (status is None and not job["manifest"].found
+            and job["result_store"] is not None and job["result_store"].has(job)):
+        # Stored for this workbook before its manifest existed: reuse the stored cells and run any missing ones.
+        return GRID_CHANGED
+    return status
+
+def attach_run_state(job, journals, dead_letters, call_logs, result_store, retry_policy):
+    """
+    Gives a job its shared per-output-file journal, dead-letter queue and call
+    log, the result store, and the retry policy (None means pause and ask the
+    user on errors).
+    """
+    if RUN_CONFIG.get("journal", True):
+        path = journal_path_for(job["output_file"])
+        if path not in journals:
+            journals[path] = ResponseJournal(path)
+        job["journal"] = journals[path]
+    path = dead_letter_path_for(job["output_file"])
+    if path not in dead_letters:
+        dead_letters[path] = DeadLetterQueue(path)
+    job["dead_letter"] = dead_letters[path]
+    path = calls_path_for(job["output_file"])
+    if path not in call_logs:
+        call_logs[path] = CallLog(path)
+    job["call_log"] = call_logs[path]
+    job["result_store"] = result_store
+    job["retry_policy"] = retry_policy
+
+def give_up_on_cell(job, temp, iter_idx, error, attempts):
+    """
+    Records a cell that will not be retried in this run and returns its sheet value.
+    """
+    if job["dead_letter"] is not None:
+        job["dead_letter"].record(job, temp, iter_idx + 1, error, attempts)
+    return f"SKIPPED_ERROR: {error}"
+
+def call_cell(job, temp, iter_idx, stats):
+    """
+    Makes one call for a cell and returns the response; `stats` is filled with
+    the call's status, usage and timings.
+
+    With RUN_CONFIG["stream"] the answer is streamed and the text so far is
+    journaled every RUN_CONFIG["partial_flush_seconds"] so a dropped connection keeps it.
+    With RUN_CONFIG["degeneration_guard"] enabled, a stream that degenerates into
+    loops is cancelled and its text so far is returned with a [DEGENERATE] marker.
+    """
+    if not RUN_CONFIG.get("stream", False):
+        return get_llm_response(job["service"], job["prompt"], job["model_name"], temp, slot=iter_idx, stats=stats,
+                                params=job["params"], last_slot=job["iterations"], slot_pending=slot_pending(job, temp))
+
+    journal = job["journal"]
+    flush_every = RUN_CONFIG.get("partial_flush_seconds", 10)
+    parts = []
+    last_flush = [time.monotonic()]
+    guard_settings = RUN_CONFIG.get("degeneration_guard") or {}
+    guard = DegenerationGuard(guard_settings) if guard_settings.get("enabled") else None
+
+    def flush_partial():
+        journal.record_partial(job["key"], temp, iter_idx + 1, "".join(parts), model=job["model_full_name"])
+        last_flush[0] = time.monotonic()
+
+    def on_chunk(delta):
+        parts.append(delta)
+        if journal is not None and time.monotonic() - last_flush[0] >= flush_every:
+            flush_partial()
+        if guard is not None:
+            guard.feed(delta)
+
+    try:
+        response = get_llm_response(job["service"], job["prompt"], job["model_name"], temp, slot=iter_idx,
+                                    stream=True, on_chunk=on_chunk, stats=stats, params=job["params"])
+    except DegenerateOutput as e:
+        text = "".join(parts)
+        stats["degenerate"] = True
+        print(f"      Degenerate output ({job['model_name']} Temp {temp:.2f} Iter {iter_idx+1}): {e}; "
+              f"stopped after {len(text)} chars.")
+        return mark_degenerate(text, str(e))
+    except Exception:
+        if journal is not None and parts:
+            flush_partial()
+        raise
+    return response
+
+def slot_pending(job, temp):
+    """
+    Returns a predicate telling multi-sample calls (see multi_sample.py) whether
+    an iteration slot at `temp` still needs a response: not saved, not
+    journaled and, for adaptive and early-stopping experiments, one of the
+    cells their sampler has picked so far.
+    """
+    t_key = temperature_key(temp)
+    sampler = job["sampler"]
+    t_idx = None
+    if sampler is not None:
+        t_idx = next((i for i, other in enumerate(sampler.temps) if temperature_key(other) == t_key), None)
+
+    def pending(iter_idx):
+        if (t_key, iter_idx) in job["saved_cells"]:
+            return False
+        if job["journal"] is not None and job["journal"].get(job["key"], temp, iter_idx + 1) is not None:
+            return False
+        if sampler is not None:
+            return t_idx is not None and iter_idx < sampler.counts[t_idx] and (t_idx, iter_idx) not in sampler.responses
+        return True
+
+    return pending
+
+def log_call(job, temp, iter_idx, attempt, queued_at, started_at, stats, error=None):
+    if job["call_log"] is not None:
+        record = build_call_record(job, temp, iter_idx + 1, attempt, queued_at, started_at, time.monotonic(), stats, error)
+        job["call_log"].append(record)
+
+def query_with_retry(job, temp, iter_idx, prompt_lock=None, abort_event=None, queued_at=None, can_defer=False):
+    """
+    Gets one response. On errors it either backs off and retries on its own
+    (when the job has a retry policy) or pauses for the user (retry / skip / quit).
+    Cells that are given up on go to the dead-letter file.
+    A model over its quota (see quota.py) does not use up attempts: the cell
+    waits for the window (returning Deferred instead when `can_defer`), or,
+    if that is more than MODEL_QUOTAS["max_wait"] away, returns QUOTA_DEFERRED
+    and is left for the next run.
+    Every attempt is logged as a call record; `queued_at` (time.monotonic())
+    is when the cell was handed to the executor.
+    Raises ExperimentAborted if the user quits.
+    """
+    policy = job["retry_policy"]
+    attempts = 0
+    while True: # Retry Loop
+        attempts += 1
+        stats = {}
+        started_at = time.monotonic()
+        try:
+            response = call_cell(job, temp, iter_idx, stats)
+            log_call(job, temp, iter_idx, attempts, queued_at, started_at, stats)
+            if job["journal"] is not None:
+                job["journal"].record(job["key"], temp, iter_idx + 1, response, model=job["model_full_name"])
+            if job["dead_letter"] is not None:
+                job["dead_letter"].resolve(job["key"], temp, iter_idx + 1)
+            break
+        except QuotaDeferred as e:
+            if "status" in stats:
+                log_call(job, temp, iter_idx, attempts, queued_at, started_at, stats, error=e)
+            attempts -= 1
+            if e.delay <= QUOTA_BOOK.max_wait:
+                if can_defer:
+                    return Deferred(e.delay)
+                print(f"      Waiting {e.delay:.0f}s for the quota of {job['model_full_name']}.")
+                time.sleep(e.delay)
+                continue
+            if job["journal"] is None:
+                # Without a journal the finished cells would be lost with the unsaved experiment.
+                response = give_up_on_cell(job, temp, iter_idx, e, attempts)
+                break
+            job["deferred_until"] = max(job.get("deferred_until") or 0, e.until)
+            response = QUOTA_DEFERRED
+            break
+        except Exception as e:
+            log_call(job, temp, iter_idx, attempts, queued_at, started_at, stats, error=e)
+            if abort_event is not None and abort_event.is_set():
+                raise ExperimentAborted()
+
+            if isinstance(e, CircuitOpenError) or CIRCUIT_BREAKERS.is_open(job["service"], job["model_name"]):
+                # The breaker already said why; no retry and no prompt for each remaining cell.
+                response = give_up_on_cell(job, temp, iter_idx, e, attempts)
+                break
+
+            if policy is not None:
+                if policy.should_retry(e, attempts):
+                    delay = policy.backoff(attempts)
+                    print(f"      Error ({job['model_name']} Temp {temp:.2f} Iter {iter_idx+1}, attempt {attempts}/{policy.max_attempts}): {e}. Retrying in {delay:.1f}s.")
+                    time.sleep(delay)
+                    continue
+                print(f"      Giving up ({job['model_name']} Temp {temp:.2f} Iter {iter_idx+1}) after {attempts} attempt(s): {e}")
+                response = give_up_on_cell(job, temp, iter_idx, e, attempts)
+                break
+
+            # Concurrent cells share the console, so only one may prompt at a time.
+            if prompt_lock is not None:
+                prompt_lock.acquire()
+            try:
+                if abort_event is not None and abort_event.is_set():
+                    raise ExperimentAborted()
+                print(f"      Error ({job['model_name']} Temp {temp:.2f} Iter {iter_idx+1}): {e}")
+                print("      !!! Experiment Paused due to Error !!!")
+                user_choice = input("      Press [Enter] to RETRY, 's' to SKIP this iteration, or 'q' to QUIT: ").strip().lower()
+            finally:
+                if prompt_lock is not None:
+                    prompt_lock.release()
+
+            if user_choice == 'q':
+                if abort_event is not None:
+                    abort_event.set()
+                raise ExperimentAborted()
+            elif user_choice == 's':
+                response = give_up_on_cell(job, temp, iter_idx, e, attempts)
+                break
+
+    return response
+
+def saved_responses(job):
+    """
+    Returns {(temp_idx, iter_idx): response} for the cells already done: those
+    of an earlier save whose grid has changed, plus those in the journal.
+    """
+    responses = {}
+    if job["resume_from_saved"]:
+        if job["result_store"] is not None and job["result_store"].has(job):
+            responses = job["result_store"].read(job)
+        else:
+            try:
+                responses = load_saved_sheet(job)
+            except Exception as e:
+                print(f"   Warning: Could not read the saved sheet ({e}); re-running its cells.")
+    responses.update(journaled_responses(job))
+    # Slots an early-stopped run skipped are not done; they run if the experiment is re-run without early stopping.
+    responses = {cell: response for cell, response in responses.items() if response != EARLY_STOP_MARKER}
+    job["saved_cells"] = {(temperature_key(job["temps"][t_idx]), iter_idx) for t_idx, iter_idx in responses}
+    return responses
+
+def journaled_responses(job):
+    """
+    Returns {(temp_idx, iter_idx): response} for the cells already in the journal.
+    """
+    responses = {}
+    if job["journal"] is None:
+        return responses
+    for t_idx, temp in enumerate(job["temps"]):
+        for iter_idx in range(job["iterations"]):
+            entry = job["journal"].get(job["key"], temp, iter_idx + 1)
+            if entry is not None:
+                responses[(t_idx, iter_idx)] = entry["response"]
+    return responses
+
+def fit_excel_cell(response, iter_idx):
+    """
+    Excel Character Limit Check: keeps the end of over-long responses.
+    """
+    if len(response) > EXCEL_CHAR_LIMIT:
+        print(f"      Warning: Iteration {iter_idx+1} exceeded Excel character limit ({len(response)} chars). Truncating start.")
+        # Truncate the beginning, keep the end.
+        # We leave a small buffer and a label
+        response = "[TRUNCATED START]... " + response[-(EXCEL_CHAR_LIMIT - 50):]
+    return response
+
+def build_transposed_frame(job, responses):
+    """
+    Builds the transposed sheet layout from a {(temp_idx, iter_idx): response} dict.
     - Rows: Iterations (Iteration 1, 2, 3...)
     - Columns: Temperatures (Temp_0.00, Temp_0.10...)
+    Cells an adaptive experiment never sampled are left empty.
     """
-    if not EXPERIMENTS:
-        print("No experiments found in config.py.")
+    transposed_data = {
+        "Iteration": list(range(1, job["iterations"] + 1))
+    }
+    for t_idx, temp in enumerate(job["temps"]):
+        column = [responses.get((t_idx, iter_idx)) for iter_idx in range(job["iterations"])]
+        transposed_data[f"Temp_{temp:.2f}"] = [None if response is None else fit_excel_cell(response, iter_idx)
+                                               for iter_idx, response in enumerate(column)]
+    return pd.DataFrame(transposed_data)
+
+def save_experiment_sheet(job, df):
+    """
+    Writes the Model/Prompt header and the transposed data to the experiment's sheet.
+    Returns False if the workbook could not be written.
+    """
+    output_file = job["output_file"]
+    sheet_name = job["sheet_name"]
+
+    if os.path.exists(output_file):
+        mode = 'a'
+        # The header and the data are two writes to the same sheet, so the old
+        # sheet is removed up front and both writes overlay the new one.
+        if_sheet_exists = 'overlay'
+    else:
+        mode = 'w'
+        if_sheet_exists = None
+
+    try:
+        with pd.ExcelWriter(output_file, mode=mode, engine='openpyxl', if_sheet_exists=if_sheet_exists) as writer:
+            if mode == 'a' and sheet_name in writer.book.sheetnames:
+                del writer.book[sheet_name]
+
+            # Write Model and Prompt to the first row (A1 and B1)
+            info = [f"Model: {job['model_full_name']}", f"Prompt: {job['prompt']}"]
+            if job["params"]:
+                info.append(f"Params: {describe_params(job['params'])}")
+            info_header = pd.DataFrame([info])
+            info_header.to_excel(writer, sheet_name=sheet_name, index=False, header=False, startrow=0, startcol=0)
+
+            # Write the main data starting at B2 (row 1, col 1)
+            df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1, startcol=1)
+        print(f"   Saved to sheet: '{sheet_name}' in {os.path.basename(output_file)}")
+        return True
+    except Exception as e:
+        print(f"   Error saving: {e}")
+        return False
+
+def save_experiment(job, responses, iterations=None):
+    """
+    Writes a finished experiment to the result store (full responses). Its
+    Excel sheet is written later, when the workbook is assembled from the
+    store. Without a store the sheet is appended to the workbook right away.
+    The experiment is then recorded in the manifest. An experiment with cells
+    deferred for a model's quota is not saved; its finished cells stay in the
+    journal and the next run completes it.
+
+    After a progressive round, `iterations` is how many iterations per
+    temperature the round reached: the cells so far are saved and the manifest
+    records the smaller grid, so a later run only adds the missing cells.
+    """
+    if iterations is not None:
+        responses = {cell: response for cell, response in responses.items() if response != QUOTA_DEFERRED}
+    elif job.get("deferred_until"):
+        deferred = sum(1 for response in responses.values() if response == QUOTA_DEFERRED)
+        print(f"   Not saved yet: {deferred} cell(s) deferred until {format_until(job['deferred_until'])} "
+              f"by the quota of {job['model_full_name']}. Run main.py again after that to finish it.")
+        return
+    store = job["result_store"]
+    saved = False
+    if store is not None:
+        try:
+            store.write(job, responses)
+            print(f"   Stored {len(responses)} responses in {os.path.relpath(store.path_for(job), os.path.dirname(__file__))}")
+            saved = True
+        except Exception as e:
+            print(f"   Error writing to the result store: {e}")
+            print("   Falling back to the Excel sheet.")
+    if not saved:
+        saved = save_experiment_sheet(job, build_transposed_frame(job, responses))
+    if saved and job["manifest"] is not None:
+        job["manifest"].record(job, iterations)
+
+def widen_to_stored_grid(job, store):
+    """
+    An adaptive experiment's temperatures are only known from its saved cells:
+    sets job["temps"] to every stored temperature (plus the coarse grid).
+    """
+    if job["adaptive"] and store is not None and store.has(job):
+        labels = {label for label, _ in store.cells(job)} | {f"{temp:.2f}" for temp in job["temps"]}
+        job["temps"] = np.array(sorted(float(label) for label in labels))
+
+def stored_sheet_rows(store, job):
+    """Rows of an experiment's sheet, read from the store only when the sheet is written."""
+    widen_to_stored_grid(job, store)
+    yield from sheet_rows(job["model_full_name"], job["prompt"], build_transposed_frame(job, store.read(job)), job["params"])
+
+def assemble_workbooks(store, results_dir, force=False):
+    """
+    Writes each Excel workbook from the result store in a single pass.
+    Unless `force` is set, only workbooks that are missing or older than one
+    of their stored experiments are rewritten.
+    """
+    workbooks = {}
+    for path, spec in store.entries():
+        job = prepare_experiment(spec, results_dir)
+        if job is not None:
+            workbooks.setdefault(job["output_file"], []).append((os.path.getmtime(path), job))
+    written = 0
+    for output_file, entries in workbooks.items():
+        entries.sort(key=lambda entry: entry[0])
+        if not force and os.path.exists(output_file) and os.path.getmtime(output_file) >= entries[-1][0]:
+            continue
+        sheets = {job["sheet_name"]: stored_sheet_rows(store, job) for _, job in entries}
+        try:
+            count = write_workbook(output_file, sheets)
+            print(f"Wrote {os.path.basename(output_file)} ({count} sheet(s)).")
+            written += 1
+        except Exception as e:
+            print(f"Error writing {os.path.basename(output_file)}: {e}")
+    return written
+
+def finish_workbooks(result_store, results_dir):
+    """Assembles the workbooks after a run unless RUN_CONFIG["excel_output"] is off."""
+    if result_store is not None and RUN_CONFIG.get("excel_output", True):
+        print("\nAssembling Excel workbooks from the result store...")
+        assemble_workbooks(result_store, results_dir)
+
+def report_experiment_metrics(job):
+    """
+    Prints the experiment's call summary and stores it in results/<output_file>.summary.json.
+    """
+    if job["call_log"] is None:
         return
+    records = job["call_log"].records_for(job["key"])
+    if not records:
+        return
+    summary = summarize_calls(records)
+    print(f"   Metrics ({job['sheet_name']}): {format_summary(summary)}")
+    save_summary(job["output_file"], job["sheet_name"], summary)
+
+def report_multi_sample_paths():
+    """Prints, per model, whether multi-sample calls were used or why it fell back to single calls."""
+    paths = MULTI_SAMPLER.report()
+    if paths:
+        print("Multi-sample requests:")
+        for model, path in sorted(paths.items()):
+            print(f"   {model}: {path}")
+
+def announce_experiment(position, total, job, resumed=0):
+    print(f"\n[{position}/{total}] Starting Experiment: {job['model_full_name']}")
+    print(f"   Prompt Snippet: {job['prompt'][:50]}...")
+    if job["params"]:
+        print(f"   Params: {describe_params(job['params'])}")
+    print(f"   Target: {os.path.basename(job['output_file'])} -> Sheet: {job['sheet_name']}")
+    if resumed:
+        print(f"   Resuming: {resumed} cell(s) already done.")
+
+async def run_cells(engine, job, cells, cell_slots=None):
+    """
+    Runs the given cells of a job on the engine and returns {cell: response}.
+    """
+    queued_at = time.monotonic()
+
+    def run_cell(cell):
+        t_idx, iter_idx = cell
+        try:
+            response = query_with_retry(job, job["temps"][t_idx], iter_idx, engine.prompt_lock, engine.abort_event, queued_at,
+                                        can_defer=True)
+        except BaseException:
+            OLLAMA_SCHEDULER.cell_done(job)
+            raise
+        if not isinstance(response, Deferred):
+            OLLAMA_SCHEDULER.cell_done(job)
+        return response
+
+    return await engine.map_cells(cells, run_cell, cell_slots)
+
+async def run_cells_in_parallel(job, cells, slots):
+    async with CellEngine(slots) as engine:
+        return await run_cells(engine, job, cells)
+
+def create_sampler(job, responses):
+    """
+    Starts the sampler of an adaptive or early-stopping experiment. Cells
+    already done (in `responses`, the journal or, for a grid change, the
+    result store) are reused.
+    """
+    saved = {}
+    if job["resume_from_saved"] and job["result_store"] is not None and job["result_store"].has(job):
+        saved = job["result_store"].cells(job)
+    saved.update({(temperature_key(job["temps"][t_idx]), iter_idx + 1): response
+                  for (t_idx, iter_idx), response in responses.items()})
+
+    def known(temp, iter_idx):
+        response = saved.get((temperature_key(temp), iter_idx + 1))
+        if response is None and job["journal"] is not None:
+            entry = job["journal"].get(job["key"], temp, iter_idx + 1)
+            response = entry["response"] if entry is not None else None
+        return None if response == EARLY_STOP_MARKER else response
+
+    if job["adaptive"]:
+        sampler = AdaptiveSampler(job["spec"]["temperature_range"], job["iterations"], job["adaptive"], known)
+    else:
+        sampler = EarlyStopSampler(job["temps"], job["iterations"], job["early_stop"], known)
+    job["temps"] = sampler.temps
+    job["sampler"] = sampler
+    return sampler
+
+def run_sampled_experiment(job, sampler, run_batch):
+    """
+    Runs an adaptive or early-stopping experiment (see adaptive.py) round by round:
+    `run_batch(cells)` runs the cells the sampler picked and returns
+    {cell: response}. Returns the responses on the final, sorted grid and
+    saves the accuracy curve to results/<output_file>.adaptive.json.
+    """
+    while True:
+        cells = sampler.next_batch()
+        if not cells:
+            break
+        batch = run_batch(cells)
+        if QUOTA_DEFERRED in batch.values():
+            # The model's quota is used up; the cells done so far are journaled for the next run.
+            job["temps"], responses = sampler.grid()
+            return responses
+        sampler.record(batch)
+    job["temps"], responses = sampler.grid()
+    curve = sampler.curve()
+    label = "Adaptive" if job["adaptive"] else "Early stop"
+    print(f"   {label} ({job['sheet_name']}): {format_curve(curve)}")
+    save_curve(job["output_file"], job["sheet_name"], curve)
+    return responses
+
+def run_experiment_sequential(job, responses, iterations=None):
+    """
+    Runs every (temperature, iteration) cell of an experiment that is not in
+    `responses` yet, one at a time, or only the first `iterations` iterations
+    of each temperature (a progressive round). Ollama experiments fill the
+    server's parallel slots instead. Adaptive and early-stopping experiments
+    run the cells their sampler picks.
+    """
+    if job["adaptive"] or job["early_stop"]:
+        sampler = create_sampler(job, responses)
+        OLLAMA_SCHEDULER.begin(job, sampler.budget)
+        slots = OLLAMA_SCHEDULER.parallel_slots(job)
+
+        def run_batch(cells):
+            if slots and slots > 1:
+                return asyncio.run(run_cells_in_parallel(job, cells, slots))
+            batch = {}
+            for t_idx, iter_idx in cells:
+                batch[(t_idx, iter_idx)] = query_with_retry(job, job["temps"][t_idx], iter_idx, queued_at=time.monotonic())
+                OLLAMA_SCHEDULER.cell_done(job)
+            return batch
+
+        responses = run_sampled_experiment(job, sampler, run_batch)
+        OLLAMA_SCHEDULER.finish(job)
+        return responses
+
+    iterations = job["iterations"] if iterations is None else min(iterations, job["iterations"])
+    pending = [(t_idx, iter_idx) for t_idx in range(len(job["temps"])) for iter_idx in range(iterations)
+               if (t_idx, iter_idx) not in responses]
+    OLLAMA_SCHEDULER.begin(job, len(pending))
+    slots = OLLAMA_SCHEDULER.parallel_slots(job)
+    if slots and slots > 1:
+        print(f"   Running {len(pending)} cell(s) on {slots} Ollama slots...")
+        responses.update(asyncio.run(run_cells_in_parallel(job, pending, slots)))
+    else:
+        for t_idx, temp in enumerate(job["temps"]):
+            print(f"   Running Temp {temp:.2f}...")
+            for iter_idx in range(iterations):
+                if (t_idx, iter_idx) not in responses:
+                    responses[(t_idx, iter_idx)] = query_with_retry(job, temp, iter_idx, queued_at=time.monotonic())
+                    OLLAMA_SCHEDULER.cell_done(job)
+    OLLAMA_SCHEDULER.finish(job)
+    return responses
+
+async def run_queue_async(queued, max_in_flight, max_experiments):
+    """
+    Runs the queued experiments concurrently.
+
+    Up to `max_experiments` experiments are active at once and their cells share
+    a single pool of `max_in_flight` requests. Sheets are written one at a time,
+    since they may target the same workbook. Only one local Ollama model is
+    active at a time, and its cells share the server's parallel slots.
+    Experiments of quota-limited models do not take an experiment slot: their
+    cells mostly wait for the quota window, without holding a request slot.
+    """
+    total = count_experiments(EXPERIMENTS)
+    experiment_slots = asyncio.Semaphore(max(1, int(max_experiments)))
+    save_lock = asyncio.Lock()
+    local_models = ModelGate()
+    ollama_slots = {}
+
+    async with CellEngine(max_in_flight) as engine:
+        async def run_job(position, job):
+            await local_models.acquire(job)
+            slots = experiment_slots if QUOTA_BOOK.limits(job["service"], job["model_name"]) is None else asyncio.Semaphore()
+            try:
+                async with slots:
+                    responses = saved_responses(job)
+                    announce_experiment(position, total, job, resumed=len(responses))
+                    cell_slots = None
+                    if OLLAMA_SCHEDULER.parallel_slots(job):
+                        cell_slots = ollama_slots.setdefault(job["model_name"], asyncio.Semaphore(OLLAMA_SCHEDULER.parallel_slots(job)))
+                    if job["adaptive"] or job["early_stop"]:
+                        # The sampler picks each round from the last one's scores, so it
+                        # runs on a thread and hands each round's cells to the engine.
+                        loop = asyncio.get_running_loop()
+                        sampler = create_sampler(job, responses)
+                        OLLAMA_SCHEDULER.begin(job, sampler.budget)
+
+                        def run_batch(cells):
+                            return asyncio.run_coroutine_threadsafe(run_cells(engine, job, cells, cell_slots), loop).result()
+
+                        responses = await loop.run_in_executor(None, run_sampled_experiment, job, sampler, run_batch)
+                    else:
+                        cells = [(t_idx, iter_idx) for t_idx in range(len(job["temps"])) for iter_idx in range(job["iterations"])
+                                 if (t_idx, iter_idx) not in responses]
+                        OLLAMA_SCHEDULER.begin(job, len(cells))
+                        responses.update(await run_cells(engine, job, cells, cell_slots))
+                    OLLAMA_SCHEDULER.finish(job)
+                    async with save_lock:
+                        await asyncio.get_running_loop().run_in_executor(None, save_experiment, job, responses)
+                        report_experiment_metrics(job)
+            finally:
+                await local_models.release(job)
+
+        await asyncio.gather(*(run_job(position, job) for position, job in queued))
+
+def progressive_rounds(iterations, settings):
+    """Iteration targets of the progressive rounds: first_round, growing by `growth`, up to `iterations`."""
+    target = max(1, int(settings.get("first_round", 2)))
+    growth = float(settings.get("growth", 2))
+    rounds = []
+    while target < iterations:
+        rounds.append(target)
+        target = max(target + 1, int(round(target * growth)))
+    rounds.append(iterations)
+    return rounds
+
+async def run_round_async(work, max_in_flight):
+    """
+    Runs one progressive round: the (job, cells) pairs in `work` all share one
+    pool of `max_in_flight` requests. Returns each job's {cell: response}.
+    """
+    local_models = ModelGate()
+    ollama_slots = {}
+
+    async with CellEngine(max_in_flight) as engine:
+        async def run_job(job, cells):
+            await local_models.acquire(job)
+            try:
+                cell_slots = None
+                if OLLAMA_SCHEDULER.parallel_slots(job):
+                    cell_slots = ollama_slots.setdefault(job["model_name"], asyncio.Semaphore(OLLAMA_SCHEDULER.parallel_slots(job)))
+                OLLAMA_SCHEDULER.begin(job, len(cells))
+                responses = await run_cells(engine, job, cells, cell_slots)
+                OLLAMA_SCHEDULER.finish(job)
+                return responses
+            finally:
+                await local_models.release(job)
+
+        return await asyncio.gather(*(run_job(job, cells) for job, cells in work))
+
+def run_progressive(queued, settings, result_store, results_dir):
+    """
+    Runs the queue breadth-first: every experiment gets the first few
+    iterations of each temperature, then more in rounds (see
+    progressive_rounds) until each reaches its iteration count. After every
+    round the cells so far are saved and the workbooks are rebuilt, so a
+    stopped run still leaves a complete, lower-resolution grid. Adaptive and
+    early-stopping experiments choose their own cells and run afterwards.
+    """
+    grid_jobs = [(position, job) for position, job in queued if not (job["adaptive"] or job["early_stop"])]
+    sampled = [(position, job) for position, job in queued if job["adaptive"] or job["early_stop"]]
+    # Keyed by queue position: one experiment may be queued for several workbooks.
+    responses = {position: saved_responses(job) for position, job in grid_jobs}
+    rounds = progressive_rounds(max((job["iterations"] for _, job in grid_jobs), default=1), settings)
+    if grid_jobs:
+        print(f"Progressive mode: {len(grid_jobs)} experiment(s) in rounds of up to "
+              f"{', '.join(str(target) for target in rounds)} iterations per temperature.")
+
+    loaded_model = None
+    for number, target in enumerate(rounds, start=1):
+        round_cells = {}
+        for position, job in grid_jobs:
+            done = responses[position]
+            cells = [(t_idx, iter_idx) for t_idx in range(len(job["temps"])) for iter_idx in range(min(target, job["iterations"]))
+                     if (t_idx, iter_idx) not in done]
+            if cells:
+                round_cells[position] = cells
+        if not round_cells:
+            continue
+        # The model left loaded by the last round starts this one, so each round loads one model fewer.
+        planned = OLLAMA_SCHEDULER.plan([(position, job) for position, job in grid_jobs if position in round_cells],
+                                        lead=loaded_model)
+        loaded_model = OLLAMA_SCHEDULER.last_model(planned) or loaded_model
+        print(f"\nRound {number}/{len(rounds)}: {sum(len(cells) for cells in round_cells.values())} cell(s) across "
+              f"{len(planned)} experiment(s), up to {target} iteration(s) per temperature.")
+        if RUN_CONFIG.get("execution_mode", "sequential") == "async":
+            work = [(job, round_cells[position]) for position, job in planned]
+            results = asyncio.run(run_round_async(work, RUN_CONFIG.get("max_in_flight", 8)))
+            for (position, _), result in zip(planned, results):
+                responses[position].update(result)
+        else:
+            for position, job in planned:
+                print(f"   {job['model_full_name']} ({job['sheet_name']})")
+                run_experiment_sequential(job, responses[position], iterations=target)
+
+        for position, job in planned:
+            if target >= job["iterations"]:
+                save_experiment(job, responses[position])
+                report_experiment_metrics(job)
+            else:
+                save_experiment(job, responses[position], iterations=target)
+        finish_workbooks(result_store, results_dir)
+
+    if sampled:
+        run_queue(sampled)
+
+def run_queue(queued):
+    """Runs the queued experiments one after another, or concurrently in async mode."""
+    mode = RUN_CONFIG.get("execution_mode", "sequential")
+    if mode == "async":
+        max_in_flight = RUN_CONFIG.get("max_in_flight", 8)
+        max_experiments = RUN_CONFIG.get("max_concurrent_experiments", 1)
+        print(f"Async mode: up to {max_in_flight} requests in flight across {max_experiments} experiment(s).")
+        asyncio.run(run_queue_async(queued, max_in_flight, max_experiments))
+    else:
+        for position, job in queued:
+            responses = saved_responses(job)
+            announce_experiment(position, count_experiments(EXPERIMENTS), job, resumed=len(responses))
+            responses = run_experiment_sequential(job, responses)
+            save_experiment(job, responses)
+            report_experiment_metrics(job)
 
+def get_results_dir():
     results_dir = os.path.join(os.path.dirname(__file__), 'results')
     if not os.path.exists(results_dir):
         os.makedirs(results_dir)
+    return results_dir
 
-    print(f"Found {len(EXPERIMENTS)} experiments in queue.")
+def get_result_store(results_dir):
+    """
+    Returns the Parquet ResultStore under results/store, or None when
+    RUN_CONFIG["result_store"] is off or pyarrow is not installed.
+    """
+    if not RUN_CONFIG.get("result_store", True):
+        return None
+    store = ResultStore(os.path.join(results_dir, "store"))
+    if not store.available:
+        print("Warning: pyarrow is not installed, so results are only saved to Excel (pip install pyarrow).")
+        return None
+    return store
 
-    for i, experiment in enumerate(EXPERIMENTS):
-        prompt = experiment.get("prompt")
-        model_full_name = experiment.get("model")
-        temp_range = experiment.get("temperature_range")
-        iterations = experiment.get("iterations", 1)
-        output_filename = experiment.get("output_file", "results.xlsx")
+def build_retry_policy(unattended=None):
+    """
+    Returns the RetryPolicy for unattended runs, or None to pause on errors.
+    RUN_CONFIG["on_error"] = "retry" (or --unattended) selects unattended mode.
+    """
+    if unattended is None:
+        unattended = RUN_CONFIG.get("on_error", "prompt") == "retry"
+    if not unattended:
+        return None
+    return RetryPolicy(**RUN_CONFIG.get("retry", {}))
 
-        if not prompt or not model_full_name or not temp_range:
+def configure_services():
+    """
+    Applies the rate limit, connection pool, local server, mock provider and cache settings from config.py.
+    """
+    RATE_LIMITERS.configure(RATE_LIMITS)
+    HTTP_POOL.configure(HTTP_POOLS)
+    OLLAMA_SCHEDULER.configure(OLLAMA_CONFIG)
+    ENDPOINT_POOL.configure(LOCAL_ENDPOINTS, slots={"ollama": OLLAMA_SCHEDULER.settings["num_parallel"]})
+    MULTI_SAMPLER.configure(RUN_CONFIG.get("samples_per_call", 1))
+    MOCK_PROVIDER.configure(MOCK_PROFILES)
+    CIRCUIT_BREAKERS.configure(RUN_CONFIG.get("circuit_breaker"))
+    HEDGING.configure(RUN_CONFIG.get("hedging"))
+    QUOTA_BOOK.configure(MODEL_QUOTAS, os.path.join(get_results_dir(), "quota.json"))
+    if RESPONSE_CACHE_CONFIG.get("enabled", False):
+        cache_dir = RESPONSE_CACHE_CONFIG.get("directory", "cache")
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(os.path.dirname(__file__), cache_dir)
+        RESPONSE_CACHE.configure(cache_dir, RESPONSE_CACHE_CONFIG.get("max_size_mb", 512))
+
+def preflight_models(models):
+    """Probes the models (see preflight.py), prints the outcome and returns the ones that failed."""
+    models = sorted(set(models))
+    print(f"\nPreflight: probing {len(models)} model(s)...")
+    results = run_preflight(models)
+    for model in models:
+        outcome, message = results[model]
+        print(f"   {outcome.upper():<8} {model}: {message}")
+    return {model for model, (outcome, _) in results.items() if outcome == PREFLIGHT_FAILED}
+
+def preflight_queue(queued, total):
+    """Drops the queued experiments whose model fails the preflight."""
+    if not queued:
+        return queued
+    failed = preflight_models(job["model_full_name"] for _, job in queued)
+    for position, job in queued:
+        if job["model_full_name"] in failed:
+            print(f"[{position}/{total}] Skipping: {job['sheet_name']} ({job['model_full_name']} failed the preflight)")
+    return [(position, job) for position, job in queued if job["model_full_name"] not in failed]
+
+def quota_queue(queued, total):
+    """
+    Leaves out the queued experiments whose model has no quota left for the
+    next MODEL_QUOTAS["max_wait"] seconds, and spreads the remaining
+    quota-limited experiments between the others.
+    """
+    runnable = []
+    for position, job in queued:
+        until = QUOTA_BOOK.deferred_until(job["service"], job["model_name"])
+        if until is None:
+            runnable.append((position, job))
+        else:
+            print(f"[{position}/{total}] Deferred: {job['sheet_name']} (the quota of {job['model_full_name']} "
+                  f"is used up until {format_until(until)})")
+    return QUOTA_BOOK.plan(runnable)
+
+def check_models():
+    """Runs only the preflight over every model in config.py."""
+    if not EXPERIMENTS:
+        print("No experiments found in config.py.")
+        return
+    configure_services()
+    failed = preflight_models(experiment["model"] for experiment in EXPERIMENTS if experiment.get("model"))
+    print(f"\n{len(failed)} model(s) failed the preflight." if failed else "\nAll models passed the preflight.")
+
+def report_hedging():
+    hedged = HEDGING.report()
+    if hedged:
+        print("Hedged requests:")
+        for model, line in sorted(hedged.items()):
+            print(f"   {model}: {line}")
+
+def report_quotas():
+    quotas = QUOTA_BOOK.report()
+    if quotas:
+        print("Free-tier quotas:")
+        for model, line in sorted(quotas.items()):
+            print(f"   {model}: {line}")
+
+def report_endpoints():
+    endpoints = ENDPOINT_POOL.report()
+    if endpoints:
+        print("Local servers:")
+        for endpoint, line in sorted(endpoints.items()):
+            print(f"   {endpoint}: {line}")
+
+def report_open_breakers():
+    breakers = CIRCUIT_BREAKERS.open_breakers()
+    if breakers:
+        print("Models disabled by their circuit breaker (their remaining cells were dead-lettered):")
+        for model, reason in sorted(breakers.items()):
+            print(f"   {model}: {reason}")
+
+def run_experiments(unattended=None, preflight=None, progressive=None):
+    """
+    Runs experiments from config.py.
+
+    Transposed Structure:
+    - Rows: Iterations (Iteration 1, 2, 3...)
+    - Columns: Temperatures (Temp_0.00, Temp_0.10...)
+
+    RUN_CONFIG["execution_mode"] selects "sequential" (default, one call at a time)
+    or "async" (cells fanned out over a bounded pool of in-flight requests).
+    Unless `preflight` (default RUN_CONFIG["preflight"]) is off, every queued
+    model is probed once first and the experiments of failing models are dropped.
+    With `progressive` (default RUN_CONFIG["progressive"]["enabled"]) the queue
+    runs breadth-first in rounds of iterations (see run_progressive).
+    """
+    if not EXPERIMENTS:
+        print("No experiments found in config.py.")
+        return
+
+    results_dir = get_results_dir()
+    total = count_experiments(EXPERIMENTS)
+
+    print(f"Found {total} experiments in queue.")
+    configure_services()
+    retry_policy = build_retry_policy(unattended)
+    result_store = get_result_store(results_dir)
+    if retry_policy is not None:
+        print(f"Unattended mode: up to {retry_policy.max_attempts} attempts per cell; failures go to results/*.failed.jsonl.")
+
+    # --- Resumability Check with Unique Naming ---
+    # Whole sheets already saved are skipped; inside an unfinished experiment,
+    # cells already in the response journal are skipped.
+    queued = []
+    queued_sheets = {}
+    journals = {}
+    dead_letters = {}
+    call_logs = {}
+    manifests = {}
+    for i, experiment in enumerate(expand_experiments(EXPERIMENTS)):
+        job = prepare_experiment(experiment, results_dir)
+        if job is None:
             continue
+        job["result_store"] = result_store
+        attach_manifest(job, manifests)
+        if not claim_sheet(queued_sheets, job):
+            print(f"\n[{i+1}/{total}] Skipping: {job['sheet_name']} (Already queued)")
+            continue
+        status = experiment_status(job)
+        if status == COMPLETE:
+            print(f"\n[{i+1}/{total}] Skipping: {job['sheet_name']} (Already exists in {job['output_filename']})")
+            continue
+        if status == GRID_CHANGED:
+            print(f"\n[{i+1}/{total}] {job['sheet_name']}: partly saved or saved with a different grid; only the missing cells will run.")
+            job["resume_from_saved"] = True
+        attach_run_state(job, journals, dead_letters, call_logs, result_store, retry_policy)
+        queued.append((i + 1, job))
+
+    # Local Ollama experiments are grouped by model so each model loads once.
+    if preflight is None:
+        preflight = RUN_CONFIG.get("preflight", True)
+    if preflight:
+        queued = preflight_queue(queued, total)
+
+    queued = quota_queue(queued, total)
+    queued = OLLAMA_SCHEDULER.plan(queued)
 
-        if not os.path.isabs(output_filename):
-            output_file = os.path.join(results_dir, output_filename)
+    if progressive is None:
+        progressive = RUN_CONFIG.get("progressive", {}).get("enabled", False)
+    try:
+        if progressive:
+            run_progressive(queued, RUN_CONFIG.get("progressive", {}), result_store, results_dir)
         else:
-            output_file = output_filename
+            run_queue(queued)
+    except ExperimentAborted:
+        print("Quitting...")
+        finish_workbooks(result_store, results_dir)
+        return
+    finally:
+        for dead_letter in dead_letters.values():
+            dead_letter.compact()
+
+    finish_workbooks(result_store, results_dir)
+
+    print("\nAll experiments completed.")
+    report_multi_sample_paths()
+    report_hedging()
+    report_endpoints()
+    report_quotas()
+    report_open_breakers()
+    failed = sum(len(dead_letter) for dead_letter in dead_letters.values())
+    if failed:
+        print(f"{failed} cell(s) failed and were written to the dead-letter file(s). Re-drive them with: python main.py --retry-failed")
+    deferred = [job for _, job in queued if job.get("deferred_until")]
+    if deferred:
+        print(f"{len(deferred)} experiment(s) are waiting for their model's quota; run main.py again after "
+              f"{format_until(max(job['deferred_until'] for job in deferred))} to finish them.")
+
+def load_saved_sheet(job):
+    """
+    Reads an experiment's saved sheet back into a {(temp_idx, iter_idx): response} dict.
+    """
+    df = pd.read_excel(job["output_file"], sheet_name=job["sheet_name"], header=1, engine='openpyxl')
+    responses = {}
+    for t_idx, temp in enumerate(job["temps"]):
+        column = f"Temp_{temp:.2f}"
+        if column not in df.columns:
+            continue
+        for iter_idx, value in enumerate(df[column].tolist()[:job["iterations"]]):
+            responses[(t_idx, iter_idx)] = "" if pd.isna(value) else str(value)
+    return responses
+
+def retry_failed_cells(unattended=None):
+    """
+    Re-drives every cell in the results/*.failed.jsonl dead-letter files, then
+    patches the saved sheets with the cells that now succeed.
+    """
+    results_dir = get_results_dir()
+    paths = sorted(glob.glob(os.path.join(results_dir, "*.failed.jsonl")))
+    if not paths:
+        print("No dead-letter files found. Nothing to retry.")
+        return
+
+    configure_services()
+    retry_policy = build_retry_policy(unattended)
+    result_store = get_result_store(results_dir)
+    journals = {}
+    dead_letters = {path: DeadLetterQueue(path) for path in paths}
+    call_logs = {}
+    manifests = {}
+
+    try:
+        for path in paths:
+            entries = dead_letters[path].entries()
+            print(f"\nRetrying {len(entries)} failed cell(s) from {os.path.basename(path)}")
+
+            jobs = {}
+            retried = {}
+            for entry in entries:
+                job = jobs.get(entry["experiment"])
+                if job is None:
+                    job = prepare_experiment(entry["spec"], results_dir)
+                    attach_run_state(job, journals, dead_letters, call_logs, result_store, retry_policy)
+                    widen_to_stored_grid(job, result_store)
+                    attach_manifest(job, manifests)
+                    jobs[entry["experiment"]] = job
+                    retried[entry["experiment"]] = {}
+
+                labels = [f"{temp:.2f}" for temp in job["temps"]]
+                if entry["temperature"] not in labels:
+                    continue
+                t_idx = labels.index(entry["temperature"])
+                iter_idx = entry["iteration"] - 1
+                print(f"   {job['model_full_name']} Temp {entry['temperature']} Iter {entry['iteration']}")
+                retried[entry["experiment"]][(t_idx, iter_idx)] = query_with_retry(job, job["temps"][t_idx], iter_idx)
+
+            for exp_key, job in jobs.items():
+                if experiment_status(job) is None:
+                    print(f"   Sheet '{job['sheet_name']}' has not been saved yet; run main.py to finish that experiment.")
+                    continue
+                if job["result_store"] is not None and job["result_store"].has(job):
+                    responses = job["result_store"].read(job)
+                else:
+                    responses = load_saved_sheet(job)
+                responses.update(journaled_responses(job))
+                # Cells still deferred for their model's quota keep their saved value.
+                responses.update({cell: response for cell, response in retried[exp_key].items() if response != QUOTA_DEFERRED})
+                job.pop("deferred_until", None)
+                save_experiment(job, responses)
+    except ExperimentAborted:
+        print("Quitting...")
+    finally:
+        for dead_letter in dead_letters.values():
+            dead_letter.compact()
+
+    finish_workbooks(result_store, results_dir)
+    remaining = sum(len(dead_letter) for dead_letter in dead_letters.values())
+    print(f"\nRetry pass finished. {remaining} cell(s) still failing.")
+
+def export_excel():
+    """
+    Rebuilds every Excel workbook from the result store, one sheet per stored experiment.
+    """
+    results_dir = get_results_dir()
+    store = get_result_store(results_dir)
+    if store is None:
+        print("The result store is disabled or unavailable. Nothing to export.")
+        return
+    written = assemble_workbooks(store, results_dir, force=True)
+    print(f"\nExported {written} workbook(s) from {store.directory}.")
+
+def get_work_queue(path=None):
+    """Opens the shared work queue (RUN_CONFIG["work_queue"] unless a path is given)."""
+    path = path or RUN_CONFIG.get("work_queue", os.path.join("results", "work_queue.sqlite3"))
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), path)
+    return WorkQueue(path)
+
+def enqueue_experiments(queue):
+    """
+    Expands the experiments in config.py into one work-queue task per cell.
+    Saved experiments are skipped, and cells that are already saved or
+    journaled are queued as done. Re-enqueueing puts failed tasks back.
+    """
+    if not EXPERIMENTS:
+        print("No experiments found in config.py.")
+        return
+    results_dir = get_results_dir()
+    result_store = get_result_store(results_dir)
+    journals = {}
+    manifests = {}
+    claimed = {}
+    total = count_experiments(EXPERIMENTS)
+    for i, experiment in enumerate(expand_experiments(EXPERIMENTS)):
+        job = prepare_experiment(experiment, results_dir)
+        if job is None:
+            continue
+        if job["adaptive"] or job["early_stop"]:
+            print(f"[{i+1}/{total}] {job['sheet_name']}: adaptive and early-stopping experiments pick their cells as they go; run them with main.py.")
+            continue
+        if not claim_sheet(claimed, job):
+            continue
+        attach_run_state(job, journals, {}, {}, result_store, None)
+        attach_manifest(job, manifests)
+        status = experiment_status(job)
+        if status == COMPLETE:
+            print(f"[{i+1}/{total}] Skipping: {job['sheet_name']} (Already exists in {job['output_filename']})")
+            continue
+        job["resume_from_saved"] = status == GRID_CHANGED
+        done = saved_responses(job)
+        queued = queue.enqueue(job, done)
+        print(f"[{i+1}/{total}] {job['sheet_name']}: {queued} cell(s) queued, {len(done)} already done.")
+    print(f"\nQueue {queue.path}: {queue.counts()}")
+
+def run_worker(queue, services=None, worker_id=None, concurrency=1, lease_seconds=600, poll_seconds=5.0):
+    """
+    Leases cells from the shared work queue and runs them, `concurrency` at a
+    time, until no cells for `services` are pending or leased. Leases are
+    renewed while calls run; a worker that dies lets its leases expire so
+    another worker picks the cells up. Errors are retried with RUN_CONFIG["retry"]
+    backoff through the queue, then marked failed.
+    """
+    configure_services()
+    results_dir = get_results_dir()
+    policy = build_retry_policy(unattended=True)
+    worker_id = worker_id or default_worker_id()
+    stop = threading.Event()
+    jobs = {}
+    call_logs = {}
+    jobs_lock = threading.Lock()
+    print(f"Worker {worker_id}: leasing from {queue.path}" + (f" (services: {', '.join(services)})" if services else ""))
+
+    def job_for(task):
+        with jobs_lock:
+            # Keyed by spec: the same experiment may be queued with different grids.
+            job = jobs.get(task["spec"])
+            if job is None:
+                job = prepare_experiment(json.loads(task["spec"]), results_dir)
+                path = calls_path_for(job["output_file"])
+                if path not in call_logs:
+                    call_logs[path] = CallLog(path)
+                job["call_log"] = call_logs[path]
+                jobs[task["spec"]] = job
+            return job
 
-        service, model_name = model_full_name.split('/', 1)
+    def heartbeat():
+        while not stop.wait(lease_seconds / 3):
+            queue.renew(worker_id, lease_seconds)
 
-        # --- Resumability Check with Unique Naming ---
-        sheet_name = generate_unique_sheet_name(model_full_name, prompt)
-        
-        if os.path.exists(output_file):
+    def work():
+        last_model = None
+        while not stop.is_set():
+            task = queue.lease(worker_id, lease_seconds, policy.max_attempts, services, prefer_model=last_model)
+            if task is None:
+                # Cells deferred past the quota wait are left for a later worker.
+                if queue.outstanding(services, available_before=time.time() + QUOTA_BOOK.max_wait) == 0:
+                    return
+                # Other workers still hold leases; wait in case one of them expires.
+                stop.wait(poll_seconds)
+                continue
+            last_model = task["model"]
+            job = job_for(task)
+            temp, iter_idx = float(task["temperature"]), task["iteration"] - 1
+            label = f"{job['model_full_name']} Temp {task['temperature']} Iter {task['iteration']}"
+            stats = {}
+            started_at = time.monotonic()
             try:
-                with pd.ExcelFile(output_file, engine='openpyxl') as xls:
-                    if sheet_name in xls.sheet_names:
-                        print(f"\n[{i+1}/{len(EXPERIMENTS)}] Skipping: {sheet_name} (Already exists in {output_filename})")
-                        continue
+                response = call_cell(job, temp, iter_idx, stats)
+            except QuotaDeferred as e:
+                # Back in the queue until the quota window reopens; other cells run meanwhile.
+                if "status" in stats:
+                    log_call(job, temp, iter_idx, task["attempts"], None, started_at, stats, error=e)
+                queue.defer(task, worker_id, e.until)
+                continue
             except Exception as e:
-                print(f"Warning: Could not read existing file {output_filename} to check sheets: {e}")
+                log_call(job, temp, iter_idx, task["attempts"], None, started_at, stats, error=e)
+                if policy.should_retry(e, task["attempts"]):
+                    delay = policy.backoff(task["attempts"])
+                    print(f"      Error ({label}, attempt {task['attempts']}/{policy.max_attempts}): {e}. Re-queued in {delay:.1f}s.")
+                    queue.fail(task, worker_id, e, retry_at=time.time() + delay)
+                else:
+                    print(f"      Giving up ({label}) after {task['attempts']} attempt(s): {e}")
+                    queue.fail(task, worker_id, e)
+                continue
+            log_call(job, temp, iter_idx, task["attempts"], None, started_at, stats)
+            queue.complete(task, worker_id, response)
+            print(f"   {label}: done")
 
-        print(f"\n[{i+1}/{len(EXPERIMENTS)}] Starting Experiment: {model_full_name}")
-        print(f"   Prompt Snippet: {prompt[:50]}...")
-        print(f"   Target: {os.path.basename(output_file)} -> Sheet: {sheet_name}")
+    threading.Thread(target=heartbeat, daemon=True).start()
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(max(1, int(concurrency)))]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1.0)
+    except KeyboardInterrupt:
+        print("Stopping worker; its leased cells will be re-queued when their leases expire.")
+    finally:
+        stop.set()
+    print(f"Worker {worker_id} finished. Queue: {queue.counts()}")
+    deferred = queue.outstanding(services) - queue.outstanding(services, available_before=time.time() + QUOTA_BOOK.max_wait)
+    if deferred:
+        print(f"{deferred} cell(s) are waiting for their model's quota; start a worker again once it resets.")
+    report_multi_sample_paths()
+    report_hedging()
+    report_endpoints()
+    report_quotas()
+    report_open_breakers()
 
-        # --- 1. Collect Data in Transposed Format ---
-        temps = np.arange(temp_range["start"], temp_range["end"] + temp_range["step"], temp_range["step"])
-        
-        transposed_data = {
-            "Iteration": list(range(1, iterations + 1))
-        }
+def collect_results(queue):
+    """
+    Builds the usual per-experiment results (result store, manifest and Excel
+    sheets) for every (experiment, output file) in the work queue whose cells
+    are all finished. Cells that failed for good are saved as SKIPPED_ERROR.
+    """
+    results_dir = get_results_dir()
+    result_store = get_result_store(results_dir)
+    manifests = {}
+    collected = 0
+    for exp_key, output_file, spec in queue.experiments():
+        job = prepare_experiment(dict(spec, output_file=output_file), results_dir)
+        if job is None:
+            continue
+        job["result_store"] = result_store
+        attach_manifest(job, manifests)
+        tasks = {(task["temperature"], task["iteration"]): task for task in queue.tasks_for(exp_key, output_file)}
+        responses = {}
+        for t_idx, temp in enumerate(job["temps"]):
+            for iter_idx in range(job["iterations"]):
+                task = tasks.get((temperature_key(temp), iter_idx + 1))
+                if task is None:
+                    continue
+                if task["status"] == DONE:
+                    responses[(t_idx, iter_idx)] = task["response"]
+                elif task["status"] == FAILED:
+                    responses[(t_idx, iter_idx)] = f"SKIPPED_ERROR: {task['error']}"
+        missing = len(job["temps"]) * job["iterations"] - len(responses)
+        if missing:
+            print(f"{job['sheet_name']}: {missing} cell(s) not finished yet; not collected.")
+            continue
+        print(f"{job['sheet_name']}: collecting {len(responses)} cell(s).")
+        save_experiment(job, responses)
+        collected += 1
+    finish_workbooks(result_store, results_dir)
+    print(f"\nCollected {collected} experiment(s). Queue: {queue.counts()}")
 
-        for temp in temps:
-            print(f"   Running Temp {temp:.2f}...")
-            temp_column_responses = []
-            
-            for iter_idx in range(iterations):
-                while True: # Interactive Retry Loop
-                    try:
-                        response = get_llm_response(service, prompt, model_name, temp)
-                        
-                        # --- Excel Character Limit Check ---
-                        if len(response) > EXCEL_CHAR_LIMIT:
-                            print(f"      Warning: Iteration {iter_idx+1} exceeded Excel character limit ({len(response)} chars). Truncating start.")
-                            # Truncate the beginning, keep the end.
-                            # We leave a small buffer and a label
-                            response = "[TRUNCATED START]... " + response[-(EXCEL_CHAR_LIMIT - 50):]
-                            
-                        temp_column_responses.append(response)
-                        break
-                    except Exception as e:
-                        print(f"      Error (Iter {iter_idx+1}): {e}")
-                        print("      !!! Experiment Paused due to Error !!!")
-                        user_choice = input("      Press [Enter] to RETRY, 's' to SKIP this iteration, or 'q' to QUIT: ").strip().lower()
-                        
-                        if user_choice == 'q':
-                            print("Quitting...")
-                            exit()
-                        elif user_choice == 's':
-                            temp_column_responses.append(f"SKIPPED_ERROR: {e}")
-                            break
-                
-                if service in ['openai', 'anthropic', 'google']:
-                    time.sleep(2) 
+def run_batches(wait=True):
+    """
+    Batch mode for the OpenAI and Anthropic experiments (see batch_submit.py):
+    collects the batches submitted earlier, submits every pending cell as one
+    batch per model, and polls them every RUN_CONFIG["batch"]["poll_seconds"].
+    Results are journaled as they are ingested, failed cells are submitted
+    again up to the retry policy's max_attempts, and experiments whose cells
+    are all in are saved as usual. With wait=False it returns once the
+    batches are submitted; run it again later to collect them.
+    """
+    if not EXPERIMENTS:
+        print("No experiments found in config.py.")
+        return
+
+    configure_services()
+    results_dir = get_results_dir()
+    settings = batch_settings(RUN_CONFIG.get("batch"))
+    retry_policy = build_retry_policy(unattended=True)
+    result_store = get_result_store(results_dir)
+    ledger = BatchLedger(os.path.join(results_dir, "batches"))
+    journals = {}
+    dead_letters = {}
+    call_logs = {}
+    manifests = {}
+    jobs = {}
+
+    def track(job):
+        attach_run_state(job, journals, dead_letters, call_logs, result_store, retry_policy)
+        if job["journal"] is None:
+            # Batch results are ingested through the journal, even with RUN_CONFIG["journal"] off.
+            path = journal_path_for(job["output_file"])
+            if path not in journals:
+                journals[path] = ResponseJournal(path)
+            job["journal"] = journals[path]
+        attach_manifest(job, manifests)
+        jobs[job["key"]] = job
+        return job
+
+    def job_for(exp_key):
+        """The job of a ledger cell; experiments no longer in config.py are rebuilt from their spec."""
+        if exp_key not in jobs:
+            spec = ledger.spec_for(exp_key)
+            if spec is None:
+                return None
+            track(prepare_experiment(spec, results_dir))
+        return jobs[exp_key]
+
+    def cells_left(job):
+        """Returns (responses, cells to submit, cells in flight) for a job."""
+        in_flight = ledger.in_flight()
+        responses = saved_responses(job)
+        to_submit = []
+        waiting = 0
+        for t_idx, temp in enumerate(job["temps"]):
+            for iter_idx in range(job["iterations"]):
+                if (t_idx, iter_idx) in responses:
+                    continue
+                if (job["key"], temperature_key(temp), iter_idx + 1) in in_flight:
+                    waiting += 1
+                    continue
+                failure = job["dead_letter"].get(job["key"], temp, iter_idx + 1)
+                if failure is not None and failure["attempts"] >= retry_policy.max_attempts:
+                    responses[(t_idx, iter_idx)] = f"SKIPPED_ERROR: {failure['error']}"
                 else:
-                    time.sleep(0.1)
-            
-            transposed_data[f"Temp_{temp:.2f}"] = temp_column_responses
+                    to_submit.append((t_idx, iter_idx))
+        return responses, to_submit, waiting
 
-        df = pd.DataFrame(transposed_data)
+    def ingest(batch, status, info):
+        received = failed = 0
+        for cell_id, response, error, stats in batch_client(batch["service"], settings).results(info):
+            cell = batch["cells"].get(cell_id)
+            job = job_for(cell[0]) if cell is not None else None
+            if job is None:
+                continue
+            _, label, iteration = cell
+            temp = float(label)
+            failure = job["dead_letter"].get(job["key"], temp, iteration)
+            attempt = (failure["attempts"] if failure is not None else 0) + 1
+            stats["batch"] = batch["id"]
+            log_call(job, temp, iteration - 1, attempt, None, time.monotonic(), stats, error=error)
+            if error is None:
+                job["journal"].record(job["key"], temp, iteration, response, model=job["model_full_name"], batch=batch["id"])
+                job["dead_letter"].resolve(job["key"], temp, iteration)
+                received += 1
+            else:
+                if stats.get("status") in NON_RETRYABLE_STATUSES:
+                    attempt = retry_policy.max_attempts
+                job["dead_letter"].record(job, temp, iteration, error, attempt)
+                failed += 1
+        note = f": {info['error']}" if info.get("error") else ""
+        print(f"Batch {batch['id']} ({batch['service']}/{batch['model']}) {status}{note}: "
+              f"{received} response(s), {failed} failed, {batch['requests'] - received - failed} not run.")
+        ledger.update(batch, state=INGESTED, status=status, received=received, failed=failed)
 
-        # --- 2. Save to Excel ---
-        if os.path.exists(output_file):
-            mode = 'a'
-            if_sheet_exists = 'replace'
-        else:
-            mode = 'w'
-            if_sheet_exists = None
+    def poll_batches():
+        for batch in ledger.open_batches():
+            try:
+                status, ended, info = batch_client(batch["service"], settings).poll(batch["id"])
+                if ended:
+                    ingest(batch, status, info)
+                elif status != batch["status"]:
+                    print(f"Batch {batch['id']} ({batch['service']}/{batch['model']}): {status}")
+                    ledger.update(batch, status=status)
+            except Exception as e:
+                print(f"   Could not check batch {batch['id']}: {e}")
 
-        try:
-            with pd.ExcelWriter(output_file, mode=mode, engine='openpyxl', if_sheet_exists=if_sheet_exists) as writer:
-                # Write Model and Prompt to the first row (A1 and B1)
-                info_header = pd.DataFrame([[f"Model: {model_full_name}", f"Prompt: {prompt}"]])
-                info_header.to_excel(writer, sheet_name=sheet_name, index=False, header=False, startrow=0, startcol=0)
-                
-                # Write the main data starting at B2 (row 1, col 1)
-                df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1, startcol=1)
-            print(f"   Saved to sheet: '{sheet_name}' in {os.path.basename(output_file)}")
-        except Exception as e:
-            print(f"   Error saving: {e}")
+    def save_finished():
+        for exp_key, job in list(jobs.items()):
+            responses, to_submit, waiting = cells_left(job)
+            if to_submit or waiting:
+                continue
+            print(f"\n{job['sheet_name']}: all {len(responses)} cell(s) are in.")
+            save_experiment(job, responses)
+            report_experiment_metrics(job)
+            del jobs[exp_key]
 
-    print("\nAll experiments completed.")
+    def submit_pending():
+        pending = {}
+        for job in jobs.values():
+            for t_idx, iter_idx in cells_left(job)[1]:
+                pending.setdefault((job["service"], job["model_name"]), []).append((job, job["temps"][t_idx], iter_idx + 1))
+        for (service, model_name), cells in pending.items():
+            client = batch_client(service, settings)
+            for start in range(0, len(cells), settings["max_requests"]):
+                chunk = cells[start:start + settings["max_requests"]]
+                payload_path = ledger.payload_path(service, model_name)
+                ids = {}
+                with open(payload_path, "w", encoding="utf-8") as f:
+                    for job, temp, iteration in chunk:
+                        cell_id = custom_id(job["key"], temp, iteration)
+                        line = client.request_line(cell_id, job["prompt"], job["model_name"], float(temp), job["params"])
+                        f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                        ids[cell_id] = [job["key"], temperature_key(temp), iteration]
+                try:
+                    batch_id = client.submit(payload_path)
+                except Exception as e:
+                    print(f"   Could not submit the {service}/{model_name} batch ({len(chunk)} request(s)): {e}")
+                    continue
+                ledger.add(batch_id, service, model_name, payload_path, ids, {job["key"]: job["spec"] for job, _, _ in chunk})
+                print(f"Submitted batch {batch_id}: {service}/{model_name}, {len(chunk)} request(s) "
+                      f"(payload {os.path.relpath(payload_path, os.path.dirname(__file__))}).")
+
+    total = count_experiments(EXPERIMENTS)
+    claimed = {}
+    for i, experiment in enumerate(expand_experiments(EXPERIMENTS)):
+        job = prepare_experiment(experiment, results_dir)
+        if job is None:
+            continue
+        if job["service"] not in BATCH_SERVICES:
+            print(f"[{i+1}/{total}] {job['sheet_name']}: {job['service']} has no batch endpoint; run it with main.py.")
+            continue
+        if job["adaptive"] or job["early_stop"]:
+            print(f"[{i+1}/{total}] {job['sheet_name']}: adaptive and early-stopping experiments pick their cells as they go; run them with main.py.")
+            continue
+        if not claim_sheet(claimed, job) or job["key"] in jobs:
+            continue
+        track(job)
+        status = experiment_status(job)
+        if status == COMPLETE:
+            print(f"[{i+1}/{total}] Skipping: {job['sheet_name']} (Already exists in {job['output_filename']})")
+            del jobs[job["key"]]
+            continue
+        job["resume_from_saved"] = status == GRID_CHANGED
+
+    try:
+        while True:
+            poll_batches()
+            save_finished()
+            submit_pending()
+            if not wait or not ledger.open_batches():
+                break
+            time.sleep(settings["poll_seconds"])
+    except KeyboardInterrupt:
+        print("Stopped polling. Submitted batches keep running; run `python main.py batch` again to collect them.")
+    finally:
+        for dead_letter in dead_letters.values():
+            dead_letter.compact()
+
+    finish_workbooks(result_store, results_dir)
+    running = ledger.open_batches()
+    if running:
+        print(f"\n{len(running)} batch(es) still running; run `python main.py batch` again to collect them.")
+    else:
+        print("\nAll batches collected.")
 
 if __name__ == "__main__":
-    run_experiments()
+    parser = argparse.ArgumentParser(description="Run the LLM experiments defined in config.py.")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "enqueue", "worker", "collect", "batch", "preflight"],
+                        help="run (default): run the queue in this process. enqueue / worker / collect: "
+                             "drain it through the shared work queue from several processes or machines. "
+                             "batch: run the OpenAI and Anthropic experiments through the providers' batch APIs. "
+                             "preflight: only probe every model in config.py.")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Re-drive the cells in the results/*.failed.jsonl dead-letter files and patch their sheets.")
+    parser.add_argument("--unattended", action="store_true", default=None,
+                        help="Retry errors with backoff instead of pausing for input (same as RUN_CONFIG['on_error'] = 'retry').")
+    parser.add_argument("--no-preflight", action="store_true",
+                        help="Skip probing the queued models before the run (same as RUN_CONFIG['preflight'] = False).")
+    parser.add_argument("--progressive", action="store_true", default=None,
+                        help="Run the queue breadth-first in rounds of iterations (same as RUN_CONFIG['progressive']['enabled'] = True).")
+    parser.add_argument("--export-excel", action="store_true",
+                        help="Regenerate the Excel workbooks from the Parquet result store in results/store.")
+    parser.add_argument("--queue", default=None,
+                        help="Work queue database (default: RUN_CONFIG['work_queue']).")
+    parser.add_argument("--services", default=None,
+                        help="Worker only: comma-separated services to take cells for, e.g. 'ollama' or 'openrouter'.")
+    parser.add_argument("--worker-id", default=None, help="Worker only: name shown in the queue (default: host-pid).")
+    parser.add_argument("--concurrency", type=int, default=1, help="Worker only: cells run at once.")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="Batch only: submit the pending cells and exit instead of polling until the batches end.")
+    parser.add_argument("--lease-seconds", type=float, default=600, help="Worker only: lease length, renewed while a call runs.")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        enqueue_experiments(get_work_queue(args.queue))
+    elif args.command == "worker":
+        services = [service.strip() for service in args.services.split(",")] if args.services else None
+        run_worker(get_work_queue(args.queue), services, args.worker_id, args.concurrency, args.lease_seconds)
+    elif args.command == "collect":
+        collect_results(get_work_queue(args.queue))
+    elif args.command == "batch":
+        run_batches(wait=not args.no_wait)
+    elif args.command == "preflight":
+        check_models()
+    elif args.export_excel:
+        export_excel()
+    elif args.retry_failed:
+        retry_failed_cells(args.unattended)
+    else:
+        run_experiments(args.unattended, preflight=False if args.no_preflight else None, progressive=args.progressive)
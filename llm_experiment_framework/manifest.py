@@ -0,0 +1,120 @@
+"""
+Manifest of saved experiments, one small JSON sidecar per output workbook.
+
+The resumability check used to open the whole workbook for every queued
+experiment just to read its sheet names. The manifest records each saved
+experiment (model, prompt hash, temperature grid, iterations) so the check is a
+dictionary lookup. It also tells a finished experiment apart from one whose
+grid has since changed in config.py, in which case only the missing cells
+need to be run.
+
+Workbooks from before the manifest existed are read once per run and their
+sheets are back-filled into the manifest.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from journal import temperature_key
+
+COMPLETE = "complete"
+GRID_CHANGED = "grid_changed"
+
+
+def manifest_path_for(output_file):
+    """results/foo.xlsx -> results/foo.manifest.json"""
+    return os.path.splitext(output_file)[0] + ".manifest.json"
+
+
+def grid_of(job):
+    return [temperature_key(temp) for temp in job["temps"]], int(job["iterations"])
+
+
+class ExperimentManifest:
+    """Thread-safe manifest for one output file, keyed by sheet name."""
+
+    def __init__(self, path, output_file):
+        self.path = path
+        self.output_file = output_file
+        self._lock = threading.Lock()
+        self._workbook_sheets = None
+        self._entries = {}
+        # False for a workbook saved before manifests existed (or never saved).
+        self.found = os.path.exists(path)
+        if self.found:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: Could not read manifest {os.path.basename(path)} ({e}); it will be rebuilt.")
+
+    def status(self, job):
+        """
+        COMPLETE if the experiment was saved with a grid that covers the job's,
+        GRID_CHANGED if it was saved with a different grid, or None. Raises
+        ValueError if the sheet holds a different experiment with the same name.
+        """
+        entry = self._entries.get(job["sheet_name"])
+        if entry is None:
+            entry = self._backfill_from_workbook(job)
+            if entry is None:
+                return None
+        if entry["experiment"] != job["key"]:
+            raise ValueError(f"Sheet {job['sheet_name']} in {os.path.basename(self.output_file)} already holds a different "
+                             f"experiment ({entry['model']}); change the prompt or output file of {job['model_full_name']}.")
+        if entry.get("temperatures") is None:
+            # Back-filled from an old workbook: the grid is unknown, trust the sheet as before.
+            return COMPLETE
+        temperatures, iterations = grid_of(job)
+        if set(temperatures) <= set(entry["temperatures"]) and iterations <= entry["iterations"]:
+            return COMPLETE
+        return GRID_CHANGED
+
+    def record(self, job, iterations=None):
+        """Records a saved experiment; `iterations` is less than the job's after a progressive round."""
+        temperatures, full_iterations = grid_of(job)
+        iterations = full_iterations if iterations is None else int(iterations)
+        with self._lock:
+            self._entries[job["sheet_name"]] = {
+                "experiment": job["key"],
+                "model": job["model_full_name"],
+                "prompt_sha256": hashlib.sha256(job["prompt"].encode()).hexdigest(),
+                "temperatures": temperatures,
+                "iterations": iterations,
+                "saved": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._save()
+
+    def _backfill_from_workbook(self, job):
+        with self._lock:
+            if self._workbook_sheets is None:
+                self._workbook_sheets = set()
+                if os.path.exists(self.output_file):
+                    try:
+                        with pd.ExcelFile(self.output_file, engine='openpyxl') as xls:
+                            self._workbook_sheets = set(xls.sheet_names)
+                    except Exception as e:
+                        print(f"Warning: Could not read existing file {os.path.basename(self.output_file)} to check sheets: {e}")
+            if job["sheet_name"] not in self._workbook_sheets:
+                return None
+            entry = {
+                "experiment": job["key"],
+                "model": job["model_full_name"],
+                "prompt_sha256": hashlib.sha256(job["prompt"].encode()).hexdigest(),
+                "temperatures": None,
+                "iterations": None,
+                "saved": None,
+            }
+            self._entries[job["sheet_name"]] = entry
+            self._save()
+            return entry
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,126 @@
+"""
+In-process mock provider for trying concurrency and error-handling changes
+without spending API money, and for the throughput benchmark (benchmark.py).
+
+"model": "mock/<profile>" answers from a simulated provider whose behaviour
+is set per profile in MOCK_PROFILES in config.py:
+
+    "latency":        {"distribution": "lognormal", "median": 0.2, "sigma": 0.5}
+                      (or {"distribution": "uniform", "low": 0.1, "high": 0.5},
+                       or {"distribution": "fixed", "value": 0.2}), in seconds
+    "response_chars": the same, for the answer length in characters
+    "error_rate":     fraction of calls that fail with HTTP 500
+    "rate_limit":     {"every": 200, "burst": 20, "retry_after": 1.0}: after every
+                      200 calls the next 20 get a 429 with that Retry-After
+    "seed":           seed of the profile's random draws
+
+Answers come back as requests.Response objects in the OpenAI chat format, so
+the rate limiter, retry policy and call log see them like any HTTP provider's.
+"""
+import json
+import math
+import threading
+import time
+
+import numpy as np
+import requests
+
+from circuit_breaker import ConfigurationError
+
+DEFAULT_MOCK_PROFILE = {
+    "latency": {"distribution": "lognormal", "median": 0.2, "sigma": 0.5},
+    "response_chars": {"distribution": "lognormal", "median": 800, "sigma": 0.6},
+    "error_rate": 0.0,
+    "rate_limit": None,
+    "seed": None,
+}
+
+FILLER = "The quick brown fox jumps over the lazy dog. " * 64
+
+
+def draw(rng, spec):
+    """One draw from a {"distribution": ...} spec (a plain number is a fixed value)."""
+    if not isinstance(spec, dict):
+        return float(spec)
+    distribution = spec.get("distribution", "fixed")
+    if distribution == "fixed":
+        value = float(spec["value"])
+    elif distribution == "uniform":
+        value = rng.uniform(spec["low"], spec["high"])
+    elif distribution == "lognormal":
+        value = spec["median"] * math.exp(rng.normal(0.0, spec.get("sigma", 0.5)))
+    else:
+        raise ConfigurationError(f"Unknown mock distribution '{distribution}'. Use fixed, uniform or lognormal.")
+    return min(value, spec.get("max", value))
+
+
+def mock_text(prompt, temperature, chars):
+    """A response of about `chars` characters that names its temperature."""
+    head = f"Mock answer at temperature {temperature:.2f}. "
+    body_chars = max(0, chars - len(head))
+    repeats = body_chars // len(FILLER) + 1
+    return head + (FILLER * repeats)[:body_chars]
+
+
+def _response(status, body, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.headers["Content-Type"] = "application/json"
+    response._content = json.dumps(body).encode("utf-8")
+    response.url = "mock://provider"
+    response.reason = {200: "OK", 429: "Too Many Requests", 500: "Internal Server Error"}.get(status)
+    return response
+
+
+class MockProvider:
+    """
+    Simulated provider with one random generator and call counter per
+    profile. Calls sleep for their drawn latency, so they occupy a worker
+    slot just like a real request.
+    """
+
+    def __init__(self, profiles=None):
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._states = {}
+        self.configure(profiles)
+
+    def configure(self, profiles=None):
+        with self._lock:
+            self._profiles = {name: dict(DEFAULT_MOCK_PROFILE, **profile) for name, profile in (profiles or {}).items()}
+            self._profiles.setdefault("default", dict(DEFAULT_MOCK_PROFILE))
+            self._states = {}
+
+    def _draws(self, model, n):
+        """Draws a call's outcome under the lock: (status, latency, retry_after, lengths)."""
+        with self._lock:
+            if model not in self._profiles:
+                raise ConfigurationError(f"Unknown mock profile '{model}'. Defined: {list(self._profiles)}")
+            profile = self._profiles[model]
+            state = self._states.setdefault(model, {"rng": np.random.default_rng(profile["seed"]), "calls": 0})
+            rng = state["rng"]
+            state["calls"] += 1
+            limit = profile["rate_limit"]
+            if limit and (state["calls"] - 1) % (limit["every"] + limit["burst"]) >= limit["every"]:
+                return 429, 0.0, limit.get("retry_after", 1.0), []
+            if rng.random() < profile["error_rate"]:
+                return 500, draw(rng, profile["latency"]) * 0.1, None, []
+            lengths = [max(1, int(draw(rng, profile["response_chars"]))) for _ in range(n)]
+            return 200, draw(rng, profile["latency"]), None, lengths
+
+    def call(self, prompt, model, temperature, n=None, stats=None):
+        """Simulates one request and returns its requests.Response."""
+        status, latency, retry_after, lengths = self._draws(model, n or 1)
+        time.sleep(latency)
+        if stats is not None:
+            stats["simulated_latency"] = latency
+        if status == 429:
+            return _response(429, {"error": {"message": "mock rate limit"}}, {"Retry-After": str(retry_after)})
+        if status != 200:
+            return _response(status, {"error": {"message": "mock server error"}})
+        texts = [mock_text(prompt, temperature, chars) for chars in lengths]
+        return _response(200, {
+            "choices": [{"index": i, "message": {"role": "assistant", "content": text}} for i, text in enumerate(texts)],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": sum(lengths) // 4},
+        })
@@ -0,0 +1,84 @@
+"""
+Multi-sample requests: several iterations of a temperature from one API call.
+
+OpenAI-compatible APIs accept `n` and Gemini accepts `candidateCount`, so 20
+iterations at one temperature can be 3 round trips of up to 8 samples
+instead of 20 uploads of the same prompt. The samples are handed out to the
+iteration slots one by one: the cell that makes the call gets the first
+sample, the next cells at that temperature get the rest without a request.
+
+Models that ignore `n` (one choice back) or reject it (HTTP 400/422) fall back
+to single calls for the rest of the run, and the path each model took is reported.
+"""
+import threading
+
+# Services whose API takes a sample count (OpenAI-style "n", Gemini "candidateCount").
+MULTI_SAMPLE_SERVICES = {"openai", "openrouter", "lmstudio", "google", "mock"}
+
+
+class MultiSampler:
+    """
+    Thread-safe pool of fetched-but-unused samples, keyed by (service, model,
+    prompt, temperature, params). Cells at the same temperature take turns so
+    one call's samples are shared instead of being fetched again.
+    """
+
+    def __init__(self, samples_per_call=1):
+        self.samples_per_call = 1
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._pools = {}
+        self._paths = {}
+        self._fallbacks = {}
+        self.configure(samples_per_call)
+
+    def configure(self, samples_per_call=1):
+        self.samples_per_call = max(1, int(samples_per_call or 1))
+
+    def enabled_for(self, service, model):
+        return (self.samples_per_call > 1 and service in MULTI_SAMPLE_SERVICES
+                and (service, model) not in self._fallbacks)
+
+    def fall_back(self, service, model, reason):
+        """Sends every later call for the model through the single-sample path."""
+        with self._lock:
+            if (service, model) not in self._fallbacks:
+                self._fallbacks[(service, model)] = reason
+                print(f"      Multi-sample: {service}/{model} {reason}; using single calls.")
+
+    def take(self, key, slot, last_slot, fetch, is_done):
+        """
+        Returns (response, batched) for an iteration slot. A pooled sample is
+        returned with batched=True. Otherwise `fetch(n)` is called for this
+        slot and up to samples_per_call - 1 later slots below `last_slot` that
+        are neither pooled nor `is_done(slot)`, and the extra samples are pooled.
+        """
+        service, model = key[0], key[1]
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            pool = self._pools.setdefault(key, {})
+            if slot in pool:
+                return pool.pop(slot), True
+            slots = [slot]
+            for other in range(slot + 1, last_slot):
+                if len(slots) >= self.samples_per_call:
+                    break
+                if other not in pool and not is_done(other):
+                    slots.append(other)
+            samples = fetch(len(slots))
+            if len(slots) > 1 and len(samples) < 2:
+                self.fall_back(service, model, f"returned 1 of {len(slots)} samples")
+            with self._lock:
+                self._paths[(service, model)] = max(self._paths.get((service, model), 1), len(samples))
+            for other, sample in zip(slots[1:], samples[1:]):
+                pool[other] = sample
+            return samples[0], False
+
+    def report(self):
+        """{"service/model": "up to n samples per call" or the fallback reason}"""
+        with self._lock:
+            paths = {f"{service}/{model}": f"up to {n} samples per call" for (service, model), n in self._paths.items()}
+            for (service, model), reason in self._fallbacks.items():
+                paths[f"{service}/{model}"] = f"single calls ({reason})"
+            return paths
@@ -0,0 +1,186 @@
+"""
+Scheduling for local Ollama models.
+
+Loading a large local model can take longer than the whole experiment's
+generation time, so queued Ollama experiments are grouped by model and each
+model is loaded once. Every request carries `keep_alive` so the current model
+stays resident between calls. When the last experiment of a model is down to
+its final in-flight cells, the next model is pre-loaded in the background, and
+a finished model is unloaded to free memory for the next one. Cells of an
+Ollama experiment run concurrently up to the server's parallel slots
+(OLLAMA_NUM_PARALLEL) on each of the Ollama servers.
+"""
+import asyncio
+import threading
+
+DEFAULT_OLLAMA_SETTINGS = {
+    "keep_alive": "30m",
+    "options": {},
+    "num_parallel": 1,
+    "preload_next": True,
+    "unload_finished": True,
+}
+
+
+def is_local(job):
+    return job["service"] == "ollama"
+
+
+class OllamaScheduler:
+    """
+    Orders the queue by local model and loads/unloads models around it.
+    `loader(model, keep_alive)` asks the servers to load (or, with keep_alive
+    0, unload) a model without generating anything; `hosts()` is the number
+    of Ollama servers.
+    """
+
+    def __init__(self, loader, settings=None, hosts=None):
+        self.loader = loader
+        self.hosts = hosts or (lambda: 1)
+        self._lock = threading.Lock()
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        self.settings = dict(DEFAULT_OLLAMA_SETTINGS)
+        self.settings.update(settings or {})
+        with self._lock:
+            self._next_model = {}
+            self._unstarted = {}
+            self._running = {}
+            self._cells_left = {}
+            self._preloaded = set()
+
+    def request_fields(self, temperature):
+        """The keep_alive and options fields for an /api/generate request."""
+        options = dict(self.settings["options"])
+        options["temperature"] = temperature
+        return {"keep_alive": self.settings["keep_alive"], "options": options}
+
+    def parallel_slots(self, job):
+        """How many cells of the job may run at once (None for non-Ollama jobs)."""
+        if not is_local(job):
+            return None
+        return max(1, int(self.settings["num_parallel"])) * max(1, self.hosts())
+
+    def plan(self, queued, lead=None):
+        """
+        Returns the queued (position, job) pairs with Ollama experiments grouped
+        by model, each group at the place of its first experiment. Other
+        experiments keep their order. `lead` (a model that is still loaded,
+        e.g. the last one of the previous progressive round) takes the place
+        of the first Ollama group, so it does not have to be loaded again.
+        Every call starts a new pass: its models can be pre-loaded again.
+        """
+        groups = {}
+        order = []
+        for position, job in queued:
+            group = job["model_name"] if is_local(job) else ("remote", position)
+            if group not in groups:
+                groups[group] = []
+                order.append(group)
+            groups[group].append((position, job))
+
+        local_models = [group for group in order if not isinstance(group, tuple)]
+        if lead in groups and local_models[0] != lead:
+            order.remove(lead)
+            order.insert(order.index(local_models[0]), lead)
+            local_models.remove(lead)
+            local_models.insert(0, lead)
+        with self._lock:
+            self._preloaded = set()
+            for model, next_model in zip(local_models, local_models[1:] + [None]):
+                self._next_model[model] = next_model
+                self._unstarted[model] = len(groups[model])
+                self._running[model] = 0
+                self._cells_left[model] = 0
+        return [item for group in order for item in groups[group]]
+
+    @staticmethod
+    def last_model(planned):
+        """The Ollama model that runs last in a planned queue (it stays loaded), or None."""
+        local = [job["model_name"] for _, job in planned if is_local(job)]
+        return local[-1] if local else None
+
+    def begin(self, job, pending):
+        """Starts tracking a job with `pending` cells still to run."""
+        if not is_local(job):
+            return
+        model = job["model_name"]
+        with self._lock:
+            self._unstarted[model] = max(0, self._unstarted.get(model, 1) - 1)
+            self._running[model] = self._running.get(model, 0) + 1
+            self._cells_left[model] = self._cells_left.get(model, 0) + pending
+        self._maybe_preload_next(job)
+
+    def cell_done(self, job):
+        if not is_local(job):
+            return
+        with self._lock:
+            self._cells_left[job["model_name"]] = self._cells_left.get(job["model_name"], 1) - 1
+        self._maybe_preload_next(job)
+
+    def finish(self, job):
+        """Called when all of a job's cells are done; unloads a finished model."""
+        if not is_local(job):
+            return
+        model = job["model_name"]
+        with self._lock:
+            self._running[model] = self._running.get(model, 1) - 1
+            finished = self._running[model] == 0 and self._unstarted.get(model, 0) == 0
+        if finished and self.settings["unload_finished"] and self._next_model.get(model):
+            self._load_in_background(model, 0)
+
+    def _maybe_preload_next(self, job):
+        """
+        Pre-loads the next model once every experiment of the current one has
+        started and no more cells are waiting for a slot than are in flight.
+        """
+        model = job["model_name"]
+        with self._lock:
+            next_model = self._next_model.get(model)
+            if (not self.settings["preload_next"] or not next_model or next_model in self._preloaded
+                    or self._unstarted.get(model, 0) > 0
+                    or self._cells_left.get(model, 0) > self.parallel_slots(job)):
+                return
+            self._preloaded.add(next_model)
+        print(f"   Pre-loading next Ollama model: {next_model}")
+        self._load_in_background(next_model, self.settings["keep_alive"])
+
+    def _load_in_background(self, model, keep_alive):
+        def load():
+            try:
+                self.loader(model, keep_alive)
+            except Exception as e:
+                action = "unload" if keep_alive == 0 else "pre-load"
+                print(f"   Warning: could not {action} Ollama model {model}: {e}")
+        threading.Thread(target=load, daemon=True, name=f"ollama-load-{model}").start()
+
+
+class ModelGate:
+    """
+    Async-mode guard that lets experiments of only one local model run at a
+    time, so concurrent experiments never make Ollama swap models back and
+    forth. Non-Ollama experiments pass straight through.
+    """
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._active = None
+        self._holders = 0
+
+    async def acquire(self, job):
+        if not is_local(job):
+            return
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active in (None, job["model_name"]))
+            self._active = job["model_name"]
+            self._holders += 1
+
+    async def release(self, job):
+        if not is_local(job):
+            return
+        async with self._condition:
+            self._holders -= 1
+            if self._holders == 0:
+                self._active = None
+                self._condition.notify_all()
@@ -0,0 +1,78 @@
+"""
+Capability preflight: one probe per queued model before the run starts.
+
+Every distinct model is probed once, in parallel, with a tiny chat request.
+The probe checks the API key, the model name and that the model answers
+chat requests at all: embedding models are rejected by the chat endpoint,
+and safety classifiers such as llama-guard answer "safe" / "unsafe". Local
+Ollama models are checked with /api/show instead (the model exists and has
+the "completion" capability), so nothing is loaded ahead of the scheduler.
+
+Models that fail are dropped from the run with the reason. A probe that
+fails transiently (timeout, 429, 5xx) or returns an unexpected body only
+warns, and the model runs as usual.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from circuit_breaker import ConfigurationError
+from llm_services import get_llm_response, show_ollama_model
+from retry_policy import http_status_of
+
+PROBE_PROMPT = "Reply with the word OK."
+PROBE_PARAMS = {"max_tokens": 256}
+
+# First words of a safety classifier's verdict.
+CLASSIFIER_ANSWERS = {"safe", "unsafe"}
+
+# Probe outcomes.
+PASSED = "ok"
+WARNING = "warning"
+FAILED = "failed"
+
+
+def describe_failure(exc):
+    status = http_status_of(exc)
+    if status in (401, 403):
+        return f"authentication failed (HTTP {status})"
+    if status == 402:
+        return "no credits left for this model (HTTP 402)"
+    if status == 404:
+        return "model not found (HTTP 404)"
+    if status is not None:
+        return f"chat request rejected (HTTP {status}): {exc}"
+    return str(exc)
+
+
+def probe_model(service, model):
+    """Returns (outcome, message) for one model."""
+    if service == "replay":
+        return PASSED, "served from the response cache"
+    try:
+        if service == "ollama":
+            capabilities = show_ollama_model(model).get("capabilities")
+            if capabilities is not None and "completion" not in capabilities:
+                return FAILED, f"not a generative model (capabilities: {', '.join(capabilities)})"
+            return PASSED, "available locally"
+        answer = get_llm_response(service, PROBE_PROMPT, model, 0.0, params=PROBE_PARAMS)
+    except ConfigurationError as e:
+        return FAILED, str(e)
+    except (ValueError, LookupError, TypeError) as e:
+        return WARNING, f"unexpected response body ({e!r}); running it anyway"
+    except Exception as e:
+        if http_status_of(e) in (400, 401, 402, 403, 404, 405, 410, 422):
+            return FAILED, describe_failure(e)
+        return WARNING, f"probe failed ({e}); running it anyway"
+    words = (answer or "").strip().lower().split()
+    if words and words[0].strip(".,:!") in CLASSIFIER_ANSWERS:
+        return FAILED, f"answers like a safety classifier ({answer.strip()[:40]!r}), not a chat model"
+    return PASSED, "answers chat requests"
+
+
+def run_preflight(models, max_workers=16):
+    """Probes every "service/model" in parallel; returns {model: (outcome, message)}."""
+    models = list(models)
+    if not models:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(models)), thread_name_prefix="preflight") as pool:
+        results = pool.map(lambda model: probe_model(*model.split("/", 1)), models)
+        return dict(zip(models, results))
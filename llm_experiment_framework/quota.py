@@ -0,0 +1,189 @@
+"""
+Request quotas of free-tier models.
+
+Free models (e.g. OpenRouter's ":free" variants) allow a fixed number of
+requests per minute and per day. MODEL_QUOTAS in config.py sets them per
+"service/model"; the model part may be a glob such as "openrouter/*:free".
+
+Every request to such a model is counted against its windows before it is
+sent, and the counts are saved to results/quota.json, so a later run on the
+same day knows how much is left. The daily window is the UTC day, as at
+OpenRouter. A request that does not fit raises QuotaDeferred with the time
+its window reopens: the scheduler runs other cells in the meantime instead
+of counting it as a failed attempt, and cells whose window reopens more
+than `max_wait` seconds away are left for the next run. A 429 from a quota
+model counts as a deferral too; if its reset is more than a minute away the
+day is marked as used up, which also covers requests made with the same key
+elsewhere.
+"""
+import fnmatch
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from rate_limiter import parse_rate_limit_headers
+
+DEFAULT_QUOTA_SETTINGS = {"max_wait": 300}
+
+# Marks a cell deferred to the next run; it is never saved.
+QUOTA_DEFERRED = "DEFERRED: quota used up"
+
+
+class QuotaDeferred(Exception):
+    """Raised instead of sending a request that the model's quota has no room for."""
+
+    def __init__(self, message, until):
+        super().__init__(message)
+        self.until = until
+
+    @property
+    def delay(self):
+        return max(0.0, self.until - time.time())
+
+
+def utc_day(moment):
+    return datetime.fromtimestamp(moment, timezone.utc).strftime("%Y-%m-%d")
+
+
+def next_utc_midnight(moment):
+    day = datetime.fromtimestamp(moment, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (day + timedelta(days=1)).timestamp()
+
+
+def format_until(moment):
+    return datetime.fromtimestamp(moment, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+
+class QuotaBook:
+    """Per-minute and per-day request counts of quota-limited models, saved to a JSON file."""
+
+    def __init__(self, quotas=None, path=None):
+        self._lock = threading.Lock()
+        self.configure(quotas, path)
+
+    def configure(self, quotas=None, path=None):
+        settings = dict(DEFAULT_QUOTA_SETTINGS)
+        limits = {}
+        for key, value in (quotas or {}).items():
+            (limits if isinstance(value, dict) else settings)[key] = value
+        with self._lock:
+            self.max_wait = float(settings["max_wait"])
+            self._limits = limits
+            self.path = path
+            self._usage = {}
+            if path and os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        self._usage = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Warning: could not read {path} ({e}); quota usage starts from zero.")
+
+    def limits(self, service, model):
+        """The model's {"per_minute", "per_day"} limits, or None if it has no quota."""
+        name = f"{service}/{model}"
+        if name in self._limits:
+            return self._limits[name]
+        for pattern, limits in self._limits.items():
+            if fnmatch.fnmatchcase(name, pattern):
+                return limits
+        return None
+
+    def _state(self, name, now):
+        state = self._usage.setdefault(name, {"day": utc_day(now), "used": 0, "exhausted_until": None, "recent": []})
+        if state["day"] != utc_day(now):
+            state.update(day=utc_day(now), used=0)
+        if state["exhausted_until"] and state["exhausted_until"] <= now:
+            state["exhausted_until"] = None
+        state["recent"] = [t for t in state["recent"] if t > now - 60]
+        return state
+
+    def _save(self):
+        if not self.path:
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._usage, f, indent=1)
+        os.replace(temp_path, self.path)
+
+    def _blocked(self, name, limits, state, now):
+        """(until, reason) when the model may not send a request now, else None."""
+        if state["exhausted_until"]:
+            return state["exhausted_until"], "the provider reported its quota used up"
+        if limits.get("per_day") is not None and state["used"] >= limits["per_day"]:
+            return next_utc_midnight(now), f"{state['used']}/{limits['per_day']} requests used today"
+        if limits.get("per_minute") is not None and len(state["recent"]) >= limits["per_minute"]:
+            return min(state["recent"]) + 60, f"{limits['per_minute']} requests in the last minute"
+        return None
+
+    def take(self, service, model):
+        """Counts one request against the model's quota, or raises QuotaDeferred."""
+        limits = self.limits(service, model)
+        if limits is None:
+            return
+        name = f"{service}/{model}"
+        with self._lock:
+            now = time.time()
+            state = self._state(name, now)
+            blocked = self._blocked(name, limits, state, now)
+            if blocked is None:
+                state["used"] += 1
+                state["recent"].append(now)
+                self._save()
+        if blocked is not None:
+            until, reason = blocked
+            raise QuotaDeferred(f"{name}: {reason}; deferred until {format_until(until)}", until)
+
+    def deferral(self, service, model, response):
+        """Turns a 429 from a quota model into QuotaDeferred (a reset over a minute away uses up the day)."""
+        info = parse_rate_limit_headers(response.headers)
+        wait = max(info["retry_after"] or 0.0, info["reset_after"] or 0.0) or 60.0
+        name = f"{service}/{model}"
+        until = time.time() + wait
+        if wait > 60:
+            with self._lock:
+                self._state(name, time.time())["exhausted_until"] = until
+                self._save()
+        return QuotaDeferred(f"{name}: rate limited by the provider; deferred until {format_until(until)}", until)
+
+    def deferred_until(self, service, model):
+        """When a quota model with no room left today can send again (None if it can now, or in a minute)."""
+        limits = self.limits(service, model)
+        if limits is None:
+            return None
+        with self._lock:
+            now = time.time()
+            blocked = self._blocked(f"{service}/{model}", limits, self._state(f"{service}/{model}", now), now)
+        if blocked is None or blocked[0] - now <= self.max_wait:
+            return None
+        return blocked[0]
+
+    def plan(self, queued):
+        """
+        Spreads the queued (position, job) pairs of quota-limited models evenly
+        between the other experiments, so their slow cells run next to paid ones.
+        """
+        limited = [item for item in queued if self.limits(item[1]["service"], item[1]["model_name"])]
+        if not limited or len(limited) == len(queued):
+            return queued
+        others = [item for item in queued if not self.limits(item[1]["service"], item[1]["model_name"])]
+        spacing = len(others) / len(limited)
+        keyed = [(float(i), item) for i, item in enumerate(others)]
+        keyed += [((i + 0.5) * spacing, item) for i, item in enumerate(limited)]
+        return [item for _, item in sorted(keyed, key=lambda pair: pair[0])]
+
+    def report(self):
+        """{"service/model": "n/m requests used today"} for every model used today."""
+        with self._lock:
+            today = utc_day(time.time())
+            lines = {}
+            for name, state in self._usage.items():
+                if state["day"] != today:
+                    continue
+                service, model = name.split("/", 1)
+                per_day = (self.limits(service, model) or {}).get("per_day")
+                lines[name] = f"{state['used']}{'' if per_day is None else f'/{per_day}'} requests used today"
+                if state["exhausted_until"]:
+                    lines[name] += f", used up until {format_until(state['exhausted_until'])}"
+            return lines
@@ -0,0 +1,235 @@
+"""
+Adaptive token-bucket rate limiting for LLM providers.
+
+Every (service, model) pair gets its own bucket. Buckets start at a configured
+rate, ramp up additively after each successful call until they reach their
+ceiling, and halve their rate when the provider answers 429. Retry-After and
+the usual x-ratelimit-* / anthropic-ratelimit-* headers are honoured, so the
+limiter pauses exactly as long as the provider asks instead of a fixed sleep.
+"""
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+# Starting points that mirror the old fixed sleeps (2 s for the big hosted APIs,
+# 0.1 s for everyone else). Override per service or per "service/model" in
+# RATE_LIMITS in config.py.
+DEFAULT_RATE_LIMITS = {
+    "openai": {"initial_rate": 0.5, "max_rate": 10.0},
+    "anthropic": {"initial_rate": 0.5, "max_rate": 10.0},
+    "google": {"initial_rate": 0.5, "max_rate": 10.0},
+    # The mock provider only throttles through its simulated 429s.
+    "mock": {"initial_rate": 10000.0, "max_rate": 10000.0, "burst": 1000},
+    "default": {"initial_rate": 10.0, "max_rate": 50.0},
+}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_seconds(value):
+    """
+    Converts a rate-limit header value into seconds from now.
+    Accepts plain seconds ("12"), Go-style durations ("6m0s", "20ms"),
+    epoch timestamps in seconds or milliseconds, RFC 3339 and HTTP dates.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+
+    if number is not None:
+        now = time.time()
+        if number > 1e12:  # epoch milliseconds (OpenRouter)
+            return max(0.0, number / 1000.0 - now)
+        if number > 1e9:  # epoch seconds
+            return max(0.0, number - now)
+        return max(0.0, number)
+
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+    for parser in (lambda v: datetime.fromisoformat(v.replace("Z", "+00:00")), parsedate_to_datetime):
+        try:
+            moment = parser(value)
+        except (ValueError, TypeError):
+            continue
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+    return None
+
+
+def _first_header(headers, names):
+    for name in names:
+        if name in headers:
+            return headers[name]
+    return None
+
+
+def parse_rate_limit_headers(headers):
+    """
+    Extracts the request quota information a provider sent back.
+    Returns a dict with 'retry_after', 'remaining', 'limit' and 'reset_after'
+    (seconds); keys are None when the provider did not send them.
+    """
+    # requests' CaseInsensitiveDict handles casing; plain dicts are lower-cased here.
+    if not hasattr(headers, "lower_items"):
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+
+    remaining = _first_header(headers, [
+        "x-ratelimit-remaining-requests",
+        "anthropic-ratelimit-requests-remaining",
+        "x-ratelimit-remaining",
+    ])
+    limit = _first_header(headers, [
+        "x-ratelimit-limit-requests",
+        "anthropic-ratelimit-requests-limit",
+        "x-ratelimit-limit",
+    ])
+    reset = _first_header(headers, [
+        "x-ratelimit-reset-requests",
+        "anthropic-ratelimit-requests-reset",
+        "x-ratelimit-reset",
+    ])
+
+    def _as_int(value):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        "retry_after": _parse_seconds(_first_header(headers, ["retry-after"])),
+        "remaining": _as_int(remaining),
+        "limit": _as_int(limit),
+        "reset_after": _parse_seconds(reset),
+    }
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket whose refill rate adapts to provider feedback
+    (additive increase on success, multiplicative decrease on throttling).
+    """
+
+    def __init__(self, initial_rate, max_rate, min_rate=0.05, burst=1, ramp_step=None, backoff_factor=0.5):
+        self.rate = float(initial_rate)
+        self.max_rate = float(max_rate)
+        self.min_rate = float(min_rate)
+        self.capacity = max(1.0, float(burst))
+        self.ramp_step = float(ramp_step) if ramp_step is not None else max(self.rate * 0.1, 0.01)
+        self.backoff_factor = float(backoff_factor)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def record_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.ramp_step)
+
+    def record_throttled(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            self.tokens = 0.0
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+
+    def apply_quota(self, remaining, reset_after):
+        """
+        Keeps the bucket inside the window the provider reported: pauses until
+        the reset when the window is exhausted, otherwise spreads the remaining
+        requests over the time left.
+        """
+        if remaining is None or reset_after is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if remaining <= 0:
+                self.tokens = 0.0
+                self.blocked_until = max(self.blocked_until, now + reset_after)
+            elif reset_after > 0:
+                self.rate = max(self.min_rate, min(self.rate, remaining / reset_after))
+
+
+class RateLimiterRegistry:
+    """
+    Holds one TokenBucket per (service, model), built from DEFAULT_RATE_LIMITS
+    overlaid with any RATE_LIMITS from config.py.
+    """
+
+    def __init__(self, overrides=None):
+        self._settings = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.configure(overrides)
+
+    def configure(self, overrides=None):
+        """Replaces the settings; buckets are rebuilt lazily on the next call."""
+        settings = {key: dict(value) for key, value in DEFAULT_RATE_LIMITS.items()}
+        for key, value in (overrides or {}).items():
+            settings.setdefault(key, {}).update(value)
+        with self._lock:
+            self._settings = settings
+            self._buckets = {}
+
+    def _settings_for(self, service, model):
+        merged = dict(self._settings["default"])
+        merged.update(self._settings.get(service, {}))
+        merged.update(self._settings.get(f"{service}/{model}", {}))
+        return merged
+
+    def get(self, service, model):
+        key = (service, model)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(**self._settings_for(service, model))
+            return self._buckets[key]
+
+    def acquire(self, service, model):
+        self.get(service, model).acquire()
+
+    def observe(self, service, model, response):
+        """Feeds an HTTP response (any status) back into the model's bucket."""
+        bucket = self.get(service, model)
+        info = parse_rate_limit_headers(response.headers)
+        if response.status_code == 429:
+            bucket.record_throttled(info["retry_after"] if info["retry_after"] is not None else info["reset_after"])
+            return
+        if response.status_code == 503 and info["retry_after"] is not None:
+            bucket.record_throttled(info["retry_after"])
+            return
+        bucket.apply_quota(info["remaining"], info["reset_after"])
+        if 200 <= response.status_code < 300:
+            bucket.record_success()
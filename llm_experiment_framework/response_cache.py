@@ -0,0 +1,124 @@
+"""
+On-disk, content-addressed cache of LLM responses.
+
+Each entry is addressed by a hash of (service, model, prompt, temperature,
+iteration slot, plus any swept sampling parameters), so re-running an overlapping experiment returns the same
+response for the same slot without another API call. Entries live as small
+JSON files under the cache directory and are evicted least-recently-used
+first once the cache grows past its size limit.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+class CacheMiss(LookupError):
+    """Raised by the replay service when a response is not in the cache."""
+
+
+def cache_key(service, model, prompt, temperature, slot, params=None):
+    fields = [service.lower(), model, prompt, f"{float(temperature):.2f}", int(slot)]
+    if params:
+        fields.append(params)
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache on disk. A cache with no directory is disabled and
+    never hits.
+    """
+
+    def __init__(self, directory=None, max_size_mb=512):
+        self.directory = None
+        self.max_bytes = 0
+        self._index = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.configure(directory, max_size_mb)
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def configure(self, directory=None, max_size_mb=512):
+        with self._lock:
+            self.directory = directory
+            self.max_bytes = int(max_size_mb * 1024 * 1024)
+            self._index = OrderedDict()
+            self._total_bytes = 0
+            if directory:
+                self._scan()
+
+    def _scan(self):
+        """Rebuilds the LRU order from the files' modification times."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, service, model, prompt, temperature, slot, params=None):
+        """Returns the cached response text, or None."""
+        if not self.enabled:
+            return None
+        key = cache_key(service, model, prompt, temperature, slot, params)
+        with self._lock:
+            if key not in self._index:
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._total_bytes -= self._index.pop(key)
+                return None
+            self._index.move_to_end(key)
+            os.utime(path)
+        return entry["response"]
+
+    def put(self, service, model, prompt, temperature, slot, response, params=None):
+        if not self.enabled:
+            return
+        key = cache_key(service, model, prompt, temperature, slot, params)
+        entry = {
+            "service": service.lower(),
+            "model": model,
+            "prompt_sha256": hashlib.sha256(prompt.encode()).hexdigest(),
+            "temperature": f"{float(temperature):.2f}",
+            "slot": int(slot),
+            "params": params or None,
+            "response": response,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,170 @@
+"""
+Columnar result store: the primary, untruncated record of every experiment.
+
+Each finished experiment is written as one Parquet file under
+
+    results/store/model=<model>/prompt_hash=<hash>/<workbook>/<sheet_name>.parquet
+
+with one row per (temperature, iteration) cell holding the full response and
+its metadata (length, skipped, and degenerate for streams the degeneration
+guard stopped), and one column per sweep axis (top_p, top_k, seed, max_tokens,
+system_prompt; empty when the experiment does not set it). `<workbook>` is the
+output file without its extension, so the same experiment saved to two
+workbooks keeps two independent samples. The hive-style partition directories
+let readers load a single model or prompt without touching the rest:
+
+    import pandas as pd
+    df = pd.read_parquet("results/store", filters=[("model", "==", "ollama__gemma3-27b")])
+
+Excel workbooks are assembled from the store in a single pass at the end of a
+run, or on demand with `python main.py --export-excel`.
+Requires pyarrow (pip install pyarrow).
+"""
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+import pandas as pd
+
+from sweep import SWEEP_AXES
+from degeneration import is_degenerate
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def model_partition(model_full_name):
+    """'openrouter/openai/gpt-oss-120b' -> 'openrouter__openai__gpt-oss-120b' (a safe directory name)."""
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', model_full_name.replace("/", "__"))
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode()).hexdigest()[:16]
+
+
+def workbook_partition(output_filename):
+    """'runs/results.xlsx' -> 'runs__results' (a safe directory name)."""
+    stem = os.path.splitext(output_filename)[0]
+    if os.path.isabs(stem):
+        stem = os.path.basename(stem)
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', stem.replace("/", "__").replace("\\", "__"))
+
+
+class ResultStore:
+    """Writes and reads experiment results in a partitioned Parquet dataset."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @property
+    def available(self):
+        return pyarrow is not None
+
+    def path_for(self, job):
+        return os.path.join(
+            self.directory,
+            f"model={model_partition(job['model_full_name'])}",
+            f"prompt_hash={prompt_hash(job['prompt'])}",
+            workbook_partition(job["output_filename"]),
+            f"{job['sheet_name']}.parquet",
+        )
+
+    def legacy_path_for(self, job):
+        """Where the experiment was stored before the path included its workbook."""
+        return os.path.join(os.path.dirname(os.path.dirname(self.path_for(job))), f"{job['sheet_name']}.parquet")
+
+    def has(self, job):
+        path = self.path_for(job)
+        if not os.path.exists(path):
+            self._adopt_legacy(job, path)
+        return os.path.exists(path)
+
+    def _adopt_legacy(self, job, path):
+        """Moves an experiment stored in the old layout to its path, if it was saved for the job's workbook."""
+        legacy = self.legacy_path_for(job)
+        if not os.path.exists(legacy):
+            return
+        output_files = pd.read_parquet(legacy, columns=["output_file"])["output_file"]
+        if len(output_files) and output_files.iloc[0] == job["output_filename"]:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(legacy, path)
+
+    def write(self, job, responses):
+        """
+        Writes an experiment's {(temp_idx, iter_idx): response} dict. Cells of
+        an earlier save that lie outside the job's grid (after the grid was
+        changed) are kept.
+        """
+        rows = []
+        written_at = datetime.now().isoformat(timespec="seconds")
+        spec = json.dumps(job["spec"], ensure_ascii=False)
+        for (t_idx, iter_idx), response in sorted(responses.items()):
+            row = {
+                "experiment": job["key"],
+                "model_full_name": job["model_full_name"],
+                "service": job["service"],
+                "prompt": job["prompt"],
+                "sheet_name": job["sheet_name"],
+                "output_file": job["output_filename"],
+                "temperature": round(float(job["temps"][t_idx]), 2),
+                "iteration": iter_idx + 1,
+                "response": response,
+                "response_chars": len(response),
+                "skipped": response.startswith("SKIPPED_"),
+                "degenerate": is_degenerate(response),
+                "written_at": written_at,
+                "spec": spec,
+            }
+            for axis in SWEEP_AXES:
+                row[axis] = job["params"].get(axis)
+            rows.append(row)
+        # Fixed dtypes keep the axis columns' types the same in every file, set or not.
+        df = pd.DataFrame(rows).astype(SWEEP_AXES)
+        path = self.path_for(job)
+        if self.has(job):
+            previous = pd.read_parquet(path)
+            cells = set(zip(df["temperature"], df["iteration"]))
+            kept = previous[[cell not in cells for cell in zip(previous["temperature"], previous["iteration"])]]
+            if len(kept):
+                df = pd.concat([df, kept.reindex(columns=df.columns).astype(SWEEP_AXES)], ignore_index=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, engine="pyarrow", index=False)
+        os.replace(tmp_path, path)
+
+    def cells(self, job):
+        """Returns every stored cell as {(temperature label, iteration): response}."""
+        df = pd.read_parquet(self.path_for(job), columns=["temperature", "iteration", "response"])
+        return {(f"{temperature:.2f}", int(iteration)): response for temperature, iteration, response in df.itertuples(index=False)}
+
+    def read(self, job):
+        """Returns the stored {(temp_idx, iter_idx): response} dict for the job's grid."""
+        labels = {f"{temp:.2f}": t_idx for t_idx, temp in enumerate(job["temps"])}
+        responses = {}
+        for (label, iteration), response in self.cells(job).items():
+            t_idx = labels.get(label)
+            if t_idx is not None and 1 <= iteration <= job["iterations"]:
+                responses[(t_idx, iteration - 1)] = response
+        return responses
+
+    def entries(self):
+        """Yields (path, EXPERIMENTS entry) for every stored experiment."""
+        for root, _, files in sorted(os.walk(self.directory)):
+            for name in sorted(files):
+                if name.endswith(".parquet"):
+                    path = os.path.join(root, name)
+                    spec = pd.read_parquet(path, columns=["spec"])["spec"]
+                    if len(spec):
+                        yield path, json.loads(spec.iloc[0])
+
+
+def load_results(directory, filters=None, columns=None):
+    """
+    Loads the store (or a part of it) as one long DataFrame: one row per cell,
+    plus the `model` and `prompt_hash` partition columns.
+    """
+    return pd.read_parquet(directory, engine="pyarrow", filters=filters, columns=columns)
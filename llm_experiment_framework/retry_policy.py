@@ -0,0 +1,135 @@
+"""
+Unattended error handling: exponential backoff with jitter, a per-cell attempt
+cap, and a dead-letter file for cells that still fail.
+
+A dead-lettered cell is written into its sheet as SKIPPED_ERROR so the rest of
+the grid keeps running. `python main.py --retry-failed` re-drives the
+dead-letter files later and patches the saved sheets.
+"""
+import json
+import os
+import random
+import threading
+from datetime import datetime
+
+from circuit_breaker import CircuitOpenError, ConfigurationError
+from journal import temperature_key
+from response_cache import CacheMiss
+
+# HTTP statuses that will not get better by asking again.
+NON_RETRYABLE_STATUSES = {400, 401, 403, 404, 405, 410, 413, 422}
+
+
+def http_status_of(exc):
+    """Returns the HTTP status carried by a requests/httpx error, or None."""
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc):
+    """
+    Transient failures (network errors, timeouts, 429, 5xx, truncated or
+    malformed response bodies) are retried; configuration errors, hard 4xx
+    responses, replay cache misses and models whose circuit breaker is open
+    are not.
+    """
+    if isinstance(exc, (ConfigurationError, CacheMiss, CircuitOpenError)):
+        return False
+    return http_status_of(exc) not in NON_RETRYABLE_STATUSES
+
+
+class RetryPolicy:
+    """
+    Full-jitter exponential backoff: attempt n waits a random time between 0
+    and min(max_delay, base_delay * 2**(n-1)) seconds.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=2.0, max_delay=120.0):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+
+    def should_retry(self, exc, attempt):
+        return attempt < self.max_attempts and is_retryable(exc)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def dead_letter_path_for(output_file):
+    """results/foo.xlsx -> results/foo.failed.jsonl"""
+    return os.path.splitext(output_file)[0] + ".failed.jsonl"
+
+
+class DeadLetterQueue:
+    """
+    JSONL file of cells that exhausted their attempts. Failures are appended as
+    they happen; cells that later succeed are resolved in memory and dropped
+    from the file by compact().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._entries[(entry["experiment"], entry["temperature"], entry["iteration"])] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def get(self, exp_key, temp, iteration):
+        """Returns the entry of a failed cell (1-based iteration), or None."""
+        with self._lock:
+            return self._entries.get((exp_key, temperature_key(temp), iteration))
+
+    def record(self, job, temp, iteration, error, attempts):
+        entry = {
+            "experiment": job["key"],
+            "temperature": temperature_key(temp),
+            "iteration": iteration,
+            "error": str(error),
+            "attempts": attempts,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "spec": job["spec"],
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries[(entry["experiment"], entry["temperature"], iteration)] = entry
+
+    def resolve(self, exp_key, temp, iteration):
+        with self._lock:
+            if self._entries.pop((exp_key, temperature_key(temp), iteration), None) is not None:
+                self._dirty = True
+
+    def compact(self):
+        """Rewrites the file with only the unresolved cells (removes it when empty)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            if not self._entries:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            else:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for entry in self._entries.values():
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                os.replace(tmp_path, self.path)
+            self._dirty = False
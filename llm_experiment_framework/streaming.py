@@ -0,0 +1,101 @@
+"""
+Helpers for reading streamed LLM responses.
+
+OpenAI-compatible, Anthropic and Google endpoints stream Server-Sent Events;
+Ollama streams newline-delimited JSON. StreamCollector accumulates the text and
+measures time-to-first-token and generation speed while the chunks arrive.
+"""
+import json
+import time
+
+
+def iter_lines(response, stats=None):
+    """
+    Yields decoded lines from a streamed requests or httpx response, adding
+    their size to stats["response_bytes"] when stats is given.
+    """
+    for line in response.iter_lines():
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if stats is not None:
+            stats["response_bytes"] = stats.get("response_bytes", 0) + len(line.encode("utf-8")) + 1
+        yield line
+
+
+def iter_sse_data(response, stats=None):
+    """
+    Yields the JSON payload of every SSE `data:` line. Comment lines
+    (keep-alives such as ": OPENROUTER PROCESSING") and `event:` lines are
+    skipped; the stream ends at `data: [DONE]`.
+    """
+    for line in iter_lines(response, stats):
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return
+        if payload:
+            yield json.loads(payload)
+
+
+def iter_ndjson(response, stats=None):
+    """Yields one JSON object per non-empty line."""
+    for line in iter_lines(response, stats):
+        if line.strip():
+            yield json.loads(line)
+
+
+class StreamCollector:
+    """
+    Accumulates streamed text and fills `stats` with:
+    ttft (s), duration (s), chunks, completion_tokens and tokens_per_sec.
+
+    `on_chunk(delta)` is called with each new piece of answer text; an
+    exception it raises ends the stream.
+    """
+
+    def __init__(self, on_chunk=None, stats=None):
+        self.on_chunk = on_chunk
+        self.stats = stats if stats is not None else {}
+        self.parts = []
+        self.chunks = 0
+        self.completion_tokens = None
+        self._start = time.monotonic()
+        self._first_token = None
+
+    def mark_token(self):
+        """Records the first generated token (reasoning tokens count too)."""
+        if self._first_token is None:
+            self._first_token = time.monotonic()
+        self.chunks += 1
+
+    def add(self, text):
+        if not text:
+            return
+        self.mark_token()
+        self.parts.append(text)
+        if self.on_chunk is not None:
+            try:
+                self.on_chunk(text)
+            except Exception:
+                # The callback cancelled the stream (e.g. the degeneration guard); keep its timing stats.
+                self.finish()
+                raise
+
+    def text(self):
+        return "".join(self.parts)
+
+    def finish(self):
+        """Finalises the timing stats and returns the full text."""
+        end = time.monotonic()
+        tokens = self.completion_tokens if self.completion_tokens is not None else self.chunks
+        ttft = None if self._first_token is None else self._first_token - self._start
+        generation_time = end - (self._first_token if self._first_token is not None else self._start)
+        self.stats.update({
+            "ttft": ttft,
+            "duration": end - self._start,
+            "chunks": self.chunks,
+            "completion_tokens": tokens,
+            "tokens_per_sec": tokens / generation_time if generation_time > 0 and tokens else None,
+        })
+        return self.text()
@@ -0,0 +1,115 @@
+"""
+Sweeps over sampling parameters other than temperature.
+
+An EXPERIMENTS entry can add a "sweep" over any of SWEEP_AXES, either as a
+Cartesian grid (a dict of axis -> values) or as a sparse list of points:
+
+    "sweep": {"top_p": [0.8, 0.95, 1.0], "seed": {"start": 1, "end": 3, "step": 1}}
+    "sweep": [{"top_p": 0.9, "max_tokens": 512}, {"top_p": 1.0, "system_prompt": "Be brief."}]
+
+Every point becomes a sub-experiment with its own sheet: the same entry
+with the point's values in "params", still run over the entry's
+temperature_range and iterations. "params" can also be set directly for a
+single fixed point. Points are generated from the config one at a time and
+counted without expanding them; the run queue then holds one job per point
+that still has cells to run, which the schedulers order as a whole.
+"""
+import hashlib
+import itertools
+import json
+import math
+
+import numpy as np
+
+# Axis -> pandas dtype of its column in the result store.
+SWEEP_AXES = {
+    "top_p": "float64",
+    "top_k": "Int64",
+    "seed": "Int64",
+    "max_tokens": "Int64",
+    "system_prompt": "string",
+}
+
+
+def axis_values(axis, values):
+    """Expands an axis given as a list or as a {"start", "end", "step"} range."""
+    if axis not in SWEEP_AXES:
+        raise ValueError(f"Unknown sweep axis '{axis}'. Supported: {list(SWEEP_AXES)}")
+    if isinstance(values, dict):
+        values = np.arange(values["start"], values["end"] + values["step"] / 2, values["step"])
+        if SWEEP_AXES[axis] == "Int64":
+            return [int(round(value)) for value in values]
+        return [round(float(value), 6) for value in values]
+    if not isinstance(values, (list, tuple)):
+        return [values]
+    return list(values)
+
+
+def check_params(params):
+    for axis in params:
+        if axis not in SWEEP_AXES:
+            raise ValueError(f"Unknown sampling parameter '{axis}'. Supported: {list(SWEEP_AXES)}")
+    return params
+
+
+def sweep_points(experiment):
+    """Yields the params of every point of the entry's sweep (one empty point without a sweep)."""
+    base = check_params(dict(experiment.get("params") or {}))
+    sweep = experiment.get("sweep")
+    if not sweep:
+        yield base
+    elif isinstance(sweep, dict):
+        axes = list(sweep)
+        values = [axis_values(axis, sweep[axis]) for axis in axes]
+        for combination in itertools.product(*values):
+            yield dict(base, **dict(zip(axes, combination)))
+    else:
+        for point in sweep:
+            yield dict(base, **check_params(point))
+
+
+def count_points(experiment):
+    sweep = experiment.get("sweep")
+    if not sweep:
+        return 1
+    if isinstance(sweep, dict):
+        return math.prod(len(axis_values(axis, values)) for axis, values in sweep.items())
+    return len(sweep)
+
+
+def expand_experiments(experiments):
+    """
+    Lazily yields one EXPERIMENTS entry per sweep point, with the point in
+    "params" and the "sweep" key removed.
+    """
+    for experiment in experiments:
+        for params in sweep_points(experiment):
+            spec = {key: value for key, value in experiment.items() if key not in ("sweep", "params")}
+            if params:
+                spec["params"] = params
+            yield spec
+
+
+def count_experiments(experiments):
+    """Number of entries expand_experiments() yields, without expanding them."""
+    return sum(count_points(experiment) for experiment in experiments)
+
+
+def params_key(params):
+    """Canonical JSON of a point, used in experiment and cache keys."""
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+def params_hash(params):
+    """32-bit hash of a point for its sheet name; run_experiments still rejects the rare collision."""
+    return hashlib.md5(params_key(params).encode()).hexdigest()[:8]
+
+
+def describe_params(params):
+    """'top_p=0.9, seed=2' (long system prompts are shortened)."""
+    parts = []
+    for axis, value in params.items():
+        if isinstance(value, str) and len(value) > 40:
+            value = value[:37] + "..."
+        parts.append(f"{axis}={value}")
+    return ", ".join(parts)
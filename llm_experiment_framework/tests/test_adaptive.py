@@ -0,0 +1,131 @@
+import pytest
+
+from adaptive import (EARLY_STOP_MARKER, AdaptiveSampler, EarlyStopSampler, beta_credible_interval, coarse_grid,
+                      estimate_transition, extract_final_answer, score_contains, score_exact, wilson_interval)
+
+
+def answer_for(temperature, transition=0.8):
+    """A model that is always right below the transition temperature and always wrong above it."""
+    return "The answer is 4" if temperature < transition else "The answer is 7"
+
+
+def run_to_completion(sampler):
+    while True:
+        cells = sampler.next_batch()
+        if not cells:
+            return
+        sampler.record({cell: answer_for(sampler.temps[cell[0]]) for cell in cells})
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(10, 20)
+    assert low == pytest.approx(0.2993, abs=1e-4) and high == pytest.approx(0.7007, abs=1e-4)
+    low, high = wilson_interval(5, 5)
+    assert high == 1.0 and low == pytest.approx(0.5655, abs=1e-4)
+    # More samples give a narrower interval.
+    assert wilson_interval(50, 100)[1] - wilson_interval(50, 100)[0] < high - low
+
+
+def test_coarse_grid_always_includes_the_end():
+    assert list(coarse_grid({"start": 0.0, "end": 1.0, "step": 0.1}, {"coarse_step": 0.25})) == [0.0, 0.25, 0.5, 0.75, 1.0]
+    assert list(coarse_grid({"start": 0.0, "end": 1.2, "step": 0.1}, {})) == [0.0, 0.5, 1.0, 1.2]
+
+
+def test_extract_and_score():
+    assert extract_final_answer("Some work.\n\\boxed{42}\nDone.") == "42"
+    assert extract_final_answer("So the final answer is: 7.") == "7."
+    assert extract_final_answer("Thinking...\n12") == "12"
+    assert score_exact(" 4. ", "4") == 1.0
+    assert score_contains("x = 4$", "4") == 1.0
+    assert score_contains("x = 5", "4") == 0.0
+
+
+def test_estimate_transition_interpolates_the_half_peak_crossing():
+    points = [{"temperature": "0.50", "accuracy": 1.0}, {"temperature": "1.00", "accuracy": 0.0}]
+    assert estimate_transition(points) == 0.75
+    assert estimate_transition([{"temperature": "0.50", "accuracy": 1.0}]) is None
+
+
+def test_adaptive_sampler_spends_its_budget_around_the_transition():
+    sampler = AdaptiveSampler({"start": 0.0, "end": 2.0, "step": 0.1}, 10, {"expected": "4", "budget": 60})
+    first = sampler.next_batch()
+    # The coarse pass: initial_iterations (4) calls at each of 0.0, 0.5, 1.0, 1.5, 2.0.
+    assert len(first) == 20 and sorted(sampler.temps) == [0.0, 0.5, 1.0, 1.5, 2.0]
+    sampler.record({cell: answer_for(sampler.temps[cell[0]]) for cell in first})
+    run_to_completion(sampler)
+
+    assert sampler.spent == sampler.budget == 60
+    added = sorted(set(sampler.temps) - {0.0, 0.5, 1.0, 1.5, 2.0})
+    assert added and all(0.5 < temp < 1.0 for temp in added)
+    assert sampler.curve()["transition"] == pytest.approx(0.8, abs=0.06)
+    temps, responses = sampler.grid()
+    assert list(temps) == sorted(temps)
+    assert len(responses) == 60
+
+
+def test_adaptive_sampler_resumes_from_known_cells():
+    settings = {"expected": "4", "budget": 40}
+    first = AdaptiveSampler({"start": 0.0, "end": 2.0, "step": 0.1}, 10, settings)
+    run_to_completion(first)
+    known = {(first.temps[t_idx], iter_idx): response for (t_idx, iter_idx), response in first.responses.items()}
+
+    resumed = AdaptiveSampler({"start": 0.0, "end": 2.0, "step": 0.1}, 10, settings,
+                              known=lambda temp, iter_idx: known.get((temp, iter_idx)))
+    assert resumed.next_batch() == []
+    assert resumed.temps == first.temps and resumed.spent == 40
+
+
+def test_default_budget_is_half_the_uniform_grid():
+    sampler = AdaptiveSampler({"start": 0.0, "end": 1.0, "step": 0.1}, 10, {"expected": "4"})
+    assert sampler.budget == 11 * 10 // 2
+
+
+def test_a_sampler_needs_an_expected_answer():
+    with pytest.raises(ValueError):
+        AdaptiveSampler({"start": 0.0, "end": 1.0, "step": 0.1}, 10, {})
+
+
+def noisy_answer(t_idx, iter_idx):
+    """Always right at the first temperature, always wrong at the last, a coin flip in between."""
+    if t_idx == 0:
+        return "4"
+    if t_idx == 2:
+        return "7"
+    return "4" if iter_idx % 2 else "7"
+
+
+def run_early_stop(interval):
+    sampler = EarlyStopSampler([0.0, 0.5, 1.0], 20, {"expected": "4", "interval": interval})
+    while True:
+        cells = sampler.next_batch()
+        if not cells:
+            return sampler
+        sampler.record({cell: noisy_answer(*cell) for cell in cells})
+
+
+def test_beta_credible_interval_is_reproducible_and_shrinks():
+    assert beta_credible_interval(5, 5) == beta_credible_interval(5, 5)
+    low, high = beta_credible_interval(0, 10)
+    assert low < 0.01 and high == pytest.approx(0.29, abs=0.02)
+    assert beta_credible_interval(50, 100)[1] - beta_credible_interval(50, 100)[0] < high - low
+
+
+@pytest.mark.parametrize("interval, stop_after", [("wilson", 9), ("bayes", 10)])
+def test_early_stop_settles_certain_temperatures_and_keeps_sampling_uncertain_ones(interval, stop_after):
+    sampler = run_early_stop(interval)
+    assert sampler.stopped == {0, 2}
+    assert sampler.counts == [stop_after, 20, stop_after]
+    temps, responses = sampler.grid()
+    assert len(responses) == 3 * 20
+    skipped = [cell for cell, response in responses.items() if response == EARLY_STOP_MARKER]
+    assert len(skipped) == 2 * (20 - stop_after)
+    assert all(t_idx in (0, 2) and iter_idx >= stop_after for t_idx, iter_idx in skipped)
+
+
+def test_early_stop_never_stops_before_min_iterations():
+    sampler = EarlyStopSampler([0.0], 20, {"expected": "4", "min_iterations": 12, "max_width": 0.9})
+    assert len(sampler.next_batch()) == 12
+    sampler.record({(0, iter_idx): "4" for iter_idx in range(12)})
+    assert sampler.next_batch() == []
+    assert sampler.counts == [12]
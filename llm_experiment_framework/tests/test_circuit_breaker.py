@@ -0,0 +1,72 @@
+import json
+
+import pytest
+import requests
+
+from circuit_breaker import CircuitBreakerRegistry, CircuitOpenError, ConfigurationError, is_hard_failure
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+@pytest.mark.parametrize("exc", [http_error(401), http_error(404), http_error(422), ConfigurationError("no API key")])
+def test_hard_failures(exc):
+    assert is_hard_failure(exc)
+
+
+@pytest.mark.parametrize("exc", [
+    http_error(429), http_error(500), http_error(503),
+    requests.Timeout("slow"), requests.ConnectionError("refused"),
+    json.JSONDecodeError("Expecting value", "", 0),   # truncated body
+    KeyError("choices"),                              # 200 with an upstream error payload
+    TypeError("'NoneType' object is not subscriptable"),
+    CircuitOpenError("already open"),
+])
+def test_transient_failures_are_not_hard(exc):
+    assert not is_hard_failure(exc)
+
+
+def test_breaker_opens_after_consecutive_hard_failures():
+    breakers = CircuitBreakerRegistry({"threshold": 3})
+    for _ in range(2):
+        breakers.record_failure("openrouter", "m", http_error(404))
+    breakers.check("openrouter", "m")
+    breakers.record_failure("openrouter", "m", http_error(404))
+    assert breakers.is_open("openrouter", "m")
+    with pytest.raises(CircuitOpenError, match="3 consecutive hard failures"):
+        breakers.check("openrouter", "m")
+    assert not breakers.is_open("openrouter", "other")
+    assert list(breakers.open_breakers()) == ["openrouter/m"]
+
+
+def test_success_resets_and_transient_errors_neither_count_nor_reset():
+    breakers = CircuitBreakerRegistry({"threshold": 2})
+    breakers.record_failure("openai", "m", http_error(400))
+    breakers.record_success("openai", "m")
+    breakers.record_failure("openai", "m", http_error(400))
+    assert not breakers.is_open("openai", "m")
+
+    breakers.record_failure("openai", "m", http_error(503))
+    breakers.record_failure("openai", "m", json.JSONDecodeError("Expecting value", "", 0))
+    assert not breakers.is_open("openai", "m")
+    breakers.record_failure("openai", "m", http_error(400))
+    assert breakers.is_open("openai", "m")
+
+
+def test_threshold_zero_disables_the_breaker():
+    breakers = CircuitBreakerRegistry({"threshold": 0})
+    for _ in range(10):
+        breakers.record_failure("google", "m", http_error(403))
+    assert not breakers.is_open("google", "m")
+    breakers.check("google", "m")
+
+
+def test_configure_closes_every_breaker():
+    breakers = CircuitBreakerRegistry({"threshold": 1})
+    breakers.record_failure("openai", "m", ConfigurationError("OPENAI_API_KEY not found"))
+    assert breakers.is_open("openai", "m")
+    breakers.configure({"threshold": 1})
+    assert not breakers.is_open("openai", "m")
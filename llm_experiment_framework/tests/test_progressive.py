@@ -0,0 +1,77 @@
+import pytest
+
+from main import progressive_rounds
+from ollama_scheduler import OllamaScheduler
+
+
+@pytest.mark.parametrize("iterations, settings, rounds", [
+    (20, {}, [2, 4, 8, 16, 20]),
+    (16, {"first_round": 2, "growth": 2}, [2, 4, 8, 16]),
+    (10, {"first_round": 1, "growth": 3}, [1, 3, 9, 10]),
+    (10, {"first_round": 2, "growth": 1}, [2, 3, 4, 5, 6, 7, 8, 9, 10]),   # growth never stalls
+    (1, {}, [1]),
+    (5, {"first_round": 8}, [5]),
+])
+def test_progressive_rounds(iterations, settings, rounds):
+    assert progressive_rounds(iterations, settings) == rounds
+
+
+def ollama_job(model):
+    return {"service": "ollama", "model_name": model}
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = OllamaScheduler(loader=None, settings={"num_parallel": 1})
+    scheduler.loads = []
+    scheduler._load_in_background = lambda model, keep_alive: scheduler.loads.append((model, keep_alive))
+    return scheduler
+
+
+def run_round(scheduler, queued, lead=None):
+    """Plans a round and runs each job's two cells one after another."""
+    planned = scheduler.plan(queued, lead=lead)
+    for _, job in planned:
+        scheduler.begin(job, 2)
+        scheduler.cell_done(job)
+        scheduler.cell_done(job)
+        scheduler.finish(job)
+    return planned
+
+
+def test_plan_groups_ollama_jobs_by_model_and_keeps_remote_order(scheduler):
+    remote = {"service": "openrouter", "model_name": "x"}
+    queued = [(1, ollama_job("a")), (2, remote), (3, ollama_job("b")), (4, ollama_job("a"))]
+    assert [position for position, _ in scheduler.plan(queued)] == [1, 4, 2, 3]
+
+
+def test_lead_model_takes_the_first_ollama_slot(scheduler):
+    remote = {"service": "openrouter", "model_name": "x"}
+    queued = [(1, remote), (2, ollama_job("a")), (3, ollama_job("b")), (4, ollama_job("c"))]
+    planned = scheduler.plan(queued, lead="c")
+    assert [position for position, _ in planned] == [1, 4, 2, 3]
+    assert scheduler.last_model(planned) == "b"
+    assert scheduler.last_model([(1, remote)]) is None
+
+
+def test_every_round_preloads_again_and_starts_with_the_loaded_model(scheduler):
+    queued = [(i, ollama_job(model)) for i, model in enumerate("abc")]
+    planned = run_round(scheduler, queued)
+    assert scheduler.loads == [("b", "30m"), ("a", 0), ("c", "30m"), ("b", 0)]
+
+    scheduler.loads.clear()
+    planned = run_round(scheduler, queued, lead=scheduler.last_model(planned))
+    assert [job["model_name"] for _, job in planned] == ["c", "a", "b"]
+    # "c" stays loaded from the first round; the others are pre-loaded again, and only finished models are unloaded.
+    assert scheduler.loads == [("a", "30m"), ("c", 0), ("b", "30m"), ("a", 0)]
+
+
+def test_last_model_is_never_unloaded(scheduler):
+    run_round(scheduler, [(1, ollama_job("a"))])
+    assert scheduler.loads == []
+
+
+def test_parallel_slots_scale_with_the_number_of_servers():
+    scheduler = OllamaScheduler(loader=None, settings={"num_parallel": 4}, hosts=lambda: 3)
+    assert scheduler.parallel_slots(ollama_job("a")) == 12
+    assert scheduler.parallel_slots({"service": "openai", "model_name": "x"}) is None
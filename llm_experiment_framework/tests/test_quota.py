@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+
+import pytest
+import requests
+
+import quota
+from quota import QuotaBook, QuotaDeferred
+
+QUOTAS = {"openrouter/*:free": {"per_minute": 2, "per_day": 3}, "max_wait": 300}
+NOON = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOON]
+    monkeypatch.setattr(quota.time, "time", lambda: now[0])
+    return now
+
+
+def test_only_matching_models_are_limited():
+    book = QuotaBook(QUOTAS)
+    assert book.limits("openrouter", "deepseek/deepseek-r1:free") == {"per_minute": 2, "per_day": 3}
+    assert book.limits("openrouter", "deepseek/deepseek-r1") is None
+    assert book.max_wait == 300
+
+
+def test_per_minute_window_slides(clock):
+    book = QuotaBook(QUOTAS)
+    book.take("openrouter", "m:free")
+    clock[0] += 30
+    book.take("openrouter", "m:free")
+    with pytest.raises(QuotaDeferred) as deferred:
+        book.take("openrouter", "m:free")
+    assert deferred.value.until == NOON + 60
+    clock[0] = NOON + 61
+    book.take("openrouter", "m:free")
+
+
+def test_daily_quota_defers_to_utc_midnight_and_resets(clock):
+    book = QuotaBook(QUOTAS)
+    for _ in range(3):
+        book.take("openrouter", "m:free")
+        clock[0] += 61
+    with pytest.raises(QuotaDeferred) as deferred:
+        book.take("openrouter", "m:free")
+    midnight = datetime(2026, 3, 2, tzinfo=timezone.utc).timestamp()
+    assert deferred.value.until == midnight
+    assert book.deferred_until("openrouter", "m:free") == midnight
+    assert book.deferred_until("openrouter", "paid-model") is None
+
+    clock[0] = midnight + 1
+    book.take("openrouter", "m:free")
+    assert book.report() == {"openrouter/m:free": "1/3 requests used today"}
+
+
+def test_short_waits_are_not_deferred_to_the_next_run(clock):
+    book = QuotaBook(QUOTAS)
+    book.take("openrouter", "m:free")
+    book.take("openrouter", "m:free")
+    # The minute window reopens in 60 s, within max_wait.
+    assert book.deferred_until("openrouter", "m:free") is None
+
+
+def test_usage_is_saved_across_runs(clock, tmp_path):
+    path = str(tmp_path / "quota.json")
+    book = QuotaBook(QUOTAS, path)
+    for _ in range(3):
+        book.take("openrouter", "m:free")
+        clock[0] += 61
+    with pytest.raises(QuotaDeferred):
+        QuotaBook(QUOTAS, path).take("openrouter", "m:free")
+
+
+def rate_limited(retry_after):
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def test_a_long_429_uses_up_the_day_and_a_short_one_does_not(clock):
+    book = QuotaBook(QUOTAS)
+    short = book.deferral("openrouter", "m:free", rate_limited(20))
+    assert short.until == NOON + 20
+    book.take("openrouter", "m:free")
+
+    long = book.deferral("openrouter", "m:free", rate_limited(3600))
+    assert long.until == NOON + 3600
+    with pytest.raises(QuotaDeferred, match="provider reported its quota used up"):
+        book.take("openrouter", "m:free")
+    assert book.deferred_until("openrouter", "m:free") == NOON + 3600
+
+
+def test_plan_spreads_limited_experiments_between_the_others():
+    book = QuotaBook(QUOTAS)
+    paid = [(i, {"service": "openrouter", "model_name": f"paid-{i}"}) for i in range(4)]
+    free = [(10 + i, {"service": "openrouter", "model_name": f"m{i}:free"}) for i in range(2)]
+    planned = [position for position, _ in book.plan(free + paid)]
+    assert planned == [0, 1, 10, 2, 3, 11]
+    assert book.plan(free) == free
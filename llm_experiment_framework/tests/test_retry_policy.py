@@ -0,0 +1,61 @@
+import json
+
+import pytest
+import requests
+
+from circuit_breaker import CircuitOpenError, ConfigurationError
+from http_pool import CallTimeout
+from response_cache import CacheMiss
+from retry_policy import DeadLetterQueue, RetryPolicy, is_retryable
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+@pytest.mark.parametrize("exc", [
+    http_error(429), http_error(500), http_error(502),
+    requests.ConnectionError("reset"), CallTimeout("no complete answer"),
+    json.JSONDecodeError("Expecting value", "", 0),
+    KeyError("choices"), TypeError("'NoneType' object is not subscriptable"),
+    Exception("Google API Error: No candidates returned"),
+])
+def test_transient_errors_are_retried(exc):
+    assert is_retryable(exc)
+
+
+@pytest.mark.parametrize("exc", [
+    http_error(400), http_error(401), http_error(404),
+    ConfigurationError("OPENROUTER_API_KEY not found"), CacheMiss("no cached response"),
+    CircuitOpenError("disabled for this run"),
+])
+def test_permanent_errors_are_not_retried(exc):
+    assert not is_retryable(exc)
+
+
+def test_attempt_cap_and_backoff_bounds():
+    policy = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=5.0)
+    assert policy.should_retry(http_error(503), 2)
+    assert not policy.should_retry(http_error(503), 3)
+    assert not policy.should_retry(http_error(401), 1)
+    assert all(0 <= policy.backoff(1) <= 2.0 for _ in range(100))
+    assert all(0 <= policy.backoff(10) <= 5.0 for _ in range(100))
+
+
+def test_dead_letter_queue_survives_a_restart_and_compacts(tmp_path):
+    path = str(tmp_path / "results.failed.jsonl")
+    job = {"key": "abc", "spec": {"model": "mock/fast"}}
+    queue = DeadLetterQueue(path)
+    queue.record(job, 0.5, 1, http_error(500), 5)
+    queue.record(job, 0.5, 2, http_error(500), 5)
+
+    reloaded = DeadLetterQueue(path)
+    assert len(reloaded) == 2 and reloaded.get("abc", 0.5, 1)["attempts"] == 5
+    reloaded.resolve("abc", 0.5, 1)
+    reloaded.compact()
+    assert len(DeadLetterQueue(path)) == 1
+    reloaded.resolve("abc", 0.5, 2)
+    reloaded.compact()
+    assert not (tmp_path / "results.failed.jsonl").exists()
@@ -0,0 +1,98 @@
+import pytest
+
+from main import claim_sheet, generate_unique_sheet_name, prepare_experiment
+from manifest import ExperimentManifest
+from sweep import (axis_values, count_experiments, count_points, describe_params, expand_experiments,
+                   params_hash, params_key, sweep_points)
+
+BASE = {"prompt": "What is 2 + 2?", "model": "openrouter/fast", "temperature_range": {"start": 0.0, "end": 1.0, "step": 0.5}}
+
+
+def test_axis_values_expands_ranges_with_the_axis_type():
+    assert axis_values("seed", {"start": 1, "end": 3, "step": 1}) == [1, 2, 3]
+    assert axis_values("top_p", {"start": 0.8, "end": 1.0, "step": 0.1}) == [0.8, 0.9, 1.0]
+    assert axis_values("top_k", 40) == [40]
+
+
+def test_unknown_axis_is_rejected():
+    with pytest.raises(ValueError):
+        axis_values("frequency_penalty", [0.1])
+    with pytest.raises(ValueError):
+        list(sweep_points({"sweep": [{"presence_penalty": 1}]}))
+
+
+def test_grid_sweep_is_the_cartesian_product_over_fixed_params():
+    experiment = dict(BASE, params={"max_tokens": 256}, sweep={"top_p": [0.9, 1.0], "seed": [1, 2, 3]})
+    points = list(sweep_points(experiment))
+    assert len(points) == count_points(experiment) == 6
+    assert {"max_tokens": 256, "top_p": 0.9, "seed": 3} in points
+    assert len({params_key(point) for point in points}) == 6
+
+
+def test_point_list_sweep_and_no_sweep():
+    assert list(sweep_points(dict(BASE, sweep=[{"top_p": 0.9}, {"system_prompt": "Be brief."}]))) == [
+        {"top_p": 0.9}, {"system_prompt": "Be brief."}]
+    assert list(sweep_points(BASE)) == [{}]
+
+
+def test_expansion_matches_the_count_and_moves_points_into_params():
+    experiments = [dict(BASE, sweep={"seed": {"start": 1, "end": 4, "step": 1}}), BASE]
+    expanded = list(expand_experiments(experiments))
+    assert len(expanded) == count_experiments(experiments) == 5
+    assert all("sweep" not in spec for spec in expanded)
+    assert expanded[0]["params"] == {"seed": 1}
+    assert "params" not in expanded[-1]
+
+
+def test_params_key_and_hash_ignore_key_order():
+    assert params_key({"a": 1, "b": 2}) == params_key({"b": 2, "a": 1})
+    assert params_hash({"top_p": 0.9, "seed": 1}) == params_hash({"seed": 1, "top_p": 0.9})
+    assert len(params_hash({"seed": 1})) == 8
+
+
+def test_describe_params_shortens_long_system_prompts():
+    text = describe_params({"top_p": 0.9, "system_prompt": "x" * 100})
+    assert text.startswith("top_p=0.9, system_prompt=xxx")
+    assert text.endswith("...") and len(text) < 70
+
+
+def test_sweep_sheet_names_are_unique_and_fit_excel():
+    # Seeds 106 and 414 shared a sheet name with the old 16-bit hash.
+    names = {generate_unique_sheet_name("openrouter/fast", "p 8387 prompt", point)
+             for point in sweep_points({"sweep": {"seed": {"start": 0, "end": 999, "step": 1}}})}
+    assert len(names) == 1000
+    assert max(len(name) for name in names) <= 31
+    long_name = generate_unique_sheet_name("openrouter/some-very-long-model-name", "prompt", {"system_prompt": "y" * 500})
+    assert len(long_name) <= 31
+
+
+def _job(tmp_path, params=None, output_file="results.xlsx"):
+    spec = dict(BASE, output_file=output_file)
+    if params:
+        spec["params"] = params
+    return prepare_experiment(spec, str(tmp_path))
+
+
+def test_claim_sheet_skips_duplicates_and_rejects_collisions(tmp_path):
+    claimed = {}
+    job = _job(tmp_path, {"seed": 1})
+    assert claim_sheet(claimed, job)
+    assert not claim_sheet(claimed, _job(tmp_path, {"seed": 1}))
+    assert claim_sheet(claimed, _job(tmp_path, {"seed": 1}, output_file="other.xlsx"))
+
+    impostor = _job(tmp_path, {"seed": 2})
+    impostor["sheet_name"] = job["sheet_name"]
+    with pytest.raises(ValueError, match="shared by two different experiments"):
+        claim_sheet(claimed, impostor)
+
+
+def test_manifest_rejects_a_different_experiment_under_a_saved_sheet_name(tmp_path):
+    job = _job(tmp_path, {"seed": 1})
+    manifest = ExperimentManifest(str(tmp_path / "results.manifest.json"), job["output_file"])
+    manifest.record(job)
+    assert manifest.status(job) == "complete"
+
+    impostor = _job(tmp_path, {"seed": 2})
+    impostor["sheet_name"] = job["sheet_name"]
+    with pytest.raises(ValueError, match="already holds a different experiment"):
+        manifest.status(impostor)
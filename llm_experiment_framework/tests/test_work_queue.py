@@ -0,0 +1,41 @@
+import json
+import sqlite3
+
+from work_queue import DONE, PENDING, WorkQueue
+
+
+def make_job(output_file):
+    spec = {"prompt": "hello", "model": "mock/fast", "output_file": output_file}
+    return {"key": "exp", "output_filename": output_file, "spec": spec, "temps": [0.0, 1.0], "iterations": 2,
+            "service": "mock", "model_name": "fast"}
+
+
+def test_same_experiment_for_two_workbooks_gets_its_own_tasks(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite3"))
+    assert queue.enqueue(make_job("q1.xlsx")) == 4
+    assert queue.enqueue(make_job("q2.xlsx"), done={(0, 0): "saved"}) == 3
+    assert queue.enqueue(make_job("q1.xlsx")) == 0
+    assert [(key, output_file) for key, output_file, _ in queue.experiments()] == [("exp", "q1.xlsx"), ("exp", "q2.xlsx")]
+    assert all(task["status"] == PENDING for task in queue.tasks_for("exp", "q1.xlsx"))
+    assert [task["status"] for task in queue.tasks_for("exp", "q2.xlsx")].count(DONE) == 1
+
+
+def test_queue_from_before_output_files_is_migrated(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY, experiment TEXT NOT NULL, temperature TEXT NOT NULL, "
+        "iteration INTEGER NOT NULL, service TEXT NOT NULL, model TEXT NOT NULL, spec TEXT NOT NULL, "
+        "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, lease_expires REAL, available_at REAL NOT NULL DEFAULT 0, "
+        "attempts INTEGER NOT NULL DEFAULT 0, response TEXT, error TEXT, updated REAL, "
+        "UNIQUE (experiment, temperature, iteration));"
+        "CREATE INDEX tasks_by_status ON tasks (status, service);")
+    conn.execute("INSERT INTO tasks (experiment, temperature, iteration, service, model, spec, status, response) "
+                 "VALUES ('exp', '0.0', 1, 'mock', 'fast', ?, 'done', 'r')", (json.dumps(make_job("old.xlsx")["spec"]),))
+    conn.commit()
+    conn.close()
+
+    queue = WorkQueue(path)
+    assert [(key, output_file) for key, output_file, _ in queue.experiments()] == [("exp", "old.xlsx")]
+    assert queue.tasks_for("exp", "old.xlsx")[0]["response"] == "r"
+    assert queue.enqueue(make_job("new.xlsx")) == 4
@@ -0,0 +1,245 @@
+"""
+Shared work queue for draining one experiment grid from several machines.
+
+`python main.py enqueue` expands the experiments in config.py into one task
+per (experiment, output file, temperature, iteration) cell in a SQLite
+database, so an experiment listed for two workbooks gets a set of tasks for
+each. Any number of `python main.py worker` processes, on any machine that can reach the
+database file, lease tasks, run them and report the responses back. A lease
+that is not renewed (the worker crashed or lost its connection) expires, and
+the task goes back to the queue. `python main.py collect` then builds the
+usual per-experiment sheets from the finished tasks.
+
+SQLite serialises writers with a database-level lock, so the queue works on a
+shared local disk or a network share with working file locks; every state
+change is a short transaction.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from journal import temperature_key
+
+TASKS_TABLE = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    output_file TEXT NOT NULL,
+    temperature TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    service TEXT NOT NULL,
+    model TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    response TEXT,
+    error TEXT,
+    updated REAL,
+    UNIQUE (experiment, output_file, temperature, iteration)
+)"""
+
+SCHEMA = TASKS_TABLE + """;
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, service);
+"""
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    A SQLite-backed task queue. Each thread gets its own connection; leasing
+    takes the write lock up front (BEGIN IMMEDIATE) so two workers can never
+    lease the same task.
+    """
+
+    def __init__(self, path, busy_timeout=60):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._migrate()
+        self._connection().executescript(SCHEMA)
+
+    def _migrate(self):
+        """Rebuilds a queue from before tasks were keyed by output file, taking it from each task's spec."""
+        columns = [row["name"] for row in self._connection().execute("PRAGMA table_info(tasks)")]
+        if not columns or "output_file" in columns:
+            return
+        old_columns = ", ".join(columns)
+
+        def rebuild(conn):
+            conn.execute("DROP INDEX IF EXISTS tasks_by_status")
+            conn.execute("ALTER TABLE tasks RENAME TO tasks_old")
+            conn.execute(TASKS_TABLE)
+            conn.execute(f"INSERT INTO tasks ({old_columns}, output_file) SELECT {old_columns}, "
+                         "COALESCE(json_extract(spec, '$.output_file'), 'results.xlsx') FROM tasks_old")
+            conn.execute("DROP TABLE tasks_old")
+
+        self._transaction(rebuild)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def enqueue(self, job, done=None):
+        """
+        Adds a task for every cell of the job. Cells already in `done`
+        ({(temp_idx, iter_idx): response}) are added as finished tasks. Tasks
+        that already exist are left alone, except failed ones, which go back
+        to pending. Returns the number of new or re-queued tasks to run.
+        """
+        done = done or {}
+        spec = json.dumps(job["spec"], ensure_ascii=False)
+        now = time.time()
+
+        def insert(conn):
+            queued = 0
+            for t_idx, temp in enumerate(job["temps"]):
+                for iter_idx in range(job["iterations"]):
+                    response = done.get((t_idx, iter_idx))
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO tasks (experiment, output_file, temperature, iteration, service, model, spec, status, response, updated) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (job["key"], job["output_filename"], temperature_key(temp), iter_idx + 1, job["service"], job["model_name"], spec,
+                         DONE if response is not None else PENDING, response, now))
+                    if cursor.rowcount and response is None:
+                        queued += 1
+                    elif not cursor.rowcount:
+                        cursor = conn.execute(
+                            "UPDATE tasks SET status = ?, attempts = 0, available_at = 0, error = NULL, updated = ? "
+                            "WHERE experiment = ? AND output_file = ? AND temperature = ? AND iteration = ? AND status = ?",
+                            (PENDING, now, job["key"], job["output_filename"], temperature_key(temp), iter_idx + 1, FAILED))
+                        queued += cursor.rowcount
+            return queued
+
+        return self._transaction(insert)
+
+    def lease(self, worker, lease_seconds, max_attempts, services=None, prefer_model=None):
+        """
+        Leases the next runnable task to `worker`, or returns None. Pending
+        tasks and tasks whose lease has expired are runnable; with
+        `prefer_model`, tasks for that model come first (so an Ollama box keeps
+        its loaded model). Expired tasks that are out of attempts are failed.
+        """
+        now = time.time()
+
+        def take(conn):
+            conn.execute(
+                "UPDATE tasks SET status = ?, error = 'lease expired', updated = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, max_attempts))
+            query = ("SELECT * FROM tasks WHERE ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?))")
+            params = [PENDING, now, LEASED, now]
+            if services:
+                query += f" AND service IN ({', '.join('?' * len(services))})"
+                params += list(services)
+            query += " ORDER BY (model = ?) DESC, id LIMIT 1"
+            params.append(prefer_model)
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (LEASED, worker, now + lease_seconds, now, row["id"]))
+            task = dict(row)
+            task["attempts"] += 1
+            return task
+
+        return self._transaction(take)
+
+    def renew(self, worker, lease_seconds):
+        """Extends every lease held by `worker` (its heartbeat)."""
+        now = time.time()
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE tasks SET lease_expires = ? WHERE worker = ? AND status = ?",
+            (now + lease_seconds, worker, LEASED)))
+
+    def complete(self, task, worker, response):
+        """Stores a task's response. A late result still counts unless the task is already done."""
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE tasks SET status = ?, worker = ?, response = ?, error = NULL, updated = ? WHERE id = ? AND status != ?",
+            (DONE, worker, response, time.time(), task["id"], DONE)))
+
+    def fail(self, task, worker, error, retry_at=None):
+        """
+        Returns a failed task to the queue (available again at `retry_at`), or
+        marks it failed for good when retry_at is None.
+        """
+        if retry_at is None:
+            status, available_at = FAILED, 0
+        else:
+            status, available_at = PENDING, retry_at
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE tasks SET status = ?, available_at = ?, error = ?, updated = ? WHERE id = ? AND worker = ? AND status = ?",
+            (status, available_at, str(error), time.time(), task["id"], worker, LEASED)))
+
+    def defer(self, task, worker, available_at):
+        """Puts a leased task back until `available_at` without counting the attempt (a model over its quota)."""
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE tasks SET status = ?, available_at = ?, attempts = attempts - 1, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = ?",
+            (PENDING, available_at, time.time(), task["id"], worker, LEASED)))
+
+    def outstanding(self, services=None, available_before=None):
+        """
+        Number of pending or leased tasks (for the given services); with
+        `available_before`, pending tasks that become available later are left out.
+        """
+        query = "SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)"
+        params = [PENDING, LEASED]
+        if available_before is not None:
+            query += " AND (status = ? OR available_at <= ?)"
+            params += [LEASED, available_before]
+        if services:
+            query += f" AND service IN ({', '.join('?' * len(services))})"
+            params += list(services)
+        return self._connection().execute(query, params).fetchone()[0]
+
+    def counts(self):
+        """{status: number of tasks}"""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def experiments(self):
+        """Yields (experiment key, output file, EXPERIMENTS entry) for every experiment and workbook in the queue."""
+        # The spec of the most recently queued task wins if the grid was changed and re-enqueued.
+        rows = self._connection().execute(
+            "SELECT t.experiment, t.output_file, t.spec FROM tasks t JOIN "
+            "(SELECT experiment, output_file, MIN(id) AS first, MAX(id) AS last FROM tasks GROUP BY experiment, output_file) g "
+            "ON t.id = g.last ORDER BY g.first").fetchall()
+        for key, output_file, spec in rows:
+            yield key, output_file, json.loads(spec)
+
+    def tasks_for(self, exp_key, output_file):
+        """Returns the tasks of an experiment's cells for one output file, as dicts."""
+        rows = self._connection().execute("SELECT * FROM tasks WHERE experiment = ? AND output_file = ?",
+                                          (exp_key, output_file)).fetchall()
+        return [dict(row) for row in rows]
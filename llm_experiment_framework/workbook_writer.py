@@ -0,0 +1,59 @@
+"""
+Single-pass Excel workbook assembly.
+
+Appending a sheet with pd.ExcelWriter(mode='a') makes openpyxl load and
+re-serialise the whole workbook, so saving N experiments one by one into a
+shared file costs O(N^2). Instead, experiments are kept as separate shards
+(the Parquet result store) and each workbook is written once, in openpyxl's
+streaming write-only mode, from all of its sheets.
+"""
+import os
+
+from openpyxl import Workbook, load_workbook
+
+from sweep import describe_params
+
+
+def sheet_rows(model_full_name, prompt, df, params=None):
+    """
+    The rows of one experiment sheet: "Model: ..." / "Prompt: ..." in A1:B1
+    (and "Params: ..." in C1 for a sweep point), then the frame (with its
+    header) starting at B2.
+    """
+    header = [f"Model: {model_full_name}", f"Prompt: {prompt}"]
+    if params:
+        header.append(f"Params: {describe_params(params)}")
+    yield header
+    yield [None] + list(df.columns)
+    for row in df.itertuples(index=False):
+        yield [None] + list(row)
+
+
+def write_workbook(path, sheets):
+    """
+    Writes `sheets` ({sheet_name: iterable of rows}) to `path` in one pass.
+
+    Sheets already in an existing workbook keep their position (and are
+    replaced if they are in `sheets`); sheets that are not being written have
+    their cell values copied over. New sheets are appended in the order given.
+    """
+    existing = None
+    order = list(sheets)
+    if os.path.exists(path):
+        existing = load_workbook(path, read_only=True)
+        order = existing.sheetnames + [name for name in sheets if name not in existing.sheetnames]
+
+    workbook = Workbook(write_only=True)
+    try:
+        for name in order:
+            worksheet = workbook.create_sheet(title=name)
+            rows = sheets[name] if name in sheets else existing[name].iter_rows(values_only=True)
+            for row in rows:
+                worksheet.append(row)
+        tmp_path = path + ".tmp.xlsx"
+        workbook.save(tmp_path)
+    finally:
+        if existing is not None:
+            existing.close()
+    os.replace(tmp_path, path)
+    return len(order)